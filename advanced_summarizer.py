@@ -2,6 +2,7 @@ from llm_summarizer import LLMUnavailable
 from smart_preprocessor import SmartPreprocessor
 from openai import OpenAI
 from dotenv import load_dotenv
+from worker_pool import llm_slots
 import os
 
 load_dotenv()
@@ -32,15 +33,16 @@ def call_ai_model(prompt, system_prompt, model_preference="openai"):
     # Try OpenAI first if available and preferred
     if openai_client and model_preference == "openai":
         try:
-            response = openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=1000
-            )
+            with llm_slots:
+                response = openai_client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.3,
+                    max_tokens=1000
+                )
             return response.choices[0].message.content.strip()
         except Exception as e:
             # If OpenAI fails (quota, etc.), fall back to Gemini
@@ -61,13 +63,14 @@ def call_gemini(prompt, system_prompt):
     """Call Gemini model"""
     try:
         full_prompt = f"{system_prompt}\n\n{prompt}"
-        response = gemini_model.generate_content(
-            full_prompt,
-            generation_config={
-                'temperature': 0.3,
-                'max_output_tokens': 1000,
-            }
-        )
+        with llm_slots:
+            response = gemini_model.generate_content(
+                full_prompt,
+                generation_config={
+                    'temperature': 0.3,
+                    'max_output_tokens': 1000,
+                }
+            )
         return response.text.strip()
     except Exception as e:
         raise LLMUnavailable(f"Gemini error: {str(e)}")
@@ -0,0 +1,91 @@
+import copy
+import hashlib
+import threading
+from functools import wraps
+
+from pdf_reader import compute_file_hash
+from result_store import ResultStore
+
+# Finished file analyses, keyed by content hash + analysis settings
+ANALYSIS_CACHE_PATH = "analysis_cache.sqlite"
+ANALYSIS_CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+analysis_cache = ResultStore(path=ANALYSIS_CACHE_PATH, ttl=ANALYSIS_CACHE_TTL_SECONDS)
+
+class _Flight:
+    """One in-progress analysis that identical requests wait on"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+def analysis_key(file_type, path, mode, summary_length, summary_format, model_id):
+    """Content hash of the raw upload plus everything that changes its analysis"""
+    content_hash = compute_file_hash(path)
+    settings = f"{file_type}|{content_hash}|{mode}|{summary_length}|{summary_format}|{model_id}"
+    return hashlib.sha256(settings.encode("utf-8")).hexdigest()
+
+def is_reusable(result):
+    """Failed analyses and NLP fallbacks for an unavailable model are not kept"""
+    return 'error' not in result and result.get("model_used") != "NLP (Fallback)"
+
+def single_flight(key, compute):
+    """
+    Run compute() once per key at a time
+    Callers arriving while it runs wait for that run instead of starting their own;
+    successful results are cached and reused until they expire
+    Every caller gets its own copy, so they can add fields to it freely
+    """
+    cached = analysis_cache.get(key)
+    if cached is not None:
+        print("♻️ Identical analysis found, reusing it")
+        return cached
+    
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    
+    if not leader:
+        print("⏳ Identical analysis already running, waiting for it")
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return copy.deepcopy(flight.result)
+    
+    try:
+        flight.result = compute()
+        if is_reusable(flight.result):
+            analysis_cache.put(flight.result, key=key)
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+    
+    return copy.deepcopy(flight.result)
+
+def deduplicated(file_type):
+    """
+    Make a file analyzer skip work it has already done (or is doing)
+    for the same bytes with the same settings
+    """
+    def decorate(analyze):
+        @wraps(analyze)
+        def wrapper(path, mode="llm", summary_length="short", summary_format="bullets", model_id="gpt-4o-mini"):
+            try:
+                key = analysis_key(file_type, path, mode, summary_length, summary_format, model_id)
+            except Exception as e:
+                print(f"⚠️ Warning: Could not hash upload, analyzing without dedup: {e}")
+                return analyze(path, mode, summary_length, summary_format, model_id)
+            
+            return single_flight(key, lambda: analyze(path, mode, summary_length, summary_format, model_id))
+        return wrapper
+    return decorate
@@ -1,28 +1,46 @@
 import os
 import re
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, send_file, make_response
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, send_file, make_response, Response, stream_with_context, abort
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_bcrypt import Bcrypt
 from werkzeug.utils import secure_filename
 from datetime import datetime
+from urllib.parse import urlsplit
 
-from models import db, User, Analysis, Collection
+from models import db, User, Analysis, Collection, CrawlJob, WatchedPage, BatchJob, BatchItem, ExportJob
+from migrations import upgrade as upgrade_schema
 from services.analyzer import (
     analyze_website, analyze_pdf, analyze_docx, 
-    analyze_pptx, analyze_xlsx, analyze_image
+    analyze_pptx, analyze_xlsx, analyze_image, analyze_youtube
 )
+from youtube_reader import is_youtube_url
+from upload_stream import SpooledUploadRequest, open_upload
+from result_store import result_store
 from chat_service import chat_with_document
-from export_service import export_to_pdf, export_to_docx, export_to_markdown, export_to_json
+from spreadsheet_store import delete_spreadsheet
+from crawler import start_crawl, resume_crawls, MAX_CRAWL_PAGES, MAX_CRAWL_DEPTH
+from watcher import start_watch_scheduler, watch_doc_id, WATCH_INTERVALS
+from batch_jobs import (
+    queue_uploads, queue_urls, start_batch_job, resume_batch_jobs,
+    MAX_BATCH_ITEMS, MAX_BATCH_UPLOAD_MB
+)
+from export_service import EXPORT_FORMATS
+from search_index import search_snippets
+from bulk_export import (
+    history_filters, history_query, iter_bulk_export, start_export_job, resume_export_jobs, export_progress,
+    pq, BULK_EXPORT_FORMATS, STREAMABLE_FORMATS, COMBINED_FORMATS, STREAM_EXPORT_MAX_ROWS, MAX_COMBINED_REPORT_ROWS
+)
+from export_cache import cached_export, export_etag, prerender_exports, drop_cached_exports
 
-UPLOAD_FOLDER = "uploads"
 ALLOWED_EXTENSIONS = {"pdf", "docx", "doc", "pptx", "ppt", "xlsx", "xls", "png", "jpg", "jpeg", "gif", "bmp", "tiff"}
 MAX_FILE_SIZE_MB = 10
 
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
 app = Flask(__name__)
-app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
-app.config["MAX_CONTENT_LENGTH"] = MAX_FILE_SIZE_MB * 1024 * 1024
+# Uploads are buffered in memory (spilling to an anonymous temp file when large)
+app.request_class = SpooledUploadRequest
+# Batch uploads are the largest requests accepted; every other route is held
+# to MAX_FILE_SIZE_MB by limit_upload_size below
+app.config["MAX_CONTENT_LENGTH"] = MAX_BATCH_UPLOAD_MB * 1024 * 1024
 app.config["SECRET_KEY"] = "your-secret-key-change-this-in-production-12345"
 app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///content_analyzer.db"
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
@@ -38,21 +56,29 @@ login_manager.login_message = 'Please log in to access this page.'
 def load_user(user_id):
     return User.query.get(int(user_id))
 
-# Create database tables
+# Create database tables, then bring existing databases up to date
 with app.app_context():
     db.create_all()
-    # Migrate existing data if needed
-    try:
-        from sqlalchemy import inspect
-        inspector = inspect(db.engine)
-        columns = [col['name'] for col in inspector.get_columns('analyses')]
-        if 'collection_id' not in columns:
-            with db.engine.connect() as conn:
-                conn.execute(db.text('ALTER TABLE analyses ADD COLUMN collection_id INTEGER'))
-                conn.execute(db.text('ALTER TABLE analyses ADD COLUMN notes TEXT'))
-                conn.commit()
-    except:
-        pass
+    upgrade_schema(db.engine)
+
+_background_started = False
+
+@app.before_request
+def start_background_workers():
+    """Restart interrupted crawl, batch and export jobs and start the watchlist scheduler once, in the process that serves requests"""
+    global _background_started
+    if not _background_started:
+        _background_started = True
+        resume_crawls(app)
+        resume_batch_jobs(app)
+        resume_export_jobs(app)
+        start_watch_scheduler(app)
+
+@app.before_request
+def limit_upload_size():
+    """Reject requests over MAX_FILE_SIZE_MB, except batch uploads (large archives are streamed to disk there)"""
+    if request.endpoint != 'add_batch_items' and (request.content_length or 0) > MAX_FILE_SIZE_MB * 1024 * 1024:
+        abort(413)
 
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -92,6 +118,14 @@ def validate_url(url):
     
     return True, None
 
+def remember_result(name, data):
+    """Keep a result server-side for export; only its key goes into the session cookie"""
+    session[f"{name}_key"] = result_store.put(data, key=session.get(f"{name}_key"))
+
+def recall_result(name):
+    """The result stored by remember_result, or None if there is none or it expired"""
+    return result_store.get(session.get(f"{name}_key"))
+
 def save_analysis_to_db(result, source_type, source_url, mode, summary_length, summary_format):
     """Save analysis results to database"""
     if not current_user.is_authenticated:
@@ -116,6 +150,7 @@ def save_analysis_to_db(result, source_type, source_url, mode, summary_length, s
         db.session.add(analysis)
         db.session.commit()
         
+        prerender_exports(analysis.id, result)
         return analysis.id
     except Exception as e:
         db.session.rollback()
@@ -208,33 +243,100 @@ def history():
     page = request.args.get('page', 1, type=int)
     per_page = 10
     
-    # Build query
-    query = Analysis.query.filter_by(user_id=current_user.id)
+    filters = history_filters(request.args)
+    query = history_query(current_user.id, filters)
+    
+    # Paginate
+    analyses = query.paginate(page=page, per_page=per_page, error_out=False)
     
-    # Apply filters
-    search = request.args.get('search', '').strip()
-    if search:
-        query = query.filter(Analysis.title.ilike(f'%{search}%'))
+    snippets = {}
+    if filters.get('search'):
+        snippets = search_snippets([analysis.id for analysis in analyses.items], filters['search'])
     
-    source_type = request.args.get('source_type', '').strip()
-    if source_type:
-        query = query.filter_by(source_type=source_type)
+    export_jobs = ExportJob.query.filter_by(user_id=current_user.id).order_by(ExportJob.created_at.desc()).limit(5).all()
     
-    collection_id = request.args.get('collection', '').strip()
-    if collection_id:
-        query = query.filter_by(collection_id=int(collection_id))
+    return render_template("history.html", analyses=analyses, filters=filters, snippets=snippets, export_jobs=export_jobs,
+                           export_progress=export_progress, parquet_available=pq is not None)
+
+@app.route("/history/export/<format>")
+@login_required
+def export_history(format):
+    """
+    Export every analysis matching the history filters (e.g. a collection)
+    Small JSONL / CSV exports stream straight from the database; the rest
+    are written by a background job and downloaded when it's done
+    """
+    filters = history_filters(request.args)
     
-    favorites = request.args.get('favorites', '').strip()
-    if favorites == 'true':
-        query = query.filter_by(is_favorite=True)
+    if format not in BULK_EXPORT_FORMATS:
+        flash("Invalid export format", "error")
+        return redirect(url_for('history', **filters))
     
-    # Order by created date
-    query = query.order_by(Analysis.created_at.desc())
+    query = history_query(current_user.id, filters)
+    count = query.count()
     
-    # Paginate
-    analyses = query.paginate(page=page, per_page=per_page, error_out=False)
+    if count == 0:
+        flash("No analyses match these filters", "error")
+        return redirect(url_for('history', **filters))
+    
+    extension, mimetype = BULK_EXPORT_FORMATS[format]
+    
+    if format in STREAMABLE_FORMATS and count <= STREAM_EXPORT_MAX_ROWS:
+        filename = f"analyses_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+        return Response(
+            stream_with_context(iter_bulk_export(query, format)),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+    
+    if format in COMBINED_FORMATS and count > MAX_COMBINED_REPORT_ROWS:
+        flash(f"A combined report can hold up to {MAX_COMBINED_REPORT_ROWS} analyses. "
+              f"Narrow the filters or export JSONL / CSV instead.", "error")
+        return redirect(url_for('history', **filters))
     
-    return render_template("history.html", analyses=analyses)
+    if format == 'parquet' and pq is None:
+        flash("Parquet export needs pyarrow. Install with: pip install pyarrow", "error")
+        return redirect(url_for('history', **filters))
+    
+    job = ExportJob(user_id=current_user.id, format=format, rows_total=count)
+    job.set_filters(filters)
+    db.session.add(job)
+    db.session.commit()
+    start_export_job(app, job.id)
+    
+    flash(f"Exporting {count} analyses - the download link appears under Exports when it's ready", "success")
+    return redirect(url_for('history', **filters))
+
+@app.route("/exports/<int:job_id>/status")
+@login_required
+def export_job_status(job_id):
+    """Progress of a bulk export job (polled by the history page)"""
+    job = db.session.get(ExportJob, job_id)
+    if job is None or job.user_id != current_user.id:
+        return jsonify({"error": "Not found"}), 404
+    
+    return jsonify(dict(job.to_dict(), rows_written=export_progress(job)))
+
+@app.route("/exports/<int:job_id>/download")
+@login_required
+def download_export(job_id):
+    """Download the file of a finished bulk export"""
+    job = db.session.get(ExportJob, job_id)
+    if job is None or job.user_id != current_user.id:
+        flash("You don't have permission to download this export", "error")
+        return redirect(url_for('history'))
+    
+    if job.status != 'completed' or not job.path or not os.path.exists(job.path):
+        flash("This export is not available", "error")
+        return redirect(url_for('history'))
+    
+    extension, mimetype = BULK_EXPORT_FORMATS[job.format]
+    return send_file(
+        os.path.abspath(job.path),
+        as_attachment=True,
+        download_name=f"analyses_export_{job.id}.{extension}",
+        mimetype=mimetype
+    )
 
 @app.route("/analysis/<int:analysis_id>")
 @login_required
@@ -248,8 +350,8 @@ def view_analysis(analysis_id):
     
     result = analysis.get_result_data()
     
-    # Store in session for export
-    session['current_result'] = result
+    # Keep for export
+    remember_result('current_result', result)
     
     return render_template("index.html", result=result, from_history=True)
 
@@ -264,8 +366,14 @@ def delete_analysis(analysis_id):
         return redirect(url_for('history'))
     
     try:
+        # Watches keep running from their stored fingerprints without this version
+        WatchedPage.query.filter_by(analysis_id=analysis.id).update({'analysis_id': None})
         db.session.delete(analysis)
         db.session.commit()
+        drop_cached_exports(analysis_id)
+        # The SQL tables of a spreadsheet go with the last analysis of that document
+        if analysis.doc_id and not Analysis.query.filter_by(doc_id=analysis.doc_id).first():
+            delete_spreadsheet(analysis.doc_id)
         flash("Analysis deleted successfully", "success")
     except Exception as e:
         db.session.rollback()
@@ -455,6 +563,10 @@ def home():
                 is_valid, error_msg = validate_url(url)
                 if not is_valid:
                     result = {"error": error_msg}
+                elif is_youtube_url(url):
+                    result = analyze_youtube(url, mode, summary_length, summary_format, model_id)
+                    if 'error' not in result:
+                        save_analysis_to_db(result, 'youtube', url, mode, summary_length, summary_format)
                 else:
                     result = analyze_website(url, mode, summary_length, summary_format, model_id)
                     if 'error' not in result:
@@ -479,46 +591,38 @@ def home():
                         if not filename:
                             result = {"error": "Invalid filename"}
                         else:
-                            path = os.path.join(UPLOAD_FOLDER, filename)
-                            file.save(path)
+                            # Parsed straight from the spooled upload, nothing is saved to disk
+                            stream, size = open_upload(file)
                             
-                            if os.path.getsize(path) == 0:
+                            if size == 0:
                                 result = {"error": "Uploaded file is empty"}
                             else:
                                 file_type = get_file_type(filename)
                                 
                                 if file_type == "pdf":
-                                    result = analyze_pdf(path, mode, summary_length, summary_format, model_id)
+                                    result = analyze_pdf(stream, mode, summary_length, summary_format, model_id)
                                 elif file_type == "docx":
-                                    result = analyze_docx(path, mode, summary_length, summary_format, model_id)
+                                    result = analyze_docx(stream, mode, summary_length, summary_format, model_id)
                                 elif file_type == "pptx":
-                                    result = analyze_pptx(path, mode, summary_length, summary_format, model_id)
+                                    result = analyze_pptx(stream, mode, summary_length, summary_format, model_id)
                                 elif file_type == "xlsx":
-                                    result = analyze_xlsx(path, mode, summary_length, summary_format, model_id)
+                                    result = analyze_xlsx(stream, mode, summary_length, summary_format, model_id)
                                 elif file_type == "image":
-                                    result = analyze_image(path, mode, summary_length, summary_format, model_id)
+                                    result = analyze_image(stream, mode, summary_length, summary_format, model_id)
                                 else:
                                     result = {"error": "Unsupported file type"}
                                 
                                 if 'error' not in result:
                                     save_analysis_to_db(result, file_type, filename, mode, summary_length, summary_format)
-                            
-                            if os.path.exists(path):
-                                os.remove(path)
                     except Exception as e:
                         result = {"error": f"File processing failed: {str(e)}"}
-                        try:
-                            if 'path' in locals() and os.path.exists(path):
-                                os.remove(path)
-                        except:
-                            pass
 
         except Exception as e:
             result = {"error": f"An unexpected error occurred: {str(e)}"}
     
-    # Store result in session for export
+    # Keep result for export
     if result and 'error' not in result:
-        session['current_result'] = result
+        remember_result('current_result', result)
 
     return render_template("index.html", result=result)
 
@@ -554,7 +658,239 @@ def chat():
 @app.route("/batch")
 def batch():
     """Batch processing page"""
-    return render_template("batch.html")
+    crawl_jobs = []
+    batch_jobs = []
+    user_collections = []
+    if current_user.is_authenticated:
+        crawl_jobs = CrawlJob.query.filter_by(user_id=current_user.id).order_by(CrawlJob.created_at.desc()).limit(20).all()
+        batch_jobs = BatchJob.query.filter_by(user_id=current_user.id).order_by(BatchJob.created_at.desc()).limit(20).all()
+        user_collections = Collection.query.filter_by(user_id=current_user.id).all()
+    return render_template("batch.html", crawl_jobs=crawl_jobs, batch_jobs=batch_jobs, collections=user_collections,
+                           max_crawl_pages=MAX_CRAWL_PAGES, max_crawl_depth=MAX_CRAWL_DEPTH,
+                           max_batch_items=MAX_BATCH_ITEMS, max_batch_upload_mb=MAX_BATCH_UPLOAD_MB)
+
+@app.route("/crawl", methods=["POST"])
+@login_required
+def start_site_crawl():
+    """Start crawling a site into a collection"""
+    seed_url = request.form.get("seed_url", "").strip()
+    is_valid, error_msg = validate_url(seed_url)
+    if not is_valid:
+        flash(error_msg, "error")
+        return redirect(url_for('batch'))
+    
+    try:
+        max_depth = min(max(int(request.form.get("max_depth", 2)), 0), MAX_CRAWL_DEPTH)
+        max_pages = min(max(int(request.form.get("max_pages", 100)), 1), MAX_CRAWL_PAGES)
+    except ValueError:
+        flash("Depth and page limit must be numbers", "error")
+        return redirect(url_for('batch'))
+    
+    mode = request.form.get("mode", "nlp")
+    summary_length = request.form.get("summary_length", "short")
+    summary_format = request.form.get("summary_format", "bullets")
+    if mode not in ["llm", "nlp"] or summary_length not in ["short", "long"] or \
+            summary_format not in ["bullets", "qa", "timeline", "insights"]:
+        flash("Invalid analysis settings", "error")
+        return redirect(url_for('batch'))
+    
+    try:
+        collection_id = request.form.get("collection_id", "new")
+        if collection_id == "new":
+            collection = Collection(
+                user_id=current_user.id,
+                name=f"Crawl: {urlsplit(seed_url).netloc}"[:100],
+                description=f"Pages crawled from {seed_url}"
+            )
+            db.session.add(collection)
+            db.session.flush()
+        else:
+            collection = Collection.query.get_or_404(int(collection_id))
+            if collection.user_id != current_user.id:
+                flash("You don't have permission to use this collection", "error")
+                return redirect(url_for('batch'))
+        
+        job = CrawlJob(
+            user_id=current_user.id,
+            collection_id=collection.id,
+            seed_url=seed_url,
+            max_depth=max_depth,
+            max_pages=max_pages,
+            summary_mode=mode,
+            summary_length=summary_length,
+            summary_format=summary_format
+        )
+        db.session.add(job)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Could not start crawl: {str(e)}", "error")
+        return redirect(url_for('batch'))
+    
+    start_crawl(app, job.id)
+    flash(f"Crawl started for {seed_url} - pages will appear in '{collection.name}'", "success")
+    return redirect(url_for('batch'))
+
+@app.route("/crawl/<int:job_id>/status")
+@login_required
+def crawl_status(job_id):
+    """Progress of a crawl job (polled by the batch page)"""
+    job = CrawlJob.query.get_or_404(job_id)
+    if job.user_id != current_user.id:
+        return jsonify({"error": "Not found"}), 404
+    return jsonify(job.to_dict())
+
+@app.route("/crawl/<int:job_id>/cancel", methods=["POST"])
+@login_required
+def cancel_crawl(job_id):
+    """Stop a crawl after its current round of pages"""
+    job = CrawlJob.query.get_or_404(job_id)
+    if job.user_id != current_user.id:
+        flash("You don't have permission to cancel this crawl", "error")
+        return redirect(url_for('batch'))
+    
+    if job.status in ('queued', 'running'):
+        job.status = 'cancelled'
+        db.session.commit()
+        flash("Crawl cancelled", "success")
+    return redirect(url_for('batch'))
+
+def zip_download(chunks, filename):
+    """Streamed ZIP attachment; the first entry is sent as soon as it is rendered"""
+    return Response(
+        chunks,
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+def get_own_batch_job(job_id):
+    """A batch job of the current user, or None"""
+    job = db.session.get(BatchJob, job_id)
+    if job is None or job.user_id != current_user.id:
+        return None
+    return job
+
+@app.route("/batch/jobs", methods=["POST"])
+@login_required
+def create_batch_job():
+    """Open a batch job; items are then added with one or more uploads"""
+    mode = request.form.get("mode", "nlp")
+    summary_length = request.form.get("summary_length", "short")
+    summary_format = request.form.get("summary_format", "bullets")
+    if mode not in ["llm", "nlp"] or summary_length not in ["short", "long"] or \
+            summary_format not in ["bullets", "qa", "timeline", "insights"]:
+        return jsonify({"error": "Invalid analysis settings"}), 400
+    
+    job = BatchJob(
+        user_id=current_user.id,
+        summary_mode=mode,
+        summary_length=summary_length,
+        summary_format=summary_format
+    )
+    db.session.add(job)
+    db.session.commit()
+    return jsonify(job.to_dict()), 201
+
+@app.route("/batch/jobs/<int:job_id>/items", methods=["POST"])
+@login_required
+def add_batch_items(job_id):
+    """
+    Queue more items: files, ZIP archives of files and/or URLs (one per line)
+    Analysis starts as soon as the first items arrive
+    """
+    job = get_own_batch_job(job_id)
+    if job is None:
+        return jsonify({"error": "Not found"}), 404
+    if job.status != 'receiving':
+        return jsonify({"error": "This batch no longer accepts items"}), 409
+    
+    try:
+        added, skipped = queue_uploads(job, request.files.getlist("files"))
+        
+        urls = [url.strip() for url in request.form.get("urls", "").split('\n') if url.strip()]
+        valid_urls = [url for url in urls if validate_url(url)[0]]
+        url_added, url_skipped = queue_urls(job, valid_urls)
+        added += url_added
+        skipped += url_skipped + len(urls) - len(valid_urls)
+        
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+    
+    if added:
+        start_batch_job(app, job.id)
+    return jsonify({"added": added, "skipped": skipped, "job": job.to_dict()})
+
+@app.route("/batch/jobs/<int:job_id>/close", methods=["POST"])
+@login_required
+def close_batch_job(job_id):
+    """All items are uploaded; the job completes once they are analyzed"""
+    job = get_own_batch_job(job_id)
+    if job is None:
+        return jsonify({"error": "Not found"}), 404
+    
+    if job.status == 'receiving':
+        job.status = 'running'
+        db.session.commit()
+        start_batch_job(app, job.id)
+    return jsonify(job.to_dict())
+
+@app.route("/batch/jobs/<int:job_id>/status")
+@login_required
+def batch_job_status(job_id):
+    """
+    Progress of a batch job (polled by the batch page)
+    after: only include items whose finish_order is above this
+    """
+    job = get_own_batch_job(job_id)
+    if job is None:
+        return jsonify({"error": "Not found"}), 404
+    
+    after = request.args.get("after", 0, type=int)
+    items = job.items.filter(BatchItem.finish_order > after).order_by(BatchItem.finish_order).all()
+    return jsonify(dict(job.to_dict(), items=[item.to_dict() for item in items]))
+
+@app.route("/batch/jobs/<int:job_id>/cancel", methods=["POST"])
+@login_required
+def cancel_batch_job(job_id):
+    """Stop a batch job after the items currently being analyzed"""
+    job = get_own_batch_job(job_id)
+    if job is None:
+        flash("You don't have permission to cancel this batch", "error")
+        return redirect(url_for('batch'))
+    
+    if job.status in ('receiving', 'running'):
+        job.status = 'cancelled'
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        # Lets the runner clean up the queued uploads even if it had stopped
+        start_batch_job(app, job.id)
+        flash("Batch cancelled", "success")
+    return redirect(url_for('batch'))
+
+@app.route("/batch/jobs/<int:job_id>/export/<format>")
+@login_required
+def export_batch_job(job_id, format):
+    """Export the items of a batch job finished so far as a ZIP"""
+    from batch_processor import create_batch_export_zip
+    
+    job = get_own_batch_job(job_id)
+    if job is None:
+        flash("You don't have permission to export this batch", "error")
+        return redirect(url_for('batch'))
+    
+    results = [item.get_result_data() for item in job.items.filter_by(status='done').order_by(BatchItem.position)]
+    if not results:
+        flash("No finished items to export yet", "error")
+        return redirect(url_for('batch'))
+    
+    try:
+        chunks = create_batch_export_zip(results, format)
+        return zip_download(chunks, f"batch_{job.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip")
+    except Exception as e:
+        flash(f"Export failed: {str(e)}", "error")
+        return redirect(url_for('batch'))
 
 @app.route("/batch/urls", methods=["POST"])
 def batch_process_urls():
@@ -579,7 +915,7 @@ def batch_process_urls():
         
         results = process_batch_urls(urls, mode, summary_length, summary_format)
         
-        session['batch_results'] = results
+        remember_result('batch_results', results)
         
         flash(f"Processed {len(results)} URLs successfully!", "success")
         return render_template("batch.html", batch_results=results)
@@ -608,9 +944,9 @@ def batch_process_files():
             flash("Maximum 10 files allowed per batch", "error")
             return redirect(url_for('batch'))
         
-        results = process_batch_files(files, UPLOAD_FOLDER, mode, summary_length, summary_format)
+        results = process_batch_files(files, mode, summary_length, summary_format)
         
-        session['batch_results'] = results
+        remember_result('batch_results', results)
         
         flash(f"Processed {len(results)} files successfully!", "success")
         return render_template("batch.html", batch_results=results)
@@ -625,27 +961,45 @@ def export_batch_results(format):
     from batch_processor import create_batch_export_zip
     
     try:
-        batch_results = session.get('batch_results')
+        batch_results = recall_result('batch_results')
         
         if not batch_results:
             flash("No batch results available to export", "error")
             return redirect(url_for('batch'))
         
-        zip_buffer = create_batch_export_zip(batch_results, format)
+        chunks = create_batch_export_zip(batch_results, format)
         
         filename = f"batch_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
         
-        return send_file(
-            zip_buffer,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='application/zip'
-        )
+        return zip_download(chunks, filename)
         
     except Exception as e:
         flash(f"Export failed: {str(e)}", "error")
         return redirect(url_for('batch'))
 
+def send_export(result_data, format, filename_base, analysis_id=None):
+    """
+    Serve an export from the on-disk export cache, tagged with its content ETag
+    Clients that already hold this version (If-None-Match) get a 304 without any rendering
+    """
+    etag = export_etag(result_data, format)
+    if request.if_none_match.contains(etag):
+        response = make_response("", 304)
+        response.set_etag(etag)
+        return response
+    
+    path, etag = cached_export(result_data, format, analysis_id, etag)
+    extension, mimetype = EXPORT_FORMATS[format]
+    # The cache path is relative to the working directory; send_file would resolve it against app.root_path
+    return send_file(
+        os.path.abspath(path),
+        as_attachment=True,
+        download_name=f"{filename_base}.{extension}",
+        mimetype=mimetype,
+        etag=etag,
+        conditional=True
+    )
+
 @app.route("/analysis/<int:analysis_id>/export/<format>")
 @login_required
 def export_analysis(analysis_id, format):
@@ -656,102 +1010,116 @@ def export_analysis(analysis_id, format):
         flash("You don't have permission to export this analysis", "error")
         return redirect(url_for('history'))
     
+    if format not in EXPORT_FORMATS:
+        flash("Invalid export format", "error")
+        return redirect(url_for('view_analysis', analysis_id=analysis_id))
+    
     result_data = analysis.get_result_data()
     filename_base = f"analysis_{analysis.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     
     try:
-        if format == 'pdf':
-            buffer = export_to_pdf(result_data)
-            return send_file(
-                buffer,
-                as_attachment=True,
-                download_name=f"{filename_base}.pdf",
-                mimetype='application/pdf'
-            )
-        
-        elif format == 'docx':
-            buffer = export_to_docx(result_data)
-            return send_file(
-                buffer,
-                as_attachment=True,
-                download_name=f"{filename_base}.docx",
-                mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-            )
-        
-        elif format == 'markdown':
-            md_content = export_to_markdown(result_data)
-            response = make_response(md_content)
-            response.headers['Content-Type'] = 'text/markdown'
-            response.headers['Content-Disposition'] = f'attachment; filename={filename_base}.md'
-            return response
-        
-        elif format == 'json':
-            json_content = export_to_json(result_data)
-            response = make_response(json_content)
-            response.headers['Content-Type'] = 'application/json'
-            response.headers['Content-Disposition'] = f'attachment; filename={filename_base}.json'
-            return response
-        
-        else:
-            flash("Invalid export format", "error")
-            return redirect(url_for('view_analysis', analysis_id=analysis_id))
-    
+        return send_export(result_data, format, filename_base, analysis.id)
     except Exception as e:
         flash(f"Export failed: {str(e)}", "error")
         return redirect(url_for('view_analysis', analysis_id=analysis_id))
 
 @app.route("/export/current/<format>")
 def export_current_analysis(format):
-    """Export current analysis result from session"""
+    """Export the current analysis result kept for this session"""
     try:
-        result_data = session.get('current_result')
+        result_data = recall_result('current_result')
         
         if not result_data:
             flash("No analysis available to export. Please analyze content first.", "error")
             return redirect(url_for('home'))
         
-        filename_base = f"analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        
-        if format == 'pdf':
-            buffer = export_to_pdf(result_data)
-            return send_file(
-                buffer,
-                as_attachment=True,
-                download_name=f"{filename_base}.pdf",
-                mimetype='application/pdf'
-            )
-        
-        elif format == 'docx':
-            buffer = export_to_docx(result_data)
-            return send_file(
-                buffer,
-                as_attachment=True,
-                download_name=f"{filename_base}.docx",
-                mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-            )
-        
-        elif format == 'markdown':
-            md_content = export_to_markdown(result_data)
-            response = make_response(md_content)
-            response.headers['Content-Type'] = 'text/markdown'
-            response.headers['Content-Disposition'] = f'attachment; filename={filename_base}.md'
-            return response
-        
-        elif format == 'json':
-            json_content = export_to_json(result_data)
-            response = make_response(json_content)
-            response.headers['Content-Type'] = 'application/json'
-            response.headers['Content-Disposition'] = f'attachment; filename={filename_base}.json'
-            return response
-        
-        else:
+        if format not in EXPORT_FORMATS:
             flash("Invalid export format", "error")
             return redirect(url_for('home'))
+        
+        filename_base = f"analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        return send_export(result_data, format, filename_base)
     
     except Exception as e:
         flash(f"Export failed: {str(e)}", "error")
         return redirect(url_for('home'))
 
+@app.route("/watchlist")
+@login_required
+def watchlist():
+    """Watched pages and their change history"""
+    watches = WatchedPage.query.filter_by(user_id=current_user.id).order_by(WatchedPage.created_at.desc()).all()
+    return render_template("watchlist.html", watches=watches, intervals=WATCH_INTERVALS)
+
+@app.route("/analysis/<int:analysis_id>/watch", methods=["POST"])
+@login_required
+def watch_analysis(analysis_id):
+    """Start watching the page behind a website analysis for changes"""
+    analysis = Analysis.query.get_or_404(analysis_id)
+    
+    if analysis.user_id != current_user.id:
+        flash("You don't have permission to watch this analysis", "error")
+        return redirect(url_for('history'))
+    
+    if analysis.source_type != 'website' or not analysis.source_url:
+        flash("Only website analyses can be watched", "error")
+        return redirect(url_for('history'))
+    
+    try:
+        interval = int(request.form.get("check_interval_hours", 24))
+    except ValueError:
+        interval = 24
+    if interval not in WATCH_INTERVALS:
+        interval = 24
+    
+    try:
+        watch = WatchedPage.query.filter_by(user_id=current_user.id, url=analysis.source_url).first()
+        if watch is None:
+            watch = WatchedPage(user_id=current_user.id, url=analysis.source_url, analysis_id=analysis.id)
+            db.session.add(watch)
+            db.session.flush()
+            watch.doc_id = watch_doc_id(watch)
+        
+        watch.check_interval_hours = interval
+        watch.is_active = True
+        watch.next_check_at = datetime.utcnow()
+        db.session.commit()
+        flash(f"Watching {analysis.source_url} for changes", "success")
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Could not watch page: {str(e)}", "error")
+    
+    return redirect(url_for('watchlist'))
+
+@app.route("/watchlist/<int:watch_id>/check", methods=["POST"])
+@login_required
+def check_watch_now(watch_id):
+    """Queue a watched page for the next scheduler pass"""
+    watch = WatchedPage.query.get_or_404(watch_id)
+    if watch.user_id != current_user.id:
+        flash("You don't have permission to check this page", "error")
+        return redirect(url_for('watchlist'))
+    
+    watch.is_active = True
+    watch.next_check_at = datetime.utcnow()
+    db.session.commit()
+    flash("Page will be checked within a minute", "success")
+    return redirect(url_for('watchlist'))
+
+@app.route("/watchlist/<int:watch_id>/delete", methods=["POST"])
+@login_required
+def unwatch_page(watch_id):
+    """Stop watching a page (its analysis versions stay in history)"""
+    watch = WatchedPage.query.get_or_404(watch_id)
+    if watch.user_id != current_user.id:
+        flash("You don't have permission to change this watch", "error")
+        return redirect(url_for('watchlist'))
+    
+    db.session.delete(watch)
+    db.session.commit()
+    flash("Stopped watching page", "success")
+    return redirect(url_for('watchlist'))
+
 @app.errorhandler(413)
 def too_large(e):
     result = {"error": f"File is too large. Maximum size is {MAX_FILE_SIZE_MB}MB"}
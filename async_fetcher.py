@@ -0,0 +1,74 @@
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from scraper import scrape_website
+
+# Pages downloaded at once across all hosts (per-host limits live in http_fetcher)
+MAX_CONCURRENT_FETCHES = 10
+# Overall budget per URL, including retries and politeness waits
+FETCH_TIMEOUT = 30
+
+async def _scrape_one(url, executor, semaphore, timeout, include_links=False):
+    loop = asyncio.get_running_loop()
+    async with semaphore:
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(executor, scrape_website, url, include_links), timeout
+            )
+        except asyncio.TimeoutError:
+            return {"error": "Request timed out. The website took too long to respond"}
+        except Exception as e:
+            return {"error": f"Failed to fetch website: {str(e)}"}
+
+async def scrape_all(urls, on_page, max_concurrency=MAX_CONCURRENT_FETCHES, timeout=FETCH_TIMEOUT,
+                     include_links=False):
+    """
+    Scrape every URL concurrently, calling on_page(position, url, page) as each finishes
+    page is the scrape_website() dict (with "error" on failure)
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="fetch")
+    
+    async def run(position, url):
+        page = await _scrape_one(url, executor, semaphore, timeout, include_links)
+        on_page(position, url, page)
+    
+    try:
+        await asyncio.gather(*(run(position, url) for position, url in enumerate(urls)))
+    finally:
+        # Don't hold the caller up for requests that already timed out
+        executor.shutdown(wait=False)
+
+def iter_scraped_pages(urls, max_concurrency=MAX_CONCURRENT_FETCHES, timeout=FETCH_TIMEOUT, include_links=False):
+    """
+    Fetch all URLs at once and yield (position, url, page) in completion order
+    
+    The event loop runs on its own thread, so synchronous callers (Flask views,
+    batch processing) can start analysing the first pages while the slower
+    ones are still downloading.
+    """
+    finished = queue.Queue()
+    
+    def run_loop():
+        try:
+            asyncio.run(scrape_all(urls, lambda *item: finished.put(item), max_concurrency, timeout, include_links))
+        except Exception as e:
+            print(f"❌ Concurrent fetch failed: {e}")
+        finally:
+            finished.put(None)
+    
+    threading.Thread(target=run_loop, name="fetch-loop", daemon=True).start()
+    
+    while True:
+        item = finished.get()
+        if item is None:
+            break
+        yield item
+
+def scrape_pages(urls, max_concurrency=MAX_CONCURRENT_FETCHES, timeout=FETCH_TIMEOUT):
+    """Fetch all URLs concurrently; returns pages in the order of urls"""
+    pages = [None] * len(urls)
+    for position, _, page in iter_scraped_pages(urls, max_concurrency, timeout):
+        pages[position] = page
+    return pages
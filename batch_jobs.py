@@ -0,0 +1,291 @@
+import os
+import uuid
+import shutil
+import zipfile
+import threading
+from concurrent.futures import wait, FIRST_COMPLETED
+from datetime import datetime
+from werkzeug.utils import secure_filename
+from sqlalchemy import update, select
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models import db, BatchJob, BatchItem
+from leases import claim_lease, renew_lease, release_lease
+from batch_processor import FILE_ANALYZERS, get_file_type
+from services.analyzer import analyze_website, analyze_youtube
+from youtube_reader import is_youtube_url
+from upload_stream import open_upload
+from worker_pool import batch_executor, timed_call, BATCH_WORKERS
+
+# Queued uploads live here until their item has been analyzed
+BATCH_JOB_FOLDER = "batch_jobs"
+MAX_BATCH_ITEMS = 1000
+MAX_BATCH_UPLOAD_MB = 200  # per upload request, e.g. one ZIP archive
+MAX_ZIP_ENTRY_MB = 50
+COPY_CHUNK_SIZE = 1024 * 1024
+
+_running_jobs = {}
+_running_lock = threading.Lock()
+
+def batch_lease(job_id):
+    return f"batch:{job_id}"
+
+def job_folder(job_id):
+    return os.path.join(BATCH_JOB_FOLDER, str(job_id))
+
+def queue_items(job, items):
+    """
+    Add (kind, source, stored_path) items to a job
+    Positions are reserved with a single UPDATE in SQL, so uploads to the
+    same job running at once never get the same position
+    """
+    if not items:
+        return
+    
+    db.session.execute(
+        update(BatchJob).where(BatchJob.id == job.id).values(items_total=BatchJob.items_total + len(items))
+    )
+    end = db.session.execute(select(BatchJob.items_total).where(BatchJob.id == job.id)).scalar()
+    # Keep the loaded job in step without marking items_total as changed by this session
+    set_committed_value(job, 'items_total', end)
+    
+    for position, (kind, source, stored_path) in enumerate(items, start=end - len(items)):
+        db.session.add(BatchItem(job_id=job.id, position=position, kind=kind, source=source, stored_path=stored_path))
+
+def is_full(job, items):
+    return job.items_total + len(items) >= MAX_BATCH_ITEMS
+
+def item_path(job, filename):
+    """Unique on-disk path for a queued file of a job (not tied to its position)"""
+    folder = job_folder(job.id)
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, f"{uuid.uuid4().hex[:12]}_{filename}")
+
+def queue_zip(job, stream, items):
+    """
+    Collect every supported file in a ZIP archive into items
+    Entries are streamed out one at a time, the archive is never unpacked in memory
+    Returns: (added, skipped)
+    """
+    try:
+        archive = zipfile.ZipFile(stream)
+    except zipfile.BadZipFile:
+        raise Exception("Not a valid ZIP archive")
+    
+    added = skipped = 0
+    with archive:
+        for entry in archive.infolist():
+            if entry.is_dir() or entry.filename.startswith("__MACOSX/"):
+                continue
+            
+            # Only the base name is kept, so entries can't escape the job folder
+            filename = secure_filename(os.path.basename(entry.filename))
+            if (not filename or not get_file_type(filename) or is_full(job, items)
+                    or entry.file_size > MAX_ZIP_ENTRY_MB * 1024 * 1024):
+                skipped += 1
+                continue
+            
+            path = item_path(job, filename)
+            with archive.open(entry) as source, open(path, "wb") as target:
+                shutil.copyfileobj(source, target, COPY_CHUNK_SIZE)
+            items.append(("file", filename, path))
+            added += 1
+    
+    return added, skipped
+
+def queue_uploads(job, files):
+    """
+    Queue uploaded files (and the contents of uploaded ZIP archives)
+    Returns: (added, skipped)
+    """
+    items = []
+    added = skipped = 0
+    
+    for file in files:
+        if not file or not file.filename:
+            continue
+        
+        filename = secure_filename(file.filename)
+        if filename.lower().endswith(".zip"):
+            stream, _ = open_upload(file)
+            zip_added, zip_skipped = queue_zip(job, stream, items)
+            added += zip_added
+            skipped += zip_skipped
+            continue
+        
+        if not filename or not get_file_type(filename) or is_full(job, items):
+            skipped += 1
+            continue
+        
+        path = item_path(job, filename)
+        file.save(path)
+        items.append(("file", filename, path))
+        added += 1
+    
+    queue_items(job, items)
+    return added, skipped
+
+def queue_urls(job, urls):
+    """Queue URLs (web pages or YouTube videos); returns (added, skipped)"""
+    items = []
+    skipped = 0
+    for url in urls:
+        if is_full(job, items):
+            skipped += 1
+            continue
+        items.append(("url", url, None))
+    
+    queue_items(job, items)
+    return len(items), skipped
+
+def analyze_item(kind, source, stored_path, mode, summary_length, summary_format):
+    """Analyze one queued item (runs on the batch worker pool)"""
+    if kind == "url":
+        if is_youtube_url(source):
+            return analyze_youtube(source, mode, summary_length, summary_format)
+        return analyze_website(source, mode, summary_length, summary_format)
+    
+    return FILE_ANALYZERS[get_file_type(source)](stored_path, mode, summary_length, summary_format)
+
+def record_item(job, item, result, seconds):
+    """Store a finished item's result and drop its queued upload"""
+    if isinstance(result, Exception):
+        result = {'error': f"Failed to analyze: {str(result)}"}
+    
+    item.duration_seconds = seconds
+    item.finished_at = datetime.utcnow()
+    
+    if 'error' in result:
+        item.status = 'failed'
+        item.error = result['error']
+        job.items_failed += 1
+    else:
+        result['index'] = item.position + 1
+        result['source'] = item.source
+        result['duration_seconds'] = seconds
+        item.set_result_data(result)
+        item.status = 'done'
+        job.items_done += 1
+    
+    item.finish_order = job.items_done + job.items_failed
+    
+    if item.stored_path and os.path.exists(item.stored_path):
+        os.remove(item.stored_path)
+
+def pending_items(job_id, limit):
+    return BatchItem.query.filter_by(job_id=job_id, status='pending') \
+        .order_by(BatchItem.position).limit(limit).all()
+
+def run_batch_job(app, job_id):
+    """
+    Analyze a job's pending items on the batch worker pool (runs on a background thread)
+    Results are committed one by one as they finish, so completed items can be
+    viewed and exported while the rest are still running. The runner stops when
+    the queue is empty; uploads that add more items start it again.
+    The caller holds the job's lease (see start_batch_job).
+    """
+    with app.app_context():
+        job = db.session.get(BatchJob, job_id)
+        if job is None:
+            release_lease(batch_lease(job_id))
+            return
+        
+        running = {}
+        try:
+            # Only the lease holder runs the job, so running items were left by a process that stopped
+            BatchItem.query.filter_by(job_id=job_id, status='running') \
+                .update({'status': 'pending'}, synchronize_session=False)
+            db.session.commit()
+            
+            with batch_executor(BATCH_WORKERS) as executor:
+                while True:
+                    if not renew_lease(batch_lease(job_id)):
+                        print(f"⏭️ Batch {job_id} was taken over by another process")
+                        return
+                    db.session.refresh(job)
+                    if job.status not in ('receiving', 'running'):
+                        break
+                    
+                    free_workers = BATCH_WORKERS - len(running)
+                    if free_workers > 0:
+                        for item in pending_items(job_id, free_workers):
+                            item.status = 'running'
+                            future = executor.submit(
+                                timed_call, analyze_item, item.kind, item.source, item.stored_path,
+                                job.summary_mode, job.summary_length, job.summary_format
+                            )
+                            running[future] = item
+                        db.session.commit()
+                    
+                    if not running:
+                        break
+                    
+                    done, _ = wait(running, timeout=5, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        result, seconds = future.result()
+                        record_item(job, running.pop(future), result, seconds)
+                    db.session.commit()
+                    
+                    if done:
+                        print(f"📦 Batch {job_id}: {job.items_done + job.items_failed}/{job.items_total} items finished")
+            
+            db.session.refresh(job)
+            if job.status == 'running' and not pending_items(job_id, 1):
+                job.status = 'completed'
+                job.finished_at = datetime.utcnow()
+                print(f"✅ Batch {job_id} completed: {job.items_done} done, {job.items_failed} failed")
+            db.session.commit()
+        
+        except Exception as e:
+            db.session.rollback()
+            job.status = 'failed'
+            job.error = str(e)
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            print(f"❌ Batch {job_id} failed: {e}")
+        
+        finally:
+            # Released before looking for new items: an upload that could not
+            # claim the lease while this runner held it is picked up below
+            try:
+                release_lease(batch_lease(job_id))
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠️ Warning: Could not release batch {job_id}: {e}")
+            with _running_lock:
+                _running_jobs.pop(job_id, None)
+            
+            if job.status in ('completed', 'cancelled', 'failed'):
+                shutil.rmtree(job_folder(job_id), ignore_errors=True)
+            # Items queued while this runner was winding down
+            elif pending_items(job_id, 1):
+                start_batch_job(app, job_id)
+
+def start_batch_job(app, job_id):
+    """
+    Run a batch job's queue on a background thread
+    No-op if it is already running here, or claimed by another server process
+    """
+    with _running_lock:
+        thread = _running_jobs.get(job_id)
+        if thread is not None and thread.is_alive():
+            return False
+        
+        with app.app_context():
+            if not claim_lease(batch_lease(job_id)):
+                return False
+        
+        thread = threading.Thread(target=run_batch_job, args=(app, job_id), name=f"batch-{job_id}", daemon=True)
+        _running_jobs[job_id] = thread
+    thread.start()
+    return True
+
+def resume_batch_jobs(app):
+    """Restart jobs that were open when the server stopped (those no other process holds)"""
+    with app.app_context():
+        job_ids = [job.id for job in BatchJob.query.filter(BatchJob.status.in_(['receiving', 'running'])).all()]
+    
+    resumed = [job_id for job_id in job_ids if start_batch_job(app, job_id)]
+    for job_id in resumed:
+        print(f"🔁 Resuming batch {job_id}")
+    return resumed
@@ -1,12 +1,14 @@
 from services.analyzer import (
     analyze_website, analyze_pdf, analyze_docx,
-    analyze_pptx, analyze_xlsx, analyze_image
+    analyze_pptx, analyze_xlsx, analyze_image, analyze_youtube
 )
-from export_service import export_to_pdf, export_to_docx, export_to_markdown, export_to_json
-import os
+from export_service import render_export, EXPORT_FORMATS
+from async_fetcher import iter_scraped_pages
+from youtube_reader import is_youtube_url
+from upload_stream import open_upload
+from worker_pool import batch_executor, timed_call, iter_cpu_bound
 from werkzeug.utils import secure_filename
 import zipfile
-import io
 
 def get_file_type(filename):
     """Determine file type from extension"""
@@ -25,125 +27,176 @@ def get_file_type(filename):
     else:
         return None
 
-def process_batch_urls(urls, mode="llm", summary_length="short", summary_format="bullets"):
+FILE_ANALYZERS = {
+    "pdf": analyze_pdf,
+    "docx": analyze_docx,
+    "pptx": analyze_pptx,
+    "xlsx": analyze_xlsx,
+    "image": analyze_image
+}
+
+def collect_batch_results(submitted):
     """
-    Process multiple URLs
-    Returns: list of results
+    Wait for submitted batch items and build their results in submission order
+    submitted: list of (index, source, extra fields, future of timed_call)
     """
     results = []
     
-    for idx, url in enumerate(urls):
-        url = url.strip()
-        if not url:
-            continue
+    for idx, source, extra, future in sorted(submitted, key=lambda item: item[0]):
+        result, seconds = future.result()
+        if isinstance(result, Exception):
+            result = {'error': f"Failed to analyze: {str(result)}"}
         
-        try:
-            result = analyze_website(url, mode, summary_length, summary_format)
-            result['index'] = idx + 1
-            result['source'] = url
-            results.append(result)
-        except Exception as e:
-            results.append({
-                'index': idx + 1,
-                'source': url,
-                'error': f"Failed to analyze: {str(e)}"
-            })
+        result['index'] = idx + 1
+        result['source'] = source
+        result['duration_seconds'] = seconds
+        result.update(extra)
+        results.append(result)
     
     return results
 
-def process_batch_files(files, upload_folder, mode="llm", summary_length="short", summary_format="bullets"):
+def process_batch_urls(urls, mode="llm", summary_length="short", summary_format="bullets"):
     """
-    Process multiple files
-    Returns: list of results
+    Process multiple URLs
+    All pages are downloaded concurrently and each is handed to the batch
+    worker pool as soon as it arrives, so analyses overlap with each other
+    and with the remaining downloads
+    YouTube links are analyzed from their captions instead of being scraped
+    Returns: list of results, in the order the URLs were given, with per-item timings
     """
-    results = []
+    entries = [(idx, url.strip()) for idx, url in enumerate(urls) if url.strip()]
+    videos = [(idx, url) for idx, url in entries if is_youtube_url(url)]
+    entries = [(idx, url) for idx, url in entries if not is_youtube_url(url)]
     
-    for idx, file in enumerate(files):
-        if not file or not file.filename:
-            continue
-        
-        try:
-            filename = secure_filename(file.filename)
-            file_type = get_file_type(filename)
-            
-            if not file_type:
-                results.append({
-                    'index': idx + 1,
-                    'source': filename,
-                    'error': 'Unsupported file type'
-                })
-                continue
-            
-            # Save file temporarily
-            path = os.path.join(upload_folder, f"batch_{idx}_{filename}")
-            file.save(path)
-            
-            # Analyze based on type
-            if file_type == "pdf":
-                result = analyze_pdf(path, mode, summary_length, summary_format)
-            elif file_type == "docx":
-                result = analyze_docx(path, mode, summary_length, summary_format)
-            elif file_type == "pptx":
-                result = analyze_pptx(path, mode, summary_length, summary_format)
-            elif file_type == "xlsx":
-                result = analyze_xlsx(path, mode, summary_length, summary_format)
-            elif file_type == "image":
-                result = analyze_image(path, mode, summary_length, summary_format)
-            else:
-                result = {'error': 'Unsupported file type'}
-            
-            result['index'] = idx + 1
-            result['source'] = filename
-            result['file_type'] = file_type
-            results.append(result)
-            
-            # Clean up
-            if os.path.exists(path):
-                os.remove(path)
-                
-        except Exception as e:
-            results.append({
-                'index': idx + 1,
-                'source': file.filename if file else 'Unknown',
-                'error': f"Failed to process: {str(e)}"
-            })
+    submitted = []
     
-    return results
+    with batch_executor(len(videos) + len(entries)) as executor:
+        for idx, url in videos:
+            future = executor.submit(timed_call, analyze_youtube, url, mode, summary_length, summary_format)
+            submitted.append((idx, url, {}, future))
+        
+        for position, url, page in iter_scraped_pages([url for _, url in entries]):
+            idx = entries[position][0]
+            future = executor.submit(timed_call, analyze_website, url, mode, summary_length, summary_format, page=page)
+            submitted.append((idx, url, {}, future))
+        
+        return collect_batch_results(submitted)
 
-def create_batch_export_zip(results, export_format='pdf'):
+def process_batch_files(files, mode="llm", summary_length="short", summary_format="bullets"):
     """
-    Create a ZIP file containing all batch results
-    Returns: BytesIO buffer
+    Process multiple files on the batch worker pool
+    Each upload is parsed from its spooled request stream, never saved to disk
+    Returns: list of results, in upload order, with per-item timings
     """
-    buffer = io.BytesIO()
+    results = []
+    submitted = []
     
-    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for result in results:
-            if 'error' in result:
+    with batch_executor(len(files)) as executor:
+        for idx, file in enumerate(files):
+            if not file or not file.filename:
                 continue
             
             try:
-                filename_base = f"analysis_{result.get('index', 1)}"
+                filename = secure_filename(file.filename)
+                file_type = get_file_type(filename)
                 
-                if export_format == 'pdf':
-                    pdf_buffer = export_to_pdf(result)
-                    zip_file.writestr(f"{filename_base}.pdf", pdf_buffer.getvalue())
+                if not file_type:
+                    results.append({
+                        'index': idx + 1,
+                        'source': filename,
+                        'error': 'Unsupported file type'
+                    })
+                    continue
                 
-                elif export_format == 'docx':
-                    docx_buffer = export_to_docx(result)
-                    zip_file.writestr(f"{filename_base}.docx", docx_buffer.getvalue())
+                stream, size = open_upload(file)
                 
-                elif export_format == 'markdown':
-                    md_content = export_to_markdown(result)
-                    zip_file.writestr(f"{filename_base}.md", md_content)
+                if size == 0:
+                    results.append({
+                        'index': idx + 1,
+                        'source': filename,
+                        'file_type': file_type,
+                        'error': 'Uploaded file is empty'
+                    })
+                    continue
+                
+                future = executor.submit(timed_call, FILE_ANALYZERS[file_type], stream, mode, summary_length, summary_format)
+                submitted.append((idx, filename, {'file_type': file_type}, future))
                 
-                elif export_format == 'json':
-                    json_content = export_to_json(result)
-                    zip_file.writestr(f"{filename_base}.json", json_content)
-            
             except Exception as e:
-                print(f"Error exporting result {result.get('index')}: {e}")
+                results.append({
+                    'index': idx + 1,
+                    'source': file.filename if file else 'Unknown',
+                    'error': f"Failed to process: {str(e)}"
+                })
+        
+        results.extend(collect_batch_results(submitted))
+    
+    results.sort(key=lambda result: result['index'])
+    return results
+
+class ZipStreamSink:
+    """
+    Write-only, unseekable ZIP target
+    ZipFile falls back to data descriptors for it, so each entry can be sent
+    as soon as it is written instead of after the whole archive is built
+    """
+    
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self._offset
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        """Bytes written since the last drain"""
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def render_export_entry(result, export_format):
+    """
+    Render one result for a batch export (runs on the CPU worker pool)
+    Returns: (file name in the ZIP, bytes)
+    """
+    extension = EXPORT_FORMATS[export_format][0]
+    return f"analysis_{result.get('index', 1)}.{extension}", render_export(result, export_format)
+
+def stream_batch_export_zip(results, export_format):
+    """Render results in parallel and yield the ZIP chunk by chunk as entries finish"""
+    sink = ZipStreamSink()
+    
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        renders = ((result, export_format) for result in results if 'error' not in result)
+        
+        for (result, _), entry in iter_cpu_bound(render_export_entry, renders):
+            if isinstance(entry, Exception):
+                print(f"Error exporting result {result.get('index')}: {entry}")
                 continue
+            
+            filename, data = entry
+            zip_file.writestr(filename, data)
+            yield sink.drain()
+    
+    # Central directory
+    yield sink.drain()
+
+def create_batch_export_zip(results, export_format='pdf'):
+    """
+    Create a ZIP file containing all batch results
+    Entries are rendered on the CPU worker pool and streamed in the order
+    they finish; only the entries being rendered are held in memory
+    Returns: generator of ZIP bytes, for a streamed response
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise Exception(f"Unsupported export format: {export_format}")
     
-    buffer.seek(0)
-    return buffer
\ No newline at end of file
+    return stream_batch_export_zip(results, export_format)
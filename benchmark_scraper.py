@@ -0,0 +1,115 @@
+"""
+Benchmark the lxml content extractor against the original BeautifulSoup one
+
+Usage:
+    python benchmark_scraper.py --save URL [URL ...]   # add pages to the corpus
+    python benchmark_scraper.py [corpus folder]         # compare both extractors
+
+For every saved page it reports parse+extract time for both extractors and
+how much of the baseline's text the new extractor still finds (recall).
+The committed corpus in benchmark_pages/ holds real pages from several site
+generators (see benchmark_pages/SOURCES.md).
+"""
+import os
+import re
+import sys
+import time
+import hashlib
+import statistics
+from bs4 import BeautifulSoup
+from scraper import extract_page
+from http_fetcher import fetch_url
+
+CORPUS_FOLDER = "benchmark_pages"
+RUNS_PER_PAGE = 3
+
+def baseline_extract(html_text):
+    """The original html.parser/BeautifulSoup extraction, kept for comparison"""
+    soup = BeautifulSoup(html_text, "html.parser")
+    title = soup.title.text.strip() if soup.title else "Website"
+
+    for element in soup(['script', 'style', 'nav', 'header', 'footer',
+                        'aside', 'iframe', 'noscript', 'form']):
+        element.decompose()
+
+    main_content = None
+    for selector in ['main', 'article', '[role="main"]', '.main-content', '.content',
+                     '#main', '#content', '.article-content', '.post-content']:
+        main_content = soup.select_one(selector)
+        if main_content:
+            break
+
+    if not main_content:
+        main_content = soup.find("body")
+    if not main_content:
+        return {"error": "Could not extract content from webpage"}
+
+    content_parts = []
+    for element in main_content.find_all(['h1', 'h2', 'h3', 'p', 'li']):
+        text = element.get_text(strip=True)
+        if text and len(text) > 20:
+            content_parts.append(text)
+
+    content = re.sub(r'\s+', ' ', " ".join(content_parts)).strip()
+    return {"title": title, "content": content}
+
+def words(text):
+    return set(re.findall(r'\w+', text.lower()))
+
+def time_extractor(extractor, html_text):
+    timings = []
+    result = None
+    for _ in range(RUNS_PER_PAGE):
+        start = time.perf_counter()
+        result = extractor(html_text)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def save_pages(urls, folder=CORPUS_FOLDER):
+    os.makedirs(folder, exist_ok=True)
+    for url in urls:
+        try:
+            response = fetch_url(url)
+        except Exception as e:
+            print(f"❌ {url}: {e}")
+            continue
+        name = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+        with open(os.path.join(folder, f"{name}.html"), "w", encoding="utf-8") as f:
+            f.write(response.text)
+        print(f"✅ Saved {url} ({len(response.content):,} bytes)")
+
+def run_benchmark(folder=CORPUS_FOLDER):
+    pages = sorted(name for name in os.listdir(folder) if name.endswith((".html", ".htm")))
+    if not pages:
+        print(f"❌ No .html pages in {folder}/ - add some with --save URL")
+        return
+
+    baseline_times, new_times, recalls = [], [], []
+
+    print(f"{'page':<24} {'size':>10} {'bs4 ms':>9} {'lxml ms':>9} {'speedup':>8} {'recall':>7}")
+    for name in pages:
+        with open(os.path.join(folder, name), "r", encoding="utf-8", errors="replace") as f:
+            html_text = f.read()
+
+        baseline_time, baseline = time_extractor(baseline_extract, html_text)
+        new_time, result = time_extractor(extract_page, html_text)
+
+        baseline_words = words(baseline.get("content", ""))
+        new_words = words(result.get("content", ""))
+        recall = len(baseline_words & new_words) / len(baseline_words) if baseline_words else 1.0
+
+        baseline_times.append(baseline_time)
+        new_times.append(new_time)
+        recalls.append(recall)
+
+        print(f"{name[:24]:<24} {len(html_text):>10,} {baseline_time * 1000:>9.1f} {new_time * 1000:>9.1f} "
+              f"{baseline_time / new_time:>7.1f}x {recall:>7.1%}")
+
+    print(f"\n📊 {len(pages)} pages: bs4 {sum(baseline_times) * 1000:.0f} ms, lxml {sum(new_times) * 1000:.0f} ms "
+          f"({sum(baseline_times) / sum(new_times):.1f}x faster), median recall {statistics.median(recalls):.1%}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--save":
+        save_pages(sys.argv[2:])
+    else:
+        run_benchmark(sys.argv[1] if len(sys.argv) > 1 else CORPUS_FOLDER)
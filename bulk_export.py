@@ -0,0 +1,276 @@
+import os
+import io
+import csv
+import json
+import threading
+from datetime import datetime
+from reportlab.platypus import PageBreak
+from docx import Document
+
+from models import db, Analysis, ExportJob
+from export_service import pdf_document, pdf_story, add_docx_analysis
+from search_index import search_analyses
+from leases import claim_lease, release_lease
+
+# Parquet exports need pyarrow; the other formats work without it
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+    print("pyarrow not installed. Parquet exports are disabled. Install with: pip install pyarrow")
+
+# Finished export files, one per job
+EXPORT_JOB_FOLDER = "export_jobs"
+
+# Rows fetched from the database at a time, so memory stays flat however big the export
+YIELD_PER = 200
+
+# JSONL/CSV exports up to this many rows are streamed straight to the browser,
+# bigger ones (and every Parquet/PDF/Word export) run as a background job
+STREAM_EXPORT_MAX_ROWS = 10000
+
+# A combined report is laid out as one document, so it has to fit in memory
+MAX_COMBINED_REPORT_ROWS = 1000
+
+# An export is written in one pass over a streamed query, where the session
+# can't commit, so its lease is taken long enough for the largest export
+# instead of being renewed (a job whose process died on this host is resumed
+# straight away)
+EXPORT_LEASE_SECONDS = 6 * 3600
+
+# File extension and MIME type of each bulk export format
+BULK_EXPORT_FORMATS = {
+    'jsonl': ('jsonl', 'application/x-ndjson'),
+    'csv': ('csv', 'text/csv'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'pdf': ('pdf', 'application/pdf'),
+    'docx': ('docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+}
+STREAMABLE_FORMATS = {'jsonl', 'csv'}
+COMBINED_FORMATS = {'pdf', 'docx'}
+
+HISTORY_FILTERS = ['search', 'source_type', 'collection', 'favorites']
+
+CSV_COLUMNS = [
+    'id', 'created_at', 'title', 'source_type', 'source_url', 'collection_id', 'tags',
+    'is_favorite', 'summary_mode', 'summary_format', 'summary_length',
+    'word_count', 'reading_time', 'summary', 'notes'
+]
+
+# Rows written so far by running export jobs (committed to the job when it finishes)
+_progress = {}
+_running_jobs = {}
+_running_lock = threading.Lock()
+
+def export_lease(job_id):
+    return f"export:{job_id}"
+
+def history_filters(args):
+    """The history filters set in request args, without empty values"""
+    return {name: args.get(name, '').strip() for name in HISTORY_FILTERS if args.get(name, '').strip()}
+
+def history_query(user_id, filters):
+    """A user's analyses matching the history filters, newest first (best match first when searching)"""
+    query = Analysis.query.filter_by(user_id=user_id)
+    
+    if filters.get('source_type'):
+        query = query.filter_by(source_type=filters['source_type'])
+    
+    if filters.get('collection'):
+        query = query.filter_by(collection_id=int(filters['collection']))
+    
+    if filters.get('favorites') == 'true':
+        query = query.filter_by(is_favorite=True)
+    
+    if filters.get('search'):
+        return search_analyses(query, filters['search'])
+    
+    return query.order_by(Analysis.created_at.desc())
+
+def analysis_row(analysis):
+    """Flat record of an analysis for CSV / Parquet"""
+    result = analysis.get_result_data()
+    summary = result.get('executive_summary', []) + result.get('detailed_summary', [])
+    
+    return {
+        'id': analysis.id,
+        'created_at': analysis.created_at.isoformat() if analysis.created_at else None,
+        'title': analysis.title,
+        'source_type': analysis.source_type,
+        'source_url': analysis.source_url,
+        'collection_id': analysis.collection_id,
+        'tags': analysis.tags,
+        'is_favorite': bool(analysis.is_favorite),
+        'summary_mode': analysis.summary_mode,
+        'summary_format': analysis.summary_format,
+        'summary_length': analysis.summary_length,
+        'word_count': analysis.word_count,
+        'reading_time': analysis.reading_time,
+        'summary': "\n".join(str(point) for point in summary),
+        'notes': analysis.notes
+    }
+
+def iter_jsonl(query):
+    """One JSON line per analysis: its fields plus the full result"""
+    for analysis in query.yield_per(YIELD_PER):
+        record = analysis_row(analysis)
+        del record['summary']
+        record['result'] = analysis.get_result_data()
+        yield json.dumps(record, default=str) + "\n"
+
+def iter_csv(query):
+    """CSV text, header first, one row per analysis"""
+    line = io.StringIO()
+    writer = csv.DictWriter(line, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+    
+    for analysis in query.yield_per(YIELD_PER):
+        writer.writerow(analysis_row(analysis))
+        yield line.getvalue()
+        line.seek(0)
+        line.truncate()
+    
+    yield line.getvalue()
+
+def iter_bulk_export(query, export_format):
+    """Chunks of a streamed JSONL / CSV export"""
+    return iter_jsonl(query) if export_format == 'jsonl' else iter_csv(query)
+
+def write_lines(chunks, path, job_id):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for count, chunk in enumerate(chunks, start=1):
+            f.write(chunk)
+            _progress[job_id] = count
+
+def write_parquet(query, path, job_id):
+    """Parquet file written one row group per YIELD_PER analyses"""
+    if pq is None:
+        raise Exception("Parquet export needs pyarrow. Install with: pip install pyarrow")
+    
+    schema = pa.schema([
+        ('id', pa.int64()), ('created_at', pa.string()), ('title', pa.string()),
+        ('source_type', pa.string()), ('source_url', pa.string()), ('collection_id', pa.int64()),
+        ('tags', pa.string()), ('is_favorite', pa.bool_()), ('summary_mode', pa.string()),
+        ('summary_format', pa.string()), ('summary_length', pa.string()), ('word_count', pa.int64()),
+        ('reading_time', pa.string()), ('summary', pa.string()), ('notes', pa.string()),
+        ('result', pa.string())
+    ])
+    
+    rows = []
+    written = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for analysis in query.yield_per(YIELD_PER):
+            row = analysis_row(analysis)
+            row['result'] = analysis.result_data
+            rows.append(row)
+            
+            if len(rows) >= YIELD_PER:
+                writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+                written += len(rows)
+                _progress[job_id] = written
+                rows = []
+        
+        if rows:
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+
+def write_combined_pdf(query, path, job_id):
+    """All analyses in one PDF, each starting on a new page"""
+    story = []
+    for count, analysis in enumerate(query.yield_per(YIELD_PER), start=1):
+        if story:
+            story.append(PageBreak())
+        story.extend(pdf_story(analysis.get_result_data()))
+        _progress[job_id] = count
+    
+    pdf_document(path).build(story)
+
+def write_combined_docx(query, path, job_id):
+    """All analyses in one Word document, each starting on a new page"""
+    doc = Document()
+    for count, analysis in enumerate(query.yield_per(YIELD_PER), start=1):
+        if count > 1:
+            doc.add_page_break()
+        add_docx_analysis(doc, analysis.get_result_data())
+        _progress[job_id] = count
+    
+    doc.save(path)
+
+def export_progress(job):
+    """Rows written so far, live while the job runs"""
+    return _progress.get(job.id, job.rows_written) if job.status == 'running' else job.rows_written
+
+def run_export_job(app, job_id):
+    """Write an export job's file (runs on a background thread; the caller holds the job's lease)"""
+    with app.app_context():
+        job = db.session.get(ExportJob, job_id)
+        if job is None:
+            release_lease(export_lease(job_id))
+            return
+        
+        try:
+            os.makedirs(EXPORT_JOB_FOLDER, exist_ok=True)
+            path = os.path.join(EXPORT_JOB_FOLDER, f"export_{job.id}.{BULK_EXPORT_FORMATS[job.format][0]}")
+            query = history_query(job.user_id, job.get_filters())
+            print(f"📦 Export {job_id}: writing {job.rows_total} analyses as {job.format}")
+            
+            if job.format in STREAMABLE_FORMATS:
+                write_lines(iter_bulk_export(query, job.format), path, job_id)
+            elif job.format == 'parquet':
+                write_parquet(query, path, job_id)
+            elif job.format == 'pdf':
+                write_combined_pdf(query, path, job_id)
+            else:
+                write_combined_docx(query, path, job_id)
+            
+            job.path = path
+            job.rows_written = job.rows_total
+            job.status = 'completed'
+            print(f"✅ Export {job_id} completed: {path}")
+        
+        except Exception as e:
+            db.session.rollback()
+            job.status = 'failed'
+            job.error = str(e)
+            print(f"❌ Export {job_id} failed: {e}")
+        
+        finally:
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            _progress.pop(job_id, None)
+            try:
+                release_lease(export_lease(job_id))
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠️ Warning: Could not release export {job_id}: {e}")
+            with _running_lock:
+                _running_jobs.pop(job_id, None)
+
+def start_export_job(app, job_id):
+    """
+    Run an export job on a background thread
+    No-op if it is already running here, or claimed by another server process
+    """
+    with _running_lock:
+        thread = _running_jobs.get(job_id)
+        if thread is not None and thread.is_alive():
+            return False
+        
+        with app.app_context():
+            if not claim_lease(export_lease(job_id), EXPORT_LEASE_SECONDS):
+                return False
+        
+        thread = threading.Thread(target=run_export_job, args=(app, job_id), name=f"export-{job_id}", daemon=True)
+        _running_jobs[job_id] = thread
+    thread.start()
+    return True
+
+def resume_export_jobs(app):
+    """Restart exports that were being written when the server stopped (those no other process holds)"""
+    with app.app_context():
+        job_ids = [job.id for job in ExportJob.query.filter_by(status='running').all()]
+    
+    resumed = [job_id for job_id in job_ids if start_export_job(app, job_id)]
+    for job_id in resumed:
+        print(f"🔁 Restarting export {job_id}")
+    return resumed
@@ -1,7 +1,12 @@
 from openai import OpenAI
 from dotenv import load_dotenv
+from worker_pool import llm_slots
 import os
 from document_store import search_documents
+from spreadsheet_store import (
+    has_spreadsheet, get_schema, describe_schema, detect_aggregate,
+    build_template_query, validate_query, run_query, format_result
+)
 import re
 
 load_dotenv()
@@ -93,8 +98,9 @@ def simple_keyword_search(question, doc_id):
             "sources": [
                 {
                     "text": clean_chunk_text(chunk['text'])[:200] + "...",
-                    "chunk_index": chunk['metadata'].get('child_index', 0),
-                    "section": chunk.get('section', 'Unknown')
+                    "chunk_index": chunk['metadata'].get('chunk_index', 0),
+                    "section": chunk.get('section', 'Unknown'),
+                    "locator": chunk['metadata'].get('locator', '')
                 }
                 for chunk in relevant_chunks
             ],
@@ -151,14 +157,15 @@ CURRENT QUESTION: {question}
 Please provide a detailed, well-structured answer:"""
     
     try:
-        response = gemini_model.generate_content(
-            full_prompt,
-            generation_config={
-                'temperature': 0.3,
-                'max_output_tokens': 1200,  # Longer answers
-                'top_p': 0.95,
-            }
-        )
+        with llm_slots:
+            response = gemini_model.generate_content(
+                full_prompt,
+                generation_config={
+                    'temperature': 0.3,
+                    'max_output_tokens': 1200,  # Longer answers
+                    'top_p': 0.95,
+                }
+            )
         
         return response.text.strip()
     except Exception as e:
@@ -214,15 +221,113 @@ Question: {question}
 Provide a detailed, well-structured answer based on the excerpts:"""
     })
     
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
-        temperature=0.3,
-        max_tokens=1200
-    )
+    with llm_slots:
+        response = client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0.3,
+            max_tokens=1200
+        )
     
     return response.choices[0].message.content.strip()
 
+def generate_sql_query(question, schema_text):
+    """
+    Ask the LLM for a SQLite query answering the question
+    Returns: SQL string, or None if the question can't be answered with SQL
+    """
+    prompt = f"""You write SQLite queries over tables loaded from a spreadsheet.
+
+SCHEMA:
+{schema_text}
+
+RULES:
+- Return ONE SELECT statement and nothing else (no explanation, no markdown)
+- Use only the tables and columns listed above, quoted exactly as shown
+- Aggregate in SQL (SUM, AVG, COUNT, MIN, MAX, GROUP BY) rather than listing raw rows
+- If the question cannot be answered from these tables, return NONE
+
+QUESTION: {question}
+
+SQL:"""
+    
+    sql = None
+    
+    if gemini_model:
+        try:
+            with llm_slots:
+                response = gemini_model.generate_content(
+                    prompt,
+                    generation_config={'temperature': 0.0, 'max_output_tokens': 300}
+                )
+            sql = response.text
+        except Exception as e:
+            print(f"Gemini SQL generation failed: {e}, trying OpenAI...")
+    
+    if not sql and client:
+        with llm_slots:
+            response = client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.0,
+                max_tokens=300
+            )
+        sql = response.choices[0].message.content
+    
+    if not sql:
+        return None
+    
+    # Strip markdown fences the model may add anyway
+    sql = re.sub(r'^```(?:sql)?|```$', '', sql.strip(), flags=re.IGNORECASE).strip()
+    
+    if not sql or sql.upper().startswith("NONE"):
+        return None
+    
+    return sql
+
+def chat_with_spreadsheet(question, doc_id):
+    """
+    Answer aggregate questions about a spreadsheet with SQL instead of RAG
+    
+    Process:
+    1. Skip narrative questions (no aggregate keyword) - those go to RAG
+    2. Try a template query built from the schema (no tokens spent)
+    3. Otherwise ask the LLM for SQL, validated against the schema
+    4. Run it read-only and format the rows as the answer
+    
+    Returns: chat result dict, or None to fall back to RAG
+    """
+    if not detect_aggregate(question):
+        return None
+    
+    schema = get_schema(doc_id)
+    
+    template = build_template_query(question, schema)
+    if template:
+        sql, description = template
+    else:
+        sql = generate_sql_query(question, describe_schema(schema))
+        if not sql:
+            return None
+        description = "Query result"
+    
+    sql = validate_query(doc_id, sql)
+    print(f"🧮 Answering with SQL: {sql}")
+    columns, rows = run_query(doc_id, sql)
+    
+    return {
+        "answer": format_result(description, columns, rows),
+        "sources": [
+            {
+                "text": sql,
+                "chunk_index": 0,
+                "section": "SQL query over spreadsheet",
+                "locator": "SQL query"
+            }
+        ],
+        "error": None
+    }
+
 def chat_with_document(question, doc_id, conversation_history=None):
     """
     Enhanced chat with document using parent-child RAG
@@ -236,6 +341,15 @@ def chat_with_document(question, doc_id, conversation_history=None):
     """
     
     try:
+        # Aggregate questions over spreadsheets are answered exactly with SQL
+        if has_spreadsheet(doc_id):
+            try:
+                sql_result = chat_with_spreadsheet(question, doc_id)
+                if sql_result:
+                    return sql_result
+            except Exception as e:
+                print(f"⚠️ SQL answer failed, falling back to document search: {e}")
+        
         # STEP 1: Search for relevant chunks (returns parent chunks based on child matches)
         relevant_chunks = search_documents(question, doc_id=doc_id, top_k=3)  # 3 parents = rich context
         
@@ -308,8 +422,9 @@ def chat_with_document(question, doc_id, conversation_history=None):
             "sources": [
                 {
                     "text": clean_chunk_text(chunk.get('child_text', chunk['text']))[:250] + "...",
-                    "chunk_index": chunk['metadata'].get('child_index', 0),
-                    "section": chunk.get('section', 'Unknown Section')
+                    "chunk_index": chunk['metadata'].get('chunk_index', 0),
+                    "section": chunk.get('section', 'Unknown Section'),
+                    "locator": chunk['metadata'].get('locator', '')
                 }
                 for chunk in relevant_chunks
             ],
@@ -376,13 +491,14 @@ Generate 4 questions:"""
         # Try Gemini first (free tier)
         if gemini_model:
             try:
-                response = gemini_model.generate_content(
-                    prompt,
-                    generation_config={
-                        'temperature': 0.7,
-                        'max_output_tokens': 250,
-                    }
-                )
+                with llm_slots:
+                    response = gemini_model.generate_content(
+                        prompt,
+                        generation_config={
+                            'temperature': 0.7,
+                            'max_output_tokens': 250,
+                        }
+                    )
                 
                 questions = [q.strip() for q in response.text.strip().split('\n') if q.strip()]
                 
@@ -408,18 +524,19 @@ Generate 4 questions:"""
         # Try OpenAI if Gemini failed or unavailable
         if client:
             try:
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {
-                            "role": "system", 
-                            "content": "You generate specific, insightful questions that help people understand document content."
-                        },
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.7,
-                    max_tokens=250
-                )
+                with llm_slots:
+                    response = client.chat.completions.create(
+                        model="gpt-4o-mini",
+                        messages=[
+                            {
+                                "role": "system", 
+                                "content": "You generate specific, insightful questions that help people understand document content."
+                            },
+                            {"role": "user", "content": prompt}
+                        ],
+                        temperature=0.7,
+                        max_tokens=250
+                    )
                 
                 questions = [q.strip() for q in response.choices[0].message.content.strip().split('\n') if q.strip()]
                 
@@ -0,0 +1,363 @@
+import os
+import re
+import gzip
+import sqlite3
+import hashlib
+import threading
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, urljoin
+from urllib.robotparser import RobotFileParser
+
+from models import db, CrawlJob, Analysis
+from leases import claim_lease, renew_lease, release_lease
+from http_fetcher import fetch_url, USER_AGENT
+from async_fetcher import iter_scraped_pages
+from services.analyzer import analyze_website
+
+# One SQLite frontier per crawl job, so a restart picks up where it stopped
+CRAWL_FOLDER = "crawl_jobs"
+# Pages fetched concurrently per round
+CRAWL_BATCH_SIZE = 10
+MAX_CRAWL_PAGES = 5000
+MAX_CRAWL_DEPTH = 5
+MAX_SITEMAP_FILES = 20
+
+SKIPPED_EXTENSIONS = {
+    ".pdf", ".zip", ".gz", ".tar", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".ico",
+    ".mp3", ".mp4", ".avi", ".mov", ".css", ".js", ".json", ".xml", ".rss", ".exe", ".dmg",
+    ".doc", ".docx", ".ppt", ".pptx", ".xls", ".xlsx", ".woff", ".woff2", ".ttf"
+}
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref", "ref_src"}
+DEFAULT_PORTS = {("http", 80), ("https", 443)}
+
+# Crawls running in this process, by job id
+_running_crawls = {}
+_running_lock = threading.Lock()
+
+def crawl_lease(job_id):
+    return f"crawl:{job_id}"
+
+def normalize_url(url, base=None):
+    """
+    Canonical form of a URL for the frontier: lower-case scheme/host, no
+    default port, no fragment, no tracking parameters, sorted query
+    Returns None for anything that isn't a plain http(s) URL
+    """
+    if base:
+        url = urljoin(base, url)
+    
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if scheme not in ("http", "https") or not host:
+        return None
+    
+    netloc = host if port is None or (scheme, port) in DEFAULT_PORTS else f"{host}:{port}"
+    path = re.sub(r'/{2,}', '/', parts.path or "/")
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    ))
+    
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+def crawl_scope(seed_url):
+    """Host and path prefix a crawl stays within (the seed's directory)"""
+    parts = urlsplit(normalize_url(seed_url))
+    prefix = parts.path if parts.path.endswith("/") else parts.path.rsplit("/", 1)[0] + "/"
+    return parts.netloc, prefix
+
+def in_scope(url, scope):
+    parts = urlsplit(url)
+    if parts.netloc != scope[0] or not parts.path.startswith(scope[1]):
+        return False
+    return os.path.splitext(parts.path)[1].lower() not in SKIPPED_EXTENSIONS
+
+def content_hash(text):
+    """Hash of the extracted text, so mirrors and duplicate URLs are analyzed once"""
+    normalized = " ".join(text.lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+class CrawlFrontier:
+    """
+    Persistent crawl frontier: every URL seen, its depth and state, plus the
+    content hashes already analyzed. URL states: pending, fetching,
+    analyzed, duplicate, failed
+    """
+    
+    def __init__(self, job_id):
+        os.makedirs(CRAWL_FOLDER, exist_ok=True)
+        self.path = os.path.join(CRAWL_FOLDER, f"crawl_{int(job_id)}.sqlite")
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, depth INTEGER, "
+            "status TEXT DEFAULT 'pending', error TEXT, analysis_id INTEGER)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_urls_status ON urls (status, depth)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS content_hashes (hash TEXT PRIMARY KEY, url TEXT)")
+        self.conn.commit()
+    
+    def is_empty(self):
+        return self.conn.execute("SELECT 1 FROM urls LIMIT 1").fetchone() is None
+    
+    def add(self, entries):
+        """Queue (url, depth) pairs; URLs already known are ignored. Returns how many were new"""
+        before = self.conn.total_changes
+        self.conn.executemany("INSERT OR IGNORE INTO urls (url, depth) VALUES (?, ?)", entries)
+        self.conn.commit()
+        return self.conn.total_changes - before
+    
+    def next_batch(self, size):
+        """Claim the next pending URLs, shallowest first"""
+        rows = self.conn.execute(
+            "SELECT url, depth FROM urls WHERE status = 'pending' ORDER BY depth, rowid LIMIT ?",
+            (size,)
+        ).fetchall()
+        self.conn.executemany("UPDATE urls SET status = 'fetching' WHERE url = ?", [(url,) for url, _ in rows])
+        self.conn.commit()
+        return rows
+    
+    def mark(self, url, status, error=None, analysis_id=None):
+        self.conn.execute(
+            "UPDATE urls SET status = ?, error = ?, analysis_id = ? WHERE url = ?",
+            (status, error, analysis_id, url)
+        )
+        self.conn.commit()
+    
+    def reset_in_progress(self):
+        """URLs claimed by a crawl that was interrupted go back in the queue"""
+        self.conn.execute("UPDATE urls SET status = 'pending' WHERE status = 'fetching'")
+        self.conn.commit()
+    
+    def claim_hash(self, text_hash, url):
+        """Record a content hash; False if the same content was already seen"""
+        cursor = self.conn.execute("INSERT OR IGNORE INTO content_hashes VALUES (?, ?)", (text_hash, url))
+        self.conn.commit()
+        return cursor.rowcount == 1
+    
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+    
+    def close(self):
+        self.conn.close()
+
+def read_robots(seed_url):
+    """robots.txt for the seed's host; a missing or unreadable file allows everything"""
+    parts = urlsplit(seed_url)
+    robots = RobotFileParser()
+    try:
+        response = fetch_url(f"{parts.scheme}://{parts.netloc}/robots.txt")
+        robots.parse(response.text.splitlines())
+    except Exception:
+        robots.parse([])
+    return robots
+
+def iter_sitemap_urls(seed_url, robots, limit):
+    """
+    Page URLs listed in the site's sitemaps (robots.txt Sitemap: lines, or
+    /sitemap.xml), following sitemap indexes up to MAX_SITEMAP_FILES files
+    """
+    parts = urlsplit(seed_url)
+    queue = list(robots.site_maps() or []) or [f"{parts.scheme}://{parts.netloc}/sitemap.xml"]
+    seen = set()
+    found = 0
+    
+    while queue and len(seen) < MAX_SITEMAP_FILES and found < limit:
+        sitemap_url = queue.pop(0)
+        if sitemap_url in seen:
+            continue
+        seen.add(sitemap_url)
+        
+        try:
+            data = fetch_url(sitemap_url).content
+            if sitemap_url.endswith(".gz") or data[:2] == b"\x1f\x8b":
+                data = gzip.decompress(data)
+            root = ET.fromstring(data)
+        except Exception as e:
+            print(f"⚠️ Could not read sitemap {sitemap_url}: {e}")
+            continue
+        
+        is_index = root.tag.endswith("sitemapindex")
+        for element in root.iter():
+            if not element.tag.endswith("loc") or not element.text:
+                continue
+            location = element.text.strip()
+            if is_index:
+                queue.append(location)
+            else:
+                found += 1
+                yield location
+                if found >= limit:
+                    return
+
+def save_crawled_analysis(job, url, result):
+    """Store one crawled page as an Analysis in the job's collection"""
+    analysis = Analysis(
+        user_id=job.user_id,
+        collection_id=job.collection_id,
+        title=result.get('title', 'Untitled'),
+        source_type='website',
+        source_url=url,
+        doc_id=result.get('doc_id'),
+        summary_format=job.summary_format,
+        summary_mode=job.summary_mode,
+        summary_length=job.summary_length,
+        word_count=result.get('analysis', {}).get('reading_time', {}).get('word_count', 0),
+        reading_time=result.get('analysis', {}).get('reading_time', {}).get('reading_time', 'Unknown'),
+        tags='crawl'
+    )
+    analysis.set_result_data(result)
+    db.session.add(analysis)
+    db.session.commit()
+    return analysis.id
+
+def crawl_page(job, frontier, url, depth, page, scope, robots):
+    """Queue a fetched page's links, then dedup and analyze its content"""
+    new_links = []
+    if depth < job.max_depth:
+        for link in page.pop("links", []):
+            link = normalize_url(link)
+            if link and in_scope(link, scope) and robots.can_fetch(USER_AGENT, link):
+                new_links.append((link, depth + 1))
+        frontier.add(new_links)
+    
+    if "error" in page:
+        frontier.mark(url, "failed", page["error"])
+        job.pages_failed += 1
+        return
+    
+    if not frontier.claim_hash(content_hash(page["content"]), url):
+        frontier.mark(url, "duplicate")
+        job.pages_duplicate += 1
+        return
+    
+    result = analyze_website(url, job.summary_mode, job.summary_length, job.summary_format, page=page)
+    if "error" in result:
+        frontier.mark(url, "failed", result["error"])
+        job.pages_failed += 1
+        return
+    
+    analysis_id = save_crawled_analysis(job, url, result)
+    frontier.mark(url, "analyzed", analysis_id=analysis_id)
+    job.pages_analyzed += 1
+
+def run_crawl(app, job_id):
+    """Crawl a site breadth-first into the job's collection (runs on a background thread)"""
+    with app.app_context():
+        job = db.session.get(CrawlJob, job_id)
+        if job is None:
+            return
+        
+        frontier = CrawlFrontier(job_id)
+        try:
+            job.status = 'running'
+            db.session.commit()
+            print(f"🕸️ Crawl {job_id} started: {job.seed_url}")
+            
+            scope = crawl_scope(job.seed_url)
+            robots = read_robots(job.seed_url)
+            frontier.reset_in_progress()
+            
+            if frontier.is_empty():
+                seed = normalize_url(job.seed_url)
+                frontier.add([(seed, 0)])
+                sitemap_urls = []
+                for location in iter_sitemap_urls(seed, robots, limit=MAX_CRAWL_PAGES * 2):
+                    location = normalize_url(location)
+                    if location and in_scope(location, scope) and robots.can_fetch(USER_AGENT, location):
+                        sitemap_urls.append((location, 1))
+                added = frontier.add(sitemap_urls)
+                if added:
+                    print(f"🗺️ {added} URLs queued from sitemap")
+            
+            while job.pages_analyzed < job.max_pages:
+                if not renew_lease(crawl_lease(job_id)):
+                    print(f"⏭️ Crawl {job_id} was taken over by another process")
+                    return
+                db.session.refresh(job)
+                if job.status == 'cancelled':
+                    break
+                
+                batch = frontier.next_batch(min(CRAWL_BATCH_SIZE, job.max_pages - job.pages_analyzed))
+                if not batch:
+                    break
+                
+                depths = dict(batch)
+                for _, url, page in iter_scraped_pages([url for url, _ in batch], include_links=True):
+                    try:
+                        crawl_page(job, frontier, url, depths[url], page, scope, robots)
+                    except Exception as e:
+                        db.session.rollback()
+                        frontier.mark(url, "failed", str(e))
+                        job.pages_failed += 1
+                    
+                    # Analyzing a page can take a while, so the lease is renewed after each one
+                    if not renew_lease(crawl_lease(job_id)):
+                        print(f"⏭️ Crawl {job_id} was taken over by another process")
+                        return
+                
+                job.pages_discovered = frontier.count()
+                db.session.commit()
+                print(f"🕸️ Crawl {job_id}: {job.pages_analyzed}/{job.max_pages} analyzed, "
+                      f"{job.pages_discovered} discovered")
+            
+            db.session.refresh(job)
+            if job.status != 'cancelled':
+                job.status = 'completed'
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            print(f"✅ Crawl {job_id} {job.status}: {job.pages_analyzed} pages analyzed")
+        
+        except Exception as e:
+            db.session.rollback()
+            job.status = 'failed'
+            job.error = str(e)
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            print(f"❌ Crawl {job_id} failed: {e}")
+        
+        finally:
+            frontier.close()
+            try:
+                release_lease(crawl_lease(job_id))
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠️ Warning: Could not release crawl {job_id}: {e}")
+            with _running_lock:
+                _running_crawls.pop(job_id, None)
+
+def start_crawl(app, job_id):
+    """
+    Run a crawl job on a background thread
+    No-op if it is already running here, or claimed by another server process
+    """
+    with _running_lock:
+        thread = _running_crawls.get(job_id)
+        if thread is not None and thread.is_alive():
+            return False
+        
+        with app.app_context():
+            if not claim_lease(crawl_lease(job_id)):
+                return False
+        
+        thread = threading.Thread(target=run_crawl, args=(app, job_id), name=f"crawl-{job_id}", daemon=True)
+        _running_crawls[job_id] = thread
+    thread.start()
+    return True
+
+def resume_crawls(app):
+    """Restart crawls that were queued or running when the server stopped (those no other process holds)"""
+    with app.app_context():
+        job_ids = [job.id for job in CrawlJob.query.filter(CrawlJob.status.in_(['queued', 'running'])).all()]
+    
+    resumed = [job_id for job_id in job_ids if start_crawl(app, job_id)]
+    for job_id in resumed:
+        print(f"🔁 Resuming crawl {job_id}")
+    return resumed
@@ -1,10 +1,20 @@
+import os
 import chromadb
 import hashlib
 from sentence_transformers import SentenceTransformer
 import tiktoken
+from segments import describe_locator_range
+
+# Ingest worker processes (main.py) set DEFER_VECTOR_WRITES=1: the on-disk
+# PersistentClient is not safe to open from several processes, so workers
+# only embed chunks and the parent process adds them (see add_deferred_chunks)
+DEFER_WRITES = os.getenv("DEFER_VECTOR_WRITES") == "1"
 
 # Initialize ChromaDB
-chroma_client = chromadb.PersistentClient(path="./chroma_db")
+chroma_client = None if DEFER_WRITES else chromadb.PersistentClient(path="./chroma_db")
+
+# Embedded chunk batches held back in DEFER_WRITES mode, by doc_id
+_deferred_batches = {}
 
 # Initialize embedding model
 try:
@@ -15,14 +25,20 @@ except Exception as e:
     embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
     print("✅ Using fallback all-MiniLM-L6-v2 model")
 
+# Chunks are embedded and added to ChromaDB in batches of this size
+EMBED_BATCH_SIZE = 64
+
+def get_encoding():
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except:
+        return tiktoken.get_encoding("gpt2")
+
 def chunk_text(text, chunk_size=500, overlap=100):
     """
     Chunk text into overlapping pieces
     """
-    try:
-        encoding = tiktoken.get_encoding("cl100k_base")
-    except:
-        encoding = tiktoken.get_encoding("gpt2")
+    encoding = get_encoding()
     
     tokens = encoding.encode(text)
     chunks = []
@@ -47,14 +63,167 @@ def chunk_text(text, chunk_size=500, overlap=100):
     print(f"✅ Created {chunk_count} chunks")
     return chunks
 
+def _split_tokens(tokens, encoding, chunk_size, overlap):
+    """Split one long token sequence into overlapping text pieces"""
+    start = 0
+    while start < len(tokens):
+        end = start + chunk_size
+        yield encoding.decode(tokens[start:end])
+        if end >= len(tokens):
+            break
+        start = end - overlap
+
+def chunk_segments(segments, chunk_size=500, overlap=100):
+    """
+    Chunk a stream of reader segments along the document structure
+    
+    - Consecutive small segments are packed together up to chunk_size tokens
+    - A heading always starts a new chunk, so sections aren't mixed
+    - A segment longer than chunk_size is split on its own with overlap
+    
+    Yields: (chunk text, locator, heading)
+    """
+    encoding = get_encoding()
+    parts = []
+    locators = []
+    part_tokens = 0
+    chunk_heading = ""
+    has_body = False
+    
+    def make_chunk():
+        text = "\n".join(parts)
+        if len(text.strip()) > 50:
+            return text, describe_locator_range(locators[0], locators[-1]), chunk_heading
+        return None
+    
+    for segment in segments:
+        tokens = encoding.encode(segment.text)
+        
+        if parts and ((segment.kind == "heading" and has_body) or part_tokens + len(tokens) > chunk_size):
+            chunk = make_chunk()
+            if chunk:
+                yield chunk
+            parts, locators, part_tokens, has_body = [], [], 0, False
+        
+        if len(tokens) > chunk_size:
+            for piece in _split_tokens(tokens, encoding, chunk_size, overlap):
+                if len(piece.strip()) > 50:
+                    yield piece, segment.locator, segment.heading or ""
+            continue
+        
+        if not parts:
+            chunk_heading = segment.heading or ""
+        parts.append(segment.text)
+        locators.append(segment.locator)
+        part_tokens += len(tokens)
+        has_body = has_body or segment.kind != "heading"
+    
+    if parts:
+        chunk = make_chunk()
+        if chunk:
+            yield chunk
+
+def iter_batches(items, size):
+    """Group any iterable into lists of at most size items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def get_documents_collection():
+    """Get or create the shared chunk collection"""
+    try:
+        collection = chroma_client.get_collection(name="documents")
+        print("✅ Using existing collection")
+    except:
+        collection = chroma_client.create_collection(
+            name="documents",
+            metadata={"hnsw:space": "cosine"}
+        )
+        print("✅ Created new collection")
+    return collection
+
+def section_key(locator):
+    """Short stable key for a section locator, used in section-scoped chunk ids"""
+    return hashlib.md5(locator.encode()).hexdigest()[:12]
+
+def delete_sections(doc_id, locators, collection=None):
+    """Delete the chunks of the given sections of a document"""
+    collection = collection or get_documents_collection()
+    for locator in locators:
+        collection.delete(where={"$and": [{"doc_id": doc_id}, {"section_key": section_key(locator)}]})
+
+def store_sections(doc_id, title, sections, metadata=None):
+    """
+    (Re-)embed only the given sections of a document
+    
+    sections: dict of section locator -> list of segments. Each section's
+    chunks get ids scoped to the section, so a changed section replaces its
+    own chunks and the rest of the document is left untouched.
+    Returns: number of chunks embedded
+    """
+    collection = get_documents_collection()
+    scalar_metadata = {
+        key: value for key, value in (metadata or {}).items()
+        if isinstance(value, (str, int, float, bool))
+    }
+    
+    delete_sections(doc_id, sections.keys(), collection)
+    
+    chunk_count = 0
+    for locator, section_segments in sections.items():
+        key = section_key(locator)
+        chunks = list(chunk_segments(section_segments, chunk_size=500, overlap=100))
+        
+        for batch_start in range(0, len(chunks), EMBED_BATCH_SIZE):
+            batch = chunks[batch_start:batch_start + EMBED_BATCH_SIZE]
+            texts = [chunk for chunk, _, _ in batch]
+            chunk_embeddings = embedding_model.encode(texts, show_progress_bar=False).tolist()
+            
+            collection.add(
+                ids=[f"{doc_id}_{key}_{batch_start + i}" for i in range(len(batch))],
+                embeddings=chunk_embeddings,
+                documents=texts,
+                metadatas=[
+                    {
+                        "doc_id": doc_id,
+                        "title": title,
+                        "chunk_index": batch_start + i,
+                        "locator": chunk_locator,
+                        "heading": heading,
+                        "section_key": key,
+                        **scalar_metadata
+                    }
+                    for i, (_, chunk_locator, heading) in enumerate(batch)
+                ]
+            )
+            chunk_count += len(batch)
+    
+    print(f"✅ Re-embedded {len(sections)} section(s) as {chunk_count} chunks for doc {doc_id}")
+    return chunk_count
+
 def create_document_id(text):
     """Create unique ID for document"""
     return hashlib.md5(text.encode()).hexdigest()[:16]
 
-def store_document(text, title, metadata=None):
+def store_document(text, title, metadata=None, segments=None):
     """
     Store document in vector database with detailed logging
+    
+    text is used for the document ID (and for chunking when no segments are
+    given); segments is an optional stream of reader segments that is
+    chunked along page/slide/section boundaries so chunks keep a locator
+    
+    The first chunk is flagged stored_complete after the last batch is added;
+    chunks of a failed run are deleted, and any left without the flag (a
+    crashed run) are replaced the next time the document is stored
     """
+    doc_id = collection = None
+    chunk_count = 0
     try:
         print(f"\n{'='*60}")
         print(f"📝 STORING DOCUMENT: {title}")
@@ -71,64 +240,61 @@ def store_document(text, title, metadata=None):
         doc_id = create_document_id(text)
         print(f"✅ Document ID: {doc_id}")
         
-        # Get or create collection
-        try:
-            collection = chroma_client.get_collection(name="documents")
-            print("✅ Using existing collection")
-        except:
-            collection = chroma_client.create_collection(
-                name="documents",
-                metadata={"hnsw:space": "cosine"}
-            )
-            print("✅ Created new collection")
-        
-        # Check if already exists
-        try:
-            existing = collection.get(ids=[doc_id])
-            if existing['ids']:
-                print(f"ℹ️  Document already exists (ID: {doc_id})")
-                print(f"   Existing chunks: {len(existing['ids'])}")
-                return doc_id
-        except:
-            pass
-        
-        # Chunk the document
+        collection = None if DEFER_WRITES else get_documents_collection()
+        
+        # Check if already exists (chunk ids are derived from the doc id)
+        if collection is not None and document_exists(collection, doc_id):
+            print(f"ℹ️  Document already exists (ID: {doc_id})")
+            return doc_id
+        
+        # Chunk the document - along its structure when the reader provided segments
         print("\n🔄 Chunking document...")
-        chunks = chunk_text(text, chunk_size=500, overlap=100)
+        if segments is not None:
+            chunks = chunk_segments(segments, chunk_size=500, overlap=100)
+        else:
+            chunks = ((chunk, "", "") for chunk in chunk_text(text, chunk_size=500, overlap=100))
         
-        if not chunks:
-            raise Exception("Chunking failed - no chunks created")
+        # ChromaDB only accepts scalar metadata values
+        scalar_metadata = {
+            key: value for key, value in (metadata or {}).items()
+            if isinstance(value, (str, int, float, bool))
+        }
         
-        print(f"✅ Successfully created {len(chunks)} chunks")
+        # Embed and add chunks batch by batch so the chunk stream is never held in full
+        for batch in iter_batches(chunks, EMBED_BATCH_SIZE):
+            texts = [chunk for chunk, _, _ in batch]
+            print(f"🔄 Embedding chunks {chunk_count + 1}-{chunk_count + len(batch)}...")
+            chunk_embeddings = embedding_model.encode(texts, show_progress_bar=False).tolist()
+            
+            chunk_batch = dict(
+                ids=[f"{doc_id}_chunk_{chunk_count + i}" for i in range(len(batch))],
+                embeddings=chunk_embeddings,
+                documents=texts,
+                metadatas=[
+                    {
+                        "doc_id": doc_id,
+                        "title": title,
+                        "chunk_index": chunk_count + i,
+                        "locator": locator,
+                        "heading": heading,
+                        **scalar_metadata
+                    }
+                    for i, (_, locator, heading) in enumerate(batch)
+                ]
+            )
+            if collection is None:
+                _deferred_batches.setdefault(doc_id, []).append(chunk_batch)
+            else:
+                collection.add(**chunk_batch)
+            chunk_count += len(batch)
         
-        # Create embeddings
-        print(f"\n🔄 Creating embeddings for {len(chunks)} chunks...")
-        chunk_embeddings = embedding_model.encode(chunks, show_progress_bar=True).tolist()
-        print(f"✅ Created {len(chunk_embeddings)} embeddings")
+        if not chunk_count:
+            raise Exception("Chunking failed - no chunks created")
         
-        # Prepare metadata
-        chunk_ids = [f"{doc_id}_chunk_{i}" for i in range(len(chunks))]
-        chunk_metadata = [
-            {
-                "doc_id": doc_id,
-                "title": title,
-                "chunk_index": i,
-                "total_chunks": len(chunks),
-                **(metadata or {})
-            }
-            for i in range(len(chunks))
-        ]
-        
-        # Add to collection
-        print(f"\n🔄 Adding {len(chunk_ids)} chunks to ChromaDB...")
-        collection.add(
-            ids=chunk_ids,
-            embeddings=chunk_embeddings,
-            documents=chunks,
-            metadatas=chunk_metadata
-        )
+        if collection is not None:
+            mark_document_complete(collection, doc_id)
         
-        print(f"✅ Successfully stored all chunks!")
+        print(f"✅ Successfully stored {chunk_count} chunks!")
         print(f"{'='*60}\n")
         
         return doc_id
@@ -136,8 +302,64 @@ def store_document(text, title, metadata=None):
     except Exception as e:
         print(f"\n❌ ERROR in store_document: {str(e)}")
         print(f"{'='*60}\n")
+        if doc_id:
+            _deferred_batches.pop(doc_id, None)
+        if collection is not None and chunk_count:
+            delete_partial_document(collection, doc_id)
         raise Exception(f"Error storing document: {str(e)}")
 
+def mark_document_complete(collection, doc_id):
+    """Flag the first chunk of a document once all of its chunks are in"""
+    first_id = f"{doc_id}_chunk_0"
+    metadata = collection.get(ids=[first_id])['metadatas'][0]
+    collection.update(ids=[first_id], metadatas=[{**metadata, "stored_complete": True}])
+
+def delete_partial_document(collection, doc_id):
+    try:
+        collection.delete(where={"doc_id": doc_id})
+        print(f"🧹 Removed the partly stored chunks of doc {doc_id}")
+    except Exception as e:
+        print(f"⚠️ Could not remove partly stored chunks of doc {doc_id}: {e}")
+
+def document_exists(collection, doc_id):
+    """Whether a document is fully stored; chunks of an interrupted run are removed"""
+    try:
+        existing = collection.get(ids=[f"{doc_id}_chunk_0"])
+    except Exception:
+        return False
+    
+    if not existing['ids']:
+        return False
+    if existing['metadatas'][0].get("stored_complete"):
+        return True
+    
+    delete_partial_document(collection, doc_id)
+    return False
+
+def take_deferred_chunks(doc_id):
+    """Chunk batches embedded for doc_id in DEFER_WRITES mode (removed from the buffer)"""
+    return _deferred_batches.pop(doc_id, [])
+
+def add_deferred_chunks(doc_id, chunk_batches):
+    """Add chunk batches embedded by a worker process (see DEFER_WRITES)"""
+    collection = get_documents_collection()
+    if document_exists(collection, doc_id):
+        print(f"ℹ️  Document already exists (ID: {doc_id})")
+        return 0
+    
+    chunk_count = 0
+    try:
+        for chunk_batch in chunk_batches:
+            collection.add(**chunk_batch)
+            chunk_count += len(chunk_batch["ids"])
+        mark_document_complete(collection, doc_id)
+    except Exception:
+        if chunk_count:
+            delete_partial_document(collection, doc_id)
+        raise
+    print(f"✅ Stored {chunk_count} chunks for doc {doc_id}")
+    return chunk_count
+
 def search_documents(query, doc_id=None, top_k=5):
     """
     Search for relevant document chunks with logging
@@ -173,10 +395,12 @@ def search_documents(query, doc_id=None, top_k=5):
         for i in range(len(results['ids'][0])):
             distance = results['distances'][0][i] if 'distances' in results else 1.0
             
+            chunk_metadata = results['metadatas'][0][i]
             formatted_results.append({
                 "text": results['documents'][0][i],
-                "metadata": results['metadatas'][0][i],
-                "distance": distance
+                "metadata": chunk_metadata,
+                "distance": distance,
+                "section": chunk_metadata.get("locator") or f"Chunk {chunk_metadata.get('chunk_index', i) + 1}"
             })
             
             print(f"\n  Result {i+1}:")
@@ -1,39 +1,243 @@
-from docx import Document
 import re
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import Counter
+from segments import Segment, record_segments
 
-def extract_text_from_docx(file_path):
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+MC_NS = "http://schemas.openxmlformats.org/markup-compatibility/2006"
+W = f"{{{W_NS}}}"
+
+# Tags compared on every parse event, built once
+TAG_BODY = f"{W}body"
+TAG_P = f"{W}p"
+TAG_T = f"{W}t"
+TAG_TBL = f"{W}tbl"
+TAG_TR = f"{W}tr"
+TAG_TC = f"{W}tc"
+TAG_SDT = f"{W}sdt"
+TAG_FALLBACK = f"{{{MC_NS}}}Fallback"
+
+CORE_NS = {
+    "dc": "http://purl.org/dc/elements/1.1/",
+    "dcterms": "http://purl.org/dc/terms/",
+    "cp": "http://schemas.openxmlformats.org/package/2006/metadata/core-properties"
+}
+
+def read_core_properties(archive):
+    """Read title/author/dates from docProps/core.xml (tiny, parsed in one go)"""
+    properties = {}
+    try:
+        root = ET.fromstring(archive.read("docProps/core.xml"))
+    except (KeyError, ET.ParseError):
+        return properties
+    
+    for key, path in [
+        ("title", "dc:title"),
+        ("author", "dc:creator"),
+        ("created", "dcterms:created"),
+        ("modified", "dcterms:modified")
+    ]:
+        element = root.find(path, CORE_NS)
+        if element is not None and element.text and element.text.strip():
+            properties[key] = element.text.strip()
+    
+    return properties
+
+def read_heading_styles(archive):
+    """
+    Map paragraph style ids to heading levels using word/styles.xml
+    Title is level 0, Heading N is level N (also honours outline levels)
+    """
+    levels = {}
+    try:
+        root = ET.fromstring(archive.read("word/styles.xml"))
+    except (KeyError, ET.ParseError):
+        return levels
+    
+    for style in root.iter(f"{W}style"):
+        style_id = style.get(f"{W}styleId")
+        if not style_id:
+            continue
+        
+        name_element = style.find(f"{W}name")
+        name = (name_element.get(f"{W}val") or "").lower() if name_element is not None else ""
+        outline = style.find(f"{W}pPr/{W}outlineLvl")
+        
+        if name == "title":
+            levels[style_id] = 0
+        elif outline is not None and outline.get(f"{W}val", "").isdigit() and int(outline.get(f"{W}val")) < 9:
+            levels[style_id] = int(outline.get(f"{W}val")) + 1
+        else:
+            match = re.match(r'heading\s*(\d)', name)
+            if match:
+                levels[style_id] = int(match.group(1))
+    
+    return levels
+
+def paragraph_text(paragraph):
+    """Collect the visible text of a finished <w:p> element"""
+    parts = []
+    for element in paragraph.iter():
+        if element.tag == TAG_T and element.text:
+            parts.append(element.text)
+        elif element.tag == f"{W}tab":
+            parts.append("\t")
+        elif element.tag in (f"{W}br", f"{W}cr"):
+            parts.append("\n")
+    return "".join(parts).strip()
+
+def paragraph_heading_level(paragraph, heading_styles):
+    properties = paragraph.find(f"{W}pPr")
+    if properties is None:
+        return None
+    
+    outline = properties.find(f"{W}outlineLvl")
+    if outline is not None and outline.get(f"{W}val", "").isdigit() and int(outline.get(f"{W}val")) < 9:
+        return int(outline.get(f"{W}val")) + 1
+    
+    style = properties.find(f"{W}pStyle")
+    if style is not None:
+        return heading_styles.get(style.get(f"{W}val"))
+    
+    return None
+
+def is_merged_continuation(cell):
+    """A vertically merged cell that continues the one above carries no content of its own"""
+    merge = cell.find(f"{W}tcPr/{W}vMerge")
+    return merge is not None and merge.get(f"{W}val", "continue") == "continue"
+
+def iter_docx_blocks(file_path):
+    """
+    Stream the body of a DOCX in document order without building a DOM
+    
+    word/document.xml is iterparsed straight from the zip and every finished
+    element is cleared, so memory stays flat regardless of document size.
+    
+    Yields dicts:
+        {"type": "heading", "level": int, "text": str}
+        {"type": "paragraph", "text": str}
+        {"type": "table", "rows": [[cell text, ...], ...]}
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        heading_styles = read_heading_styles(archive)
+        
+        with archive.open("word/document.xml") as document:
+            body = None
+            tables = []          # stack of open tables: lists of rows
+            rows = []            # stack of open rows: lists of cell texts
+            cells = []           # stack of open cells: lists of paragraph texts
+            fallback_depth = 0   # inside mc:Fallback (duplicate of mc:Choice content)
+            
+            for event, element in ET.iterparse(document, events=("start", "end")):
+                tag = element.tag
+                
+                if event == "start":
+                    if tag == TAG_BODY:
+                        body = element
+                    elif tag == TAG_FALLBACK:
+                        fallback_depth += 1
+                    elif tag == TAG_TBL:
+                        tables.append([])
+                    elif tag == TAG_TR:
+                        rows.append([])
+                    elif tag == TAG_TC:
+                        cells.append([])
+                    continue
+                
+                if tag == TAG_FALLBACK:
+                    fallback_depth -= 1
+                
+                elif tag == TAG_P:
+                    if not fallback_depth:
+                        text = paragraph_text(element)
+                        if text and cells:
+                            cells[-1].append(text)
+                        elif text:
+                            level = paragraph_heading_level(element, heading_styles)
+                            if level is not None:
+                                yield {"type": "heading", "level": level, "text": text}
+                            else:
+                                yield {"type": "paragraph", "text": text}
+                    element.clear()
+                
+                elif tag == TAG_TC:
+                    cell_parts = cells.pop()
+                    if rows and not is_merged_continuation(element):
+                        rows[-1].append(" ".join(cell_parts))
+                    element.clear()
+                
+                elif tag == TAG_TR:
+                    row = rows.pop()
+                    if tables and any(row):
+                        tables[-1].append(row)
+                    element.clear()
+                
+                elif tag == TAG_TBL:
+                    table = tables.pop()
+                    if cells:
+                        # Nested table: flatten it into the enclosing cell
+                        cells[-1].extend(" | ".join(cell for cell in row if cell) for row in table)
+                    elif table:
+                        yield {"type": "table", "rows": table}
+                    element.clear()
+                
+                # Drop finished top-level elements so the body never grows
+                if body is not None and not tables and tag in (TAG_P, TAG_TBL, TAG_SDT):
+                    body.clear()
+
+def iter_docx_segments(file_path, metadata=None):
+    """
+    Yield the document as segments, each carrying its nearest heading
+    Paragraphs are located by section heading, tables by their number
+    metadata receives the core properties and the paragraph/heading/table counts
+    """
+    if metadata is not None:
+        with zipfile.ZipFile(file_path) as archive:
+            properties = read_core_properties(archive)
+        metadata.update({
+            "title": properties.get("title") or "Untitled Document",
+            "author": properties.get("author") or "Unknown",
+            "created": properties.get("created") or "Unknown",
+            "modified": properties.get("modified") or "Unknown"
+        })
+    
+    heading = None
+    counts = Counter()
+    
+    for block in iter_docx_blocks(file_path):
+        counts[block["type"]] += 1
+        
+        if block["type"] == "heading":
+            heading = block["text"]
+            yield Segment("heading", f"Section: {heading}", heading, heading=heading)
+        
+        elif block["type"] == "paragraph":
+            locator = f"Section: {heading}" if heading else f"Paragraph {counts['paragraph']}"
+            yield Segment("paragraph", locator, block["text"], heading=heading)
+        
+        else:
+            rows = [" | ".join(cell for cell in row if cell) for row in block["rows"]]
+            yield Segment("table", f"Table {counts['table']}", "\n".join(rows), heading=heading)
+    
+    if metadata is not None:
+        metadata["paragraphs"] = counts["paragraph"] + counts["heading"]
+        metadata["headings"] = counts["heading"]
+        metadata["tables"] = counts["table"]
+
+def extract_text_from_docx(file_path, segments=None):
     """
     Extract text from DOCX file
+    file_path: a path or a seekable binary file object (e.g. an upload stream)
+    segments: optional list that receives the streamed segments
     Returns: (text, metadata)
     """
     try:
-        doc = Document(file_path)
-        
-        # Extract metadata
-        metadata = {
-            "title": doc.core_properties.title or "Untitled Document",
-            "author": doc.core_properties.author or "Unknown",
-            "created": str(doc.core_properties.created) if doc.core_properties.created else "Unknown",
-            "modified": str(doc.core_properties.modified) if doc.core_properties.modified else "Unknown",
-            "paragraphs": len(doc.paragraphs),
-            "sections": len(doc.sections)
-        }
-        
-        # Extract text from paragraphs
-        text_parts = []
-        
-        for paragraph in doc.paragraphs:
-            text = paragraph.text.strip()
-            if text:
-                text_parts.append(text)
-        
-        # Extract text from tables
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    cell_text = cell.text.strip()
-                    if cell_text:
-                        text_parts.append(cell_text)
+        metadata = {}
+        text_parts = [
+            segment.text
+            for segment in record_segments(iter_docx_segments(file_path, metadata), segments)
+        ]
         
         full_text = " ".join(text_parts)
         
@@ -44,6 +248,10 @@ def extract_text_from_docx(file_path):
             raise Exception("No readable text found in DOCX file")
         
         return full_text, metadata
-        
+    
+    except zipfile.BadZipFile:
+        raise Exception("Error reading DOCX file: Invalid or corrupted DOCX file")
+    except KeyError:
+        raise Exception("Error reading DOCX file: word/document.xml is missing")
     except Exception as e:
-        raise Exception(f"Error reading DOCX file: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Error reading DOCX file: {str(e)}")
@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from export_service import render_export, EXPORT_FORMATS
+from worker_pool import run_cpu_bound
+
+# Rendered exports, one folder per analysis ("current" for unsaved session results)
+EXPORT_CACHE_FOLDER = "export_cache"
+# Bump when the export layout changes so old files are not served any more
+EXPORT_CACHE_VERSION = "1"
+# Files not downloaded for this long are removed
+EXPORT_CACHE_TTL_SECONDS = 14 * 24 * 3600
+EVICT_INTERVAL_SECONDS = 3600
+
+# Formats rendered in the background when an analysis is saved ("" turns this off)
+PRERENDER_FORMATS = [f for f in os.getenv("EXPORT_PRERENDER_FORMATS", "pdf").split(",") if f in EXPORT_FORMATS]
+
+_prerender_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="export-prerender")
+_last_eviction = 0
+_eviction_lock = threading.Lock()
+
+def export_etag(result_data, export_format):
+    """Hash of the analysis content + format; changes whenever the export would"""
+    content = json.dumps(result_data, sort_keys=True, default=str)
+    sha = hashlib.sha256(f"{EXPORT_CACHE_VERSION}|{export_format}|{content}".encode("utf-8"))
+    return sha.hexdigest()[:32]
+
+def export_folder(analysis_id):
+    return os.path.join(EXPORT_CACHE_FOLDER, str(analysis_id) if analysis_id else "current")
+
+def cached_export(result_data, export_format, analysis_id=None, etag=None):
+    """
+    Path of the rendered export, rendering it (on the CPU worker pool) on a miss
+    Returns: (path, etag)
+    """
+    etag = etag or export_etag(result_data, export_format)
+    folder = export_folder(analysis_id)
+    path = os.path.join(folder, f"{export_format}-{etag}.{EXPORT_FORMATS[export_format][0]}")
+    
+    try:
+        # Touching it keeps popular exports from being evicted
+        os.utime(path)
+        return path, etag
+    except OSError:
+        pass
+    
+    data = run_cpu_bound(render_export, result_data, export_format)
+    
+    os.makedirs(folder, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    
+    # Older versions of this analysis' export can't be asked for any more
+    if analysis_id:
+        for name in os.listdir(folder):
+            if name.startswith(f"{export_format}-") and not name.endswith(".tmp") and os.path.join(folder, name) != path:
+                remove_file(os.path.join(folder, name))
+    
+    evict_stale_exports()
+    return path, etag
+
+def prerender_exports(analysis_id, result_data):
+    """Render the PRERENDER_FORMATS of a newly saved analysis in the background"""
+    def prerender():
+        for export_format in PRERENDER_FORMATS:
+            try:
+                cached_export(result_data, export_format, analysis_id)
+            except Exception as e:
+                print(f"⚠️ Warning: Could not pre-render {export_format} export of analysis {analysis_id}: {e}")
+    
+    if PRERENDER_FORMATS:
+        _prerender_pool.submit(prerender)
+
+def drop_cached_exports(analysis_id):
+    """Forget the rendered exports of a deleted analysis"""
+    shutil.rmtree(export_folder(analysis_id), ignore_errors=True)
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def evict_stale_exports(force=False):
+    """Remove exports nobody downloaded within the TTL; a no-op if that ran recently"""
+    global _last_eviction
+    now = time.time()
+    with _eviction_lock:
+        if not force and now - _last_eviction < EVICT_INTERVAL_SECONDS:
+            return 0
+        _last_eviction = now
+    
+    removed = 0
+    for root, _, files in os.walk(EXPORT_CACHE_FOLDER):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                if now - os.path.getmtime(path) > EXPORT_CACHE_TTL_SECONDS:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+    
+    if removed:
+        print(f"🧹 Evicted {removed} stale cached export(s)")
+    return removed
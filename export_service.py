@@ -11,6 +11,41 @@ import markdown2
 from datetime import datetime
 import io
 
+# PDF styles are built once; reports only read them
+styles = getSampleStyleSheet()
+
+title_style = ParagraphStyle(
+    'CustomTitle',
+    parent=styles['Heading1'],
+    fontSize=24,
+    textColor='#667eea',
+    spaceAfter=30,
+    alignment=TA_CENTER
+)
+
+heading_style = ParagraphStyle(
+    'CustomHeading',
+    parent=styles['Heading2'],
+    fontSize=16,
+    textColor='#667eea',
+    spaceAfter=12,
+    spaceBefore=12
+)
+
+# File extension and MIME type of each export format
+EXPORT_FORMATS = {
+    'pdf': ('pdf', 'application/pdf'),
+    'docx': ('docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+    'markdown': ('md', 'text/markdown'),
+    'json': ('json', 'application/json')
+}
+
+def pdf_document(target):
+    """SimpleDocTemplate with the report page layout; target is a buffer or a path"""
+    return SimpleDocTemplate(target, pagesize=letter, 
+                             rightMargin=72, leftMargin=72,
+                             topMargin=72, bottomMargin=18)
+
 def export_to_pdf(analysis_data, output_path=None):
     """
     Export analysis to PDF
@@ -20,32 +55,22 @@ def export_to_pdf(analysis_data, output_path=None):
     buffer = io.BytesIO() if not output_path else output_path
     
     # Create PDF
-    doc = SimpleDocTemplate(buffer, pagesize=letter, 
-                           rightMargin=72, leftMargin=72,
-                           topMargin=72, bottomMargin=18)
+    doc = pdf_document(buffer)
+    doc.build(pdf_story(analysis_data))
+    
+    if not output_path:
+        buffer.seek(0)
+        return buffer
     
+    return output_path
+
+def pdf_story(analysis_data):
+    """
+    PDF flowables for one analysis
+    Returns: list of flowables
+    """
     # Container for PDF elements
     story = []
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor='#667eea',
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor='#667eea',
-        spaceAfter=12,
-        spaceBefore=12
-    )
     
     # Title
     title = Paragraph(analysis_data.get('title', 'Content Analysis Report'), title_style)
@@ -153,14 +178,7 @@ def export_to_pdf(analysis_data, output_path=None):
     )
     story.append(footer)
     
-    # Build PDF
-    doc.build(story)
-    
-    if not output_path:
-        buffer.seek(0)
-        return buffer
-    
-    return output_path
+    return story
 
 def export_to_docx(analysis_data, output_path=None):
     """
@@ -168,7 +186,20 @@ def export_to_docx(analysis_data, output_path=None):
     Returns: BytesIO buffer or saves to file
     """
     doc = Document()
+    add_docx_analysis(doc, analysis_data)
     
+    # Save to buffer or file
+    if not output_path:
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        buffer.seek(0)
+        return buffer
+    
+    doc.save(output_path)
+    return output_path
+
+def add_docx_analysis(doc, analysis_data):
+    """Append one analysis to a Word document"""
     # Title
     title = doc.add_heading(analysis_data.get('title', 'Content Analysis Report'), 0)
     title.alignment = WD_ALIGN_PARAGRAPH.CENTER
@@ -247,16 +278,6 @@ def export_to_docx(analysis_data, output_path=None):
         f"Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')}"
     )
     footer.runs[0].italic = True
-    
-    # Save to buffer or file
-    if not output_path:
-        buffer = io.BytesIO()
-        doc.save(buffer)
-        buffer.seek(0)
-        return buffer
-    
-    doc.save(output_path)
-    return output_path
 
 def export_to_markdown(analysis_data):
     """
@@ -351,4 +372,20 @@ def export_to_json(analysis_data):
         "doc_id": analysis_data.get('doc_id', '')
     }
     
-    return json.dumps(export_data, indent=2)
\ No newline at end of file
+    return json.dumps(export_data, indent=2)
+
+def render_export(analysis_data, export_format):
+    """
+    Render an analysis in one of EXPORT_FORMATS
+    Returns: bytes
+    """
+    if export_format == 'pdf':
+        return export_to_pdf(analysis_data).getvalue()
+    elif export_format == 'docx':
+        return export_to_docx(analysis_data).getvalue()
+    elif export_format == 'markdown':
+        return export_to_markdown(analysis_data).encode("utf-8")
+    elif export_format == 'json':
+        return export_to_json(analysis_data).encode("utf-8")
+    
+    raise Exception(f"Unsupported export format: {export_format}")
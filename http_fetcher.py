@@ -0,0 +1,275 @@
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+from urllib.parse import urlsplit
+from email.utils import formatdate
+import threading
+import hashlib
+import json
+import time
+import os
+
+try:
+    import brotli  # noqa: F401 - lets urllib3 decode "br" responses
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+HTTP_CACHE_FOLDER = "http_cache"
+# Bodies larger than this are fetched but not cached
+HTTP_CACHE_MAX_BODY = 10 * 1024 * 1024
+# Entries not used for this long are removed
+HTTP_CACHE_TTL_SECONDS = 30 * 24 * 3600
+EVICT_INTERVAL_SECONDS = 3600
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+# Connection pools: one pool per host, a few keep-alive sockets each
+POOL_HOSTS = 32
+POOL_CONNECTIONS_PER_HOST = 4
+
+# Politeness: at most this many requests in flight per host, spaced out
+MAX_REQUESTS_PER_HOST = 2
+HOST_MIN_INTERVAL = 0.5
+
+class FetchResult:
+    """A fetched page, whether it came from the network, a 304 or the cache"""
+    
+    __slots__ = ("url", "status_code", "headers", "content", "encoding", "cache_status")
+    
+    def __init__(self, url, status_code, headers, content, encoding, cache_status):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+        # "miss" (downloaded), "revalidated" (304) or "hit" (still fresh, no request)
+        self.cache_status = cache_status
+    
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+def parse_cache_control(value):
+    """Split a Cache-Control header into a dict of lower-cased directives"""
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or True
+    return directives
+
+def fresh_for_seconds(headers):
+    """How long a stored response may be reused without revalidating"""
+    directives = parse_cache_control(headers.get("Cache-Control"))
+    if "no-cache" in directives or "no-store" in directives:
+        return 0
+    try:
+        return max(int(directives.get("max-age", 0)), 0)
+    except (TypeError, ValueError):
+        return 0
+
+def is_cacheable(response):
+    if response.status_code != 200 or response.request.method != "GET":
+        return False
+    if "no-store" in parse_cache_control(response.headers.get("Cache-Control")):
+        return False
+    if len(response.content) > HTTP_CACHE_MAX_BODY:
+        return False
+    # Without a validator or a lifetime, a stored copy could never be reused
+    headers = response.headers
+    return bool(headers.get("ETag") or headers.get("Last-Modified") or fresh_for_seconds(headers))
+
+class HttpCache:
+    """
+    On-disk HTTP cache: http_cache/<hh>/<sha256(url)>.json (+ .body)
+    Stores the validators (ETag / Last-Modified) needed for conditional GETs;
+    entries unused for longer than the TTL are evicted lazily on store
+    """
+    
+    def __init__(self, folder=HTTP_CACHE_FOLDER, ttl=HTTP_CACHE_TTL_SECONDS):
+        self.folder = folder
+        self.ttl = ttl
+        self._last_eviction = 0
+        self._eviction_lock = threading.Lock()
+    
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.folder, key[:2], key)
+        return f"{base}.json", f"{base}.body"
+    
+    def get(self, url):
+        """Return (entry dict, body bytes) or (None, None)"""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None, None
+        
+        # Touching them keeps pages that are still fetched from being evicted
+        for path in (meta_path, body_path):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        
+        entry["headers"] = CaseInsensitiveDict(entry["headers"])
+        return entry, body
+    
+    def _write(self, path, data, mode):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    
+    def store(self, url, response):
+        meta_path, body_path = self._paths(url)
+        entry = {
+            "url": url,
+            "final_url": response.url,
+            "headers": dict(response.headers),
+            "encoding": response.encoding or response.apparent_encoding,
+            "stored_at": time.time()
+        }
+        # Body first, so a readable .json always has its body
+        self._write(body_path, response.content, "wb")
+        self._write(meta_path, json.dumps(entry), "w")
+        self.evict_stale()
+    
+    def refresh(self, url, entry, response):
+        """A 304 confirmed the stored body; merge the new headers and restart its lifetime"""
+        meta_path, _ = self._paths(url)
+        entry["headers"].update(response.headers)
+        entry["stored_at"] = time.time()
+        self._write(meta_path, json.dumps(dict(entry, headers=dict(entry["headers"]))), "w")
+    
+    def evict_stale(self, force=False):
+        """Remove entries not used within the TTL; a no-op if that ran recently"""
+        now = time.time()
+        with self._eviction_lock:
+            if not force and now - self._last_eviction < EVICT_INTERVAL_SECONDS:
+                return 0
+            self._last_eviction = now
+        
+        removed = 0
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if now - os.path.getmtime(path) > self.ttl:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    continue
+        
+        if removed:
+            print(f"🧹 Evicted {removed} stale HTTP cache file(s)")
+        return removed
+
+class HttpFetcher:
+    """
+    Shared HTTP client for the scraper
+    
+    - one requests.Session, so DNS/TCP/TLS setup is paid once per host
+      and connections are kept alive across pages
+    - gzip/deflate (and br when brotli is installed) compressed transfers
+    - on-disk cache revalidated with If-None-Match / If-Modified-Since
+    - per-host politeness: bounded concurrency and a minimum request gap
+    """
+    
+    def __init__(self, cache=None, min_interval=HOST_MIN_INTERVAL, max_per_host=MAX_REQUESTS_PER_HOST):
+        self.cache = cache if cache is not None else HttpCache()
+        self.min_interval = min_interval
+        self.max_per_host = max_per_host
+        
+        self.session = requests.Session()
+        retries = Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504),
+                        allowed_methods=frozenset(["GET", "HEAD"]))
+        adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_CONNECTIONS_PER_HOST,
+                              max_retries=retries)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "User-Agent": USER_AGENT,
+            "Accept-Encoding": ACCEPT_ENCODING
+        })
+        
+        self._lock = threading.Lock()
+        self._host_slots = {}
+        self._host_next_time = {}
+    
+    def _wait_for_host(self, host):
+        """Block until this host may be contacted again, then reserve the next slot"""
+        with self._lock:
+            slots = self._host_slots.setdefault(host, threading.BoundedSemaphore(self.max_per_host))
+        slots.acquire()
+        
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._host_next_time.get(host, 0))
+            self._host_next_time[host] = start + self.min_interval
+        
+        if start > now:
+            time.sleep(start - now)
+        return slots
+    
+    def fetch(self, url, timeout=10, headers=None, use_cache=True):
+        """
+        GET a URL through the cache
+        Raises requests exceptions (including HTTPError for 4xx/5xx) like requests.get
+        Returns: FetchResult
+        """
+        entry, body = self.cache.get(url) if use_cache else (None, None)
+        
+        if entry is not None:
+            age = time.time() - entry["stored_at"]
+            if age < fresh_for_seconds(entry["headers"]):
+                return FetchResult(entry["final_url"], 200, entry["headers"], body, entry["encoding"], "hit")
+        
+        request_headers = dict(headers or {})
+        if entry is not None:
+            if entry["headers"].get("ETag"):
+                request_headers["If-None-Match"] = entry["headers"]["ETag"]
+            if entry["headers"].get("Last-Modified"):
+                request_headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+            elif not request_headers.get("If-None-Match"):
+                request_headers["If-Modified-Since"] = formatdate(entry["stored_at"], usegmt=True)
+        
+        host = urlsplit(url).netloc.lower()
+        slots = self._wait_for_host(host)
+        try:
+            response = self.session.get(url, timeout=timeout, headers=request_headers)
+        finally:
+            slots.release()
+        
+        if response.status_code == 304 and entry is not None:
+            self.cache.refresh(url, entry, response)
+            return FetchResult(entry["final_url"], 200, entry["headers"], body, entry["encoding"], "revalidated")
+        
+        response.raise_for_status()
+        
+        if use_cache and is_cacheable(response):
+            try:
+                self.cache.store(url, response)
+            except OSError as e:
+                print(f"⚠️ Could not cache {url}: {e}")
+        
+        return FetchResult(
+            response.url,
+            response.status_code,
+            dict(response.headers),
+            response.content,
+            response.encoding or response.apparent_encoding,
+            "miss"
+        )
+
+# Shared fetcher used by the scraper (and any batch/crawl code built on it)
+http_fetcher = HttpFetcher()
+
+def fetch_url(url, timeout=10, use_cache=True):
+    return http_fetcher.fetch(url, timeout=timeout, use_cache=use_cache)
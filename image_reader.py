@@ -1,47 +1,326 @@
-from PIL import Image
+from PIL import Image, ImageSequence
 import pytesseract
+import threading
+import math
+import io
 import re
 import os
+from segments import Segment, record_segments
+from worker_pool import iter_cpu_bound
 
-def extract_text_from_image(file_path):
+# tesserocr keeps a Tesseract API handle alive in-process (no fork per call,
+# language data loaded once); fall back to the pytesseract CLI wrapper without it
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# Images larger than this on their longest side are downscaled before OCR
+OCR_MAX_DIMENSION = 5000
+OCR_BINARIZE_THRESHOLD = 160
+
+# Frames bigger than OCR_MAX_DIMENSION are split into overlapping tiles instead
+# of being downscaled; the overlap must cover at least one line of text
+OCR_TILE_SIZE = 2500
+OCR_TILE_OVERLAP = 120
+
+class OCREngine:
     """
-    Extract text from image using OCR (Tesseract)
-    Returns: (text, metadata)
+    Single-pass OCR engine
+    
+    Returns text and word confidences from one Tesseract run instead of
+    running image_to_string and image_to_data separately. With tesserocr
+    installed, one API handle is kept alive per thread and reused.
     """
+    
+    def __init__(self, lang="eng", max_dimension=OCR_MAX_DIMENSION, binarize=False):
+        self.lang = lang
+        self.max_dimension = max_dimension
+        self.binarize = binarize
+        self._local = threading.local()
+        self.backend = "tesserocr" if tesserocr is not None else "pytesseract"
+    
+    def _get_api(self):
+        """Get (or lazily create) this thread's persistent Tesseract handle"""
+        api = getattr(self._local, "api", None)
+        if api is None:
+            api = tesserocr.PyTessBaseAPI(lang=self.lang)
+            self._local.api = api
+        return api
+    
+    def preprocess(self, image):
+        """Downscale oversized images and optionally binarize them"""
+        if self.max_dimension and max(image.width, image.height) > self.max_dimension:
+            image = image.copy()
+            image.thumbnail((self.max_dimension, self.max_dimension), Image.LANCZOS)
+        
+        if self.binarize:
+            image = image.convert("L").point(
+                lambda p: 255 if p > OCR_BINARIZE_THRESHOLD else 0, mode="1"
+            )
+        elif image.mode not in ("RGB", "L", "1"):
+            image = image.convert("RGB")
+        
+        return image
+    
+    def _recognize_tesserocr(self, image):
+        api = self._get_api()
+        api.SetImage(image)
+        text = api.GetUTF8Text()
+        confidences = [conf for conf in api.AllWordConfidences() if conf >= 0]
+        return text, confidences
+    
+    def _recognize_pytesseract(self, image):
+        ocr_data = pytesseract.image_to_data(image, lang=self.lang, output_type=pytesseract.Output.DICT)
+        
+        # Rebuild the text line by line from the word boxes
+        lines = {}
+        confidences = []
+        for i, word in enumerate(ocr_data['text']):
+            conf = float(ocr_data['conf'][i])
+            if conf < 0 or not word.strip():
+                continue
+            confidences.append(conf)
+            key = (ocr_data['block_num'][i], ocr_data['par_num'][i], ocr_data['line_num'][i])
+            lines.setdefault(key, []).append(word)
+        
+        text = "\n".join(" ".join(words) for words in lines.values())
+        return text, confidences
+    
+    def recognize(self, image):
+        """
+        OCR a PIL image in a single pass
+        Returns: (text, average confidence or None)
+        """
+        image = self.preprocess(image)
+        
+        if self.backend == "tesserocr":
+            try:
+                text, confidences = self._recognize_tesserocr(image)
+            except RuntimeError as e:
+                # Handle could not be created (missing tessdata etc.) - use the CLI instead
+                print(f"⚠️ tesserocr unavailable ({e}), falling back to pytesseract")
+                self.backend = "pytesseract"
+                text, confidences = self._recognize_pytesseract(image)
+        else:
+            text, confidences = self._recognize_pytesseract(image)
+        
+        avg_confidence = sum(confidences) / len(confidences) if confidences else None
+        return text, avg_confidence
+
+# Shared engine - worker processes each get their own copy on import
+ocr_engine = OCREngine()
+
+def ocr_image_to_text(image):
+    """
+    Run Tesseract OCR on an already opened PIL image
+    Shared by every reader that needs OCR (images, scanned PDF pages)
+    Returns: raw text
+    """
+    text, _ = ocr_engine.recognize(image)
+    return text
+
+# Tiles are already small enough, so the tile engine never downscales
+_tile_engine = None
+
+def _ocr_tile(tile):
+    """OCR one tile/frame inside a worker process (engine is reused per process)"""
+    global _tile_engine
+    if _tile_engine is None:
+        _tile_engine = OCREngine(max_dimension=None)
+    return _tile_engine.recognize(tile)
+
+def _ocr_numbered_tile(position, tile):
+    """_ocr_tile for the worker pool, which returns results out of order (position comes back with them)"""
     try:
-        # Open image
-        image = Image.open(file_path)
+        return _ocr_tile(tile)
+    except Exception as e:
+        # Some OCR errors can't be unpickled in the parent and would break the pool
+        raise Exception(f"{type(e).__name__}: {e}")
+
+def split_into_tiles(width, height, tile_size=OCR_TILE_SIZE, overlap=OCR_TILE_OVERLAP,
+                     max_tile_width=OCR_MAX_DIMENSION):
+    """
+    Split a frame into overlapping tiles in reading order (row by row)
+    Frames are cut into horizontal bands; bands are only cut into columns when
+    wider than max_tile_width, since every vertical cut splits lines of text
+    Returns: list of (row, col, box) where box is (left, top, right, bottom)
+    """
+    def spans(length, tile_size):
+        if length <= tile_size:
+            return [(0, length)]
+        # Spread tiles evenly so the last one isn't a thin sliver
+        count = math.ceil((length - overlap) / (tile_size - overlap))
+        size = math.ceil((length + (count - 1) * overlap) / count)
+        return [
+            (i * (size - overlap), min(i * (size - overlap) + size, length))
+            for i in range(count)
+        ]
+    
+    tiles = []
+    for row, (top, bottom) in enumerate(spans(height, tile_size)):
+        for col, (left, right) in enumerate(spans(width, max_tile_width)):
+            tiles.append((row, col, (left, top, right, bottom)))
+    return tiles
+
+def stitch_tile_texts(tile_results):
+    """
+    Join tile texts back in reading order, dropping lines duplicated by the
+    vertical overlap between a tile and the one above it
+    tile_results: list of (row, col, text) in reading order
+    """
+    parts = []
+    last_lines_by_col = {}
+    
+    for row, col, text in tile_results:
+        lines = [line for line in text.split("\n") if line.strip()]
+        previous = last_lines_by_col.get(col, [])
         
-        # Get image metadata
-        metadata = {
+        # Skip leading lines that were already read at the bottom of the tile above
+        skip = 0
+        while skip < len(lines) and skip < len(previous) and lines[skip].strip() in previous:
+            skip += 1
+        lines = lines[skip:]
+        
+        if lines:
+            parts.append("\n".join(lines))
+            last_lines_by_col[col] = [line.strip() for line in lines[-3:]]
+    
+    return "\n".join(parts)
+
+def needs_tiled_ocr(image):
+    """Multi-page images and frames too large to OCR in one go use the tiled mode"""
+    return getattr(image, "n_frames", 1) > 1 or max(image.width, image.height) > OCR_MAX_DIMENSION
+
+def ocr_image_tiled(image):
+    """
+    OCR every frame of an image, splitting large frames into overlapping tiles
+    Frames and tiles are recognized in parallel on the shared CPU worker pool
+    Returns: (list of text per frame, average confidence or None, list of per-tile details)
+    """
+    jobs = []
+    for frame_index, frame in enumerate(ImageSequence.Iterator(image), 1):
+        frame = frame.convert("RGB")
+        for row, col, box in split_into_tiles(frame.width, frame.height):
+            jobs.append((frame_index, row, col, box, frame.crop(box)))
+    
+    print(f"🧩 Tiled OCR: {len(jobs)} tile(s) across {getattr(image, 'n_frames', 1)} frame(s)")
+    
+    results = [None] * len(jobs)
+    tiles = ((position, job[4]) for position, job in enumerate(jobs))
+    for (position, _), result in iter_cpu_bound(_ocr_numbered_tile, tiles):
+        if isinstance(result, Exception):
+            raise result
+        results[position] = result
+    
+    # Stitch each frame separately so overlap de-duplication never crosses pages
+    frame_texts = []
+    tile_details = []
+    confidences = []
+    frame_tiles = []
+    current_frame = None
+    
+    for (frame_index, row, col, box, _), (text, confidence) in zip(jobs, results):
+        if frame_index != current_frame and frame_tiles:
+            frame_texts.append(stitch_tile_texts(frame_tiles))
+            frame_tiles = []
+        current_frame = frame_index
+        frame_tiles.append((row, col, text))
+        
+        tile_details.append({
+            "frame": frame_index,
+            "box": list(box),
+            "confidence": round(confidence, 1) if confidence is not None else None
+        })
+        if confidence is not None:
+            confidences.append(confidence)
+    
+    if frame_tiles:
+        frame_texts.append(stitch_tile_texts(frame_tiles))
+    
+    avg_confidence = sum(confidences) / len(confidences) if confidences else None
+    return frame_texts, avg_confidence, tile_details
+
+def ocr_image_bytes(blob):
+    """
+    OCR an encoded image (PNG/JPEG/...) held in memory, e.g. a picture embedded in a document
+    Picklable, so it can be mapped over a process pool
+    Returns: (text, average confidence or None)
+    """
+    try:
+        with Image.open(io.BytesIO(blob)) as image:
+            return ocr_engine.recognize(image)
+    except Exception as e:
+        # Some OCR errors can't be unpickled in the parent and would break the pool
+        raise Exception(f"{type(e).__name__}: {e}")
+
+def iter_image_segments(file_path, metadata=None, tiled=None):
+    """
+    OCR an image and yield one segment per frame ("page" for multi-page
+    images, a single "image" segment otherwise)
+    tiled: force (True) or disable (False) the multi-frame/tiled mode;
+           by default it is used for multi-page and very large images
+    metadata receives the image properties and the OCR confidence
+    """
+    image = Image.open(file_path)
+    
+    if metadata is not None:
+        metadata.update({
             "format": image.format,
             "mode": image.mode,
             "size": f"{image.width}x{image.height}",
             "width": image.width,
-            "height": image.height
-        }
-        
-        # Perform OCR
-        text = pytesseract.image_to_string(image)
-        
-        # Clean up text
-        text = re.sub(r'\s+', ' ', text).strip()
+            "height": image.height,
+            "frames": getattr(image, "n_frames", 1)
+        })
+    
+    if tiled is None:
+        tiled = needs_tiled_ocr(image)
+    
+    # Perform OCR - text and confidence come from the same pass
+    if tiled:
+        frame_texts, avg_confidence, tile_details = ocr_image_tiled(image)
+        if metadata is not None:
+            metadata["ocr_tiles"] = tile_details
+    else:
+        text, avg_confidence = ocr_engine.recognize(image)
+        frame_texts = [text]
+    
+    if metadata is not None:
+        metadata["ocr_confidence"] = f"{round(avg_confidence, 1)}%" if avg_confidence is not None else "N/A"
+        metadata["ocr_engine"] = ocr_engine.backend
+    
+    for frame_index, frame_text in enumerate(frame_texts, 1):
+        frame_text = re.sub(r'\s+', ' ', frame_text).strip()
+        if not frame_text:
+            continue
+        if len(frame_texts) > 1:
+            yield Segment("page", f"Page {frame_index}", frame_text)
+        else:
+            yield Segment("image", "Image", frame_text)
+
+def extract_text_from_image(file_path, tiled=None, segments=None):
+    """
+    Extract text from image using OCR (Tesseract)
+    file_path: a path or a seekable binary file object (e.g. an upload stream)
+    tiled: force (True) or disable (False) the multi-frame/tiled mode;
+           by default it is used for multi-page and very large images
+    segments: optional list that receives one segment per frame
+    Returns: (text, metadata)
+    """
+    try:
+        metadata = {}
+        text = " ".join(
+            segment.text
+            for segment in record_segments(iter_image_segments(file_path, metadata, tiled), segments)
+        )
         
         # Check if meaningful text was extracted
         if not text or len(text) < 20:
             raise Exception("No readable text found in image. The image might not contain text or the text is not clear enough.")
         
-        # Get OCR confidence (optional but useful)
-        try:
-            ocr_data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
-            confidences = [int(conf) for conf in ocr_data['conf'] if conf != '-1']
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0
-            metadata["ocr_confidence"] = f"{round(avg_confidence, 1)}%"
-        except:
-            metadata["ocr_confidence"] = "N/A"
-        
         return text, metadata
-        
+    
     except pytesseract.TesseractNotFoundError:
         raise Exception(
             "Tesseract OCR is not installed. "
@@ -49,4 +328,4 @@ def extract_text_from_image(file_path):
             "download from https://github.com/UB-Mannheim/tesseract/wiki (Windows)"
         )
     except Exception as e:
-        raise Exception(f"Error reading image: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Error reading image: {str(e)}")
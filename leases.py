@@ -0,0 +1,84 @@
+"""
+Single-owner guards for background work
+
+Every server process runs start_background_workers, so with several workers
+(e.g. gunicorn -w 4) each one would resume the same crawls and run its own
+watch scheduler. Work is claimed in the database first: a lease names the
+process holding it and expires unless renewed, so work held by a process
+that died is picked up again once its lease runs out (straight away when
+the dead process was on this host).
+"""
+import os
+import socket
+from datetime import datetime, timedelta
+from sqlalchemy import insert, update, delete
+from sqlalchemy.exc import IntegrityError
+
+from models import db, WorkerLease
+
+HOSTNAME = socket.gethostname()
+LEASE_SECONDS = 600
+
+def process_id():
+    # Looked up on every call: forked workers share the module state of their parent
+    return f"{HOSTNAME}:{os.getpid()}"
+
+def owner_is_gone(owner):
+    """Whether the process holding a lease has exited (only known for processes on this host)"""
+    host, _, pid = owner.rpartition(":")
+    # os.kill(pid, 0) would terminate the process on Windows
+    if host != HOSTNAME or not pid.isdigit() or os.name == "nt":
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        return False
+    return False
+
+def claim_lease(name, seconds=LEASE_SECONDS):
+    """
+    Take the named lease for this process if it is free, expired, already
+    ours, or held by a process that is gone
+    Returns: True when this process holds the lease
+    """
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=seconds)
+    
+    try:
+        db.session.execute(insert(WorkerLease).values(name=name, owner=process_id(), expires_at=expires_at))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+    
+    lease = db.session.get(WorkerLease, name)
+    if lease is None:
+        return False
+    
+    takeable = (WorkerLease.owner == process_id()) | (WorkerLease.expires_at < now)
+    if owner_is_gone(lease.owner):
+        takeable = takeable | (WorkerLease.owner == lease.owner)
+    
+    # Only one process can win the UPDATE, whatever the others read above
+    claimed = db.session.execute(
+        update(WorkerLease).where(WorkerLease.name == name, takeable)
+        .values(owner=process_id(), expires_at=expires_at)
+    ).rowcount
+    db.session.commit()
+    db.session.expire(lease)
+    return claimed == 1
+
+def renew_lease(name, seconds=LEASE_SECONDS):
+    """Extend a lease this process holds; False if it was lost to another process"""
+    renewed = db.session.execute(
+        update(WorkerLease).where(WorkerLease.name == name, WorkerLease.owner == process_id())
+        .values(expires_at=datetime.utcnow() + timedelta(seconds=seconds))
+    ).rowcount
+    db.session.commit()
+    return renewed == 1
+
+def release_lease(name):
+    db.session.execute(delete(WorkerLease).where(WorkerLease.name == name, WorkerLease.owner == process_id()))
+    db.session.commit()
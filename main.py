@@ -1,17 +1,370 @@
-from scraper import scrape_website
-from summarizer import summarize_text
-from form_filler import fill_form
+"""
+Command line entry point
 
-url = input("Enter website URL: ")
+    python main.py analyze <url or file>
+    python main.py ingest <directory | urls.txt | file> [--output results.jsonl] [--user NAME]
+    python main.py db upgrade | status | explain
 
-title, content = scrape_website(url)
-summary = summarize_text(content)
+ingest runs the same analyzers as the web app on a pool of worker processes
+and appends one JSON record per document to the output file. Documents that
+already have a record there are skipped, so an interrupted run resumes where
+it stopped when started again with the same output file.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 
-print("\nTitle:", title)
-print("\nSummary:", summary)
+DEFAULT_OUTPUT = "ingest_results.jsonl"
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+SUPPORTED_EXTENSIONS = {"pdf", "docx", "doc", "pptx", "ppt", "xlsx", "xls", "png", "jpg", "jpeg", "gif", "bmp", "tiff"}
 
-choice = input("\nFill form? (yes/no): ")
-if choice == "yes":
-    fill_form(url)
+def is_document(path):
+    return "." in path and path.rsplit(".", 1)[1].lower() in SUPPORTED_EXTENSIONS
 
+def collect_sources(source):
+    """
+    Items to ingest from a directory (walked recursively), a single document,
+    or a text file of URLs (one per line, # comments allowed)
+    Returns: list of (kind, source)
+    """
+    if os.path.isdir(source):
+        items = []
+        for root, dirs, files in os.walk(source):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            for name in sorted(files):
+                if not name.startswith(".") and is_document(name):
+                    items.append(("file", os.path.join(root, name)))
+        return items
+    
+    if not os.path.isfile(source):
+        raise Exception(f"No such file or directory: {source}")
+    
+    if is_document(source):
+        return [("file", source)]
+    
+    with open(source, encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    return [("url", line) for line in lines if line and not line.startswith("#")]
 
+def load_checkpoint(output_path, retry_failed=False):
+    """Sources that already have a record in the output file"""
+    finished = set()
+    if not os.path.exists(output_path):
+        return finished
+    
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Last line of a run that was killed mid-write
+                continue
+            if retry_failed and record.get("status") != "done":
+                continue
+            finished.add(record["source"])
+    
+    return finished
+
+def init_worker(llm_concurrency):
+    """
+    Worker process setup, before the analyzers are imported
+    Each worker already is a separate process, so CPU-bound stages run
+    in-process, and the LLM rate limit is split between the workers.
+    Workers never open the Chroma database: they embed the chunks and the
+    parent adds them (PersistentClient is not safe across processes)
+    """
+    os.environ["CPU_WORKERS"] = "0"
+    os.environ["LLM_CONCURRENCY"] = str(llm_concurrency)
+    os.environ["DEFER_VECTOR_WRITES"] = "1"
+
+def ingest_one(kind, source, mode, summary_length, summary_format, model_id):
+    """
+    Analyze one document or URL (runs in a worker process); returns its record
+    The embedded chat chunks ride along under "chunks" for the parent to store
+    """
+    from services.analyzer import analyze_website, analyze_youtube
+    from batch_processor import FILE_ANALYZERS, get_file_type
+    from youtube_reader import is_youtube_url
+    from document_store import take_deferred_chunks
+    
+    start = time.perf_counter()
+    try:
+        if kind == "url" and is_youtube_url(source):
+            result = analyze_youtube(source, mode, summary_length, summary_format, model_id)
+        elif kind == "url":
+            result = analyze_website(source, mode, summary_length, summary_format, model_id)
+        else:
+            result = FILE_ANALYZERS[get_file_type(source)](source, mode, summary_length, summary_format, model_id)
+    except Exception as e:
+        result = {"error": f"Failed to analyze: {str(e)}"}
+    
+    record = {
+        "source": source,
+        "kind": kind,
+        "status": "failed" if "error" in result else "done",
+        "duration_seconds": round(time.perf_counter() - start, 2),
+        "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+    if "error" in result:
+        record["error"] = result["error"]
+    else:
+        record["result"] = result
+        if result.get("doc_id"):
+            record["chunks"] = take_deferred_chunks(result["doc_id"])
+    return record
+
+def store_chunks(record):
+    """Add the chunks a worker embedded to the Chroma database (parent process only)"""
+    chunks = record.pop("chunks", None)
+    if not chunks:
+        return
+    
+    from document_store import add_deferred_chunks
+    try:
+        add_deferred_chunks(record["result"]["doc_id"], chunks)
+    except Exception as e:
+        print(f"⚠️ Warning: Could not store {record['source']} for chat: {e}")
+        record["result"]["doc_id"] = None
+
+def source_type_of(record):
+    """Analysis.source_type the web app would have used for this record"""
+    if record["kind"] == "url":
+        from youtube_reader import is_youtube_url
+        return "youtube" if is_youtube_url(record["source"]) else "website"
+    
+    from batch_processor import get_file_type
+    return get_file_type(record["source"])
+
+def save_to_database(app, user_id, record, args):
+    """Store a finished record as an Analysis of the given user; returns its id"""
+    from models import db, Analysis
+    
+    result = record["result"]
+    with app.app_context():
+        analysis = Analysis(
+            user_id=user_id,
+            title=result.get('title', 'Untitled'),
+            source_type=source_type_of(record),
+            source_url=record["source"] if record["kind"] == "url" else os.path.basename(record["source"]),
+            doc_id=result.get('doc_id'),
+            summary_format=args.format,
+            summary_mode=args.mode,
+            summary_length=args.length,
+            word_count=result.get('analysis', {}).get('reading_time', {}).get('word_count', 0),
+            reading_time=result.get('analysis', {}).get('reading_time', {}).get('reading_time', 'Unknown'),
+            tags='ingest'
+        )
+        analysis.set_result_data(result)
+        db.session.add(analysis)
+        db.session.commit()
+        return analysis.id
+
+def find_user(app, name):
+    """User id by username or email"""
+    from models import User
+    
+    with app.app_context():
+        user = User.query.filter((User.username == name) | (User.email == name)).first()
+        if user is None:
+            raise Exception(f"No user named {name}")
+        return user.id
+
+def end_partial_line(output_path):
+    """Terminate the cut-off last line of a killed run so new records start on their own line"""
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        return
+    with open(output_path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+def write_record(output, record):
+    """Append a record and make sure it is on disk before moving on"""
+    output.write(json.dumps(record, default=str) + "\n")
+    output.flush()
+    os.fsync(output.fileno())
+
+def run_ingest(args):
+    items = collect_sources(args.source)
+    finished = load_checkpoint(args.output, args.retry_failed)
+    todo = [(kind, source) for kind, source in items if source not in finished]
+    
+    print(f"📥 {len(items)} documents found, {len(items) - len(todo)} already in {args.output}, {len(todo)} to go")
+    if not todo:
+        return 0
+    
+    app = user_id = None
+    if args.user:
+        from app import app
+        user_id = find_user(app, args.user)
+    
+    from worker_pool import LLM_CONCURRENCY
+    llm_concurrency = max(1, LLM_CONCURRENCY // args.workers)
+    
+    done = failed = 0
+    started = time.perf_counter()
+    pending = iter(todo)
+    in_flight = {}
+    
+    executor = ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(llm_concurrency,)
+    )
+    
+    end_partial_line(args.output)
+    
+    try:
+        with open(args.output, "a", encoding="utf-8") as output:
+            while True:
+                # Keep a couple of items queued per worker, never the whole backlog
+                while len(in_flight) < args.workers * 2:
+                    item = next(pending, None)
+                    if item is None:
+                        break
+                    future = executor.submit(ingest_one, *item, args.mode, args.length, args.format, args.model)
+                    in_flight[future] = item
+                
+                if not in_flight:
+                    break
+                
+                finished_futures, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished_futures:
+                    kind, source = in_flight.pop(future)
+                    record = future.result()
+                    store_chunks(record)
+                    
+                    if record["status"] == "done" and user_id is not None:
+                        try:
+                            record["analysis_id"] = save_to_database(app, user_id, record, args)
+                        except Exception as e:
+                            print(f"⚠️ Warning: Could not save {source} to the database: {e}")
+                    
+                    write_record(output, record)
+                    
+                    if record["status"] == "done":
+                        done += 1
+                    else:
+                        failed += 1
+                        print(f"❌ {source}: {record['error']}")
+                    
+                    count = done + failed
+                    if count % 10 == 0 or count == len(todo):
+                        rate = count / max(time.perf_counter() - started, 0.01)
+                        print(f"📊 {count}/{len(todo)} ({failed} failed) · {rate * 60:.1f} docs/min")
+    
+    except BrokenProcessPool:
+        print("❌ A worker process died. Run the same command again to resume.")
+        return 1
+    except KeyboardInterrupt:
+        print("\n⏹️ Interrupted. Run the same command again to resume.")
+        return 130
+    finally:
+        # Queued items are cancelled by hand: shutdown(cancel_futures=True) needs Python 3.9
+        for future in in_flight:
+            future.cancel()
+        executor.shutdown(wait=False)
+    
+    print(f"✅ Ingest complete: {done} done, {failed} failed -> {args.output}")
+    return 0 if not failed else 2
+
+def run_analyze(args):
+    """Analyze a single URL or file and print its summary"""
+    record = ingest_one("file" if os.path.isfile(args.source) else "url", args.source,
+                        args.mode, args.length, args.format, args.model)
+    record.pop("chunks", None)
+    if record["status"] != "done":
+        print(f"❌ {record['error']}")
+        return 1
+    
+    result = record["result"]
+    print("\nTitle:", result.get("title"))
+    print("\nSummary:")
+    for point in result.get("executive_summary", []) + result.get("detailed_summary", []):
+        print(f"- {point}")
+    return 0
+
+# History queries the indexes in migrations.py are meant to serve
+EXPLAINED_FILTERS = [
+    {},
+    {"source_type": "pdf"},
+    {"favorites": "true"},
+    {"collection": "1"},
+    {"search": "report"},
+]
+
+def run_db(args):
+    """Schema migrations and history query plans"""
+    from app import app
+    from models import db
+    from migrations import upgrade, migration_status
+    
+    with app.app_context():
+        if args.action == "upgrade":
+            applied = upgrade(db.engine)
+            print(f"✅ Schema up to date ({len(applied)} migration(s) applied)")
+        
+        elif args.action == "status":
+            for version, name, applied in migration_status(db.engine):
+                print(f"{'✅' if applied else '⏳'} {version}: {name}")
+        
+        else:
+            from bulk_export import history_query
+            user_id = find_user(app, args.user) if args.user else 1
+            with db.engine.connect() as conn:
+                for filters in EXPLAINED_FILTERS:
+                    statement = history_query(user_id, filters).statement
+                    sql = str(statement.compile(db.engine, compile_kwargs={"literal_binds": True}))
+                    print(f"\n🔎 History filters: {filters or 'none'}")
+                    for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"):
+                        print(f"   {row[-1]}")
+    return 0
+
+def add_analysis_options(parser):
+    parser.add_argument("--mode", choices=["nlp", "llm"], default="nlp")
+    parser.add_argument("--length", choices=["short", "long"], default="short")
+    parser.add_argument("--format", choices=["bullets", "qa", "timeline", "insights"], default="bullets")
+    parser.add_argument("--model", default="gpt-4o-mini", help="LLM model id (llm mode)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AI Content Analyzer Pro command line")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    analyze = commands.add_parser("analyze", help="Analyze one URL or file and print the summary")
+    analyze.add_argument("source")
+    add_analysis_options(analyze)
+    
+    ingest = commands.add_parser("ingest", help="Analyze a directory or URL list into a JSONL file")
+    ingest.add_argument("source", help="Directory of documents, a text file of URLs, or a single document")
+    ingest.add_argument("--output", default=DEFAULT_OUTPUT, help="JSONL results file, also the resume checkpoint")
+    ingest.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    ingest.add_argument("--user", help="Also save each analysis to the app database under this username or email")
+    ingest.add_argument("--retry-failed", action="store_true", help="Analyze documents whose earlier attempt failed again")
+    add_analysis_options(ingest)
+    
+    database = commands.add_parser("db", help="Database schema migrations")
+    database.add_argument("action", choices=["upgrade", "status", "explain"],
+                          help="apply pending migrations, list them, or show the query plans of the history filters")
+    database.add_argument("--user", help="Username or email whose history queries to explain")
+    
+    args = parser.parse_args(argv)
+    
+    try:
+        if args.command == "ingest":
+            args.workers = max(1, args.workers)
+            return run_ingest(args)
+        if args.command == "db":
+            return run_db(args)
+        return run_analyze(args)
+    except Exception as e:
+        print(f"❌ {e}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
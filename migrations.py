@@ -0,0 +1,141 @@
+"""
+Versioned schema migrations
+
+db.create_all() only creates missing tables; anything that changes an
+existing table (new columns, new indexes) goes here as a numbered migration.
+Applied versions are recorded in the schema_migrations table and every
+migration runs once, in its own transaction, when the app starts.
+
+To change the schema: update models.py, then append a migration with the
+next version number that brings existing databases to the same state.
+Migrations must be safe on a fresh database created from the models.
+"""
+from datetime import datetime
+from sqlalchemy import inspect, text
+
+def add_collection_columns(conn):
+    """analyses.collection_id and analyses.notes (added with collections)"""
+    columns = [col['name'] for col in inspect(conn).get_columns('analyses')]
+    if 'collection_id' not in columns:
+        conn.execute(text('ALTER TABLE analyses ADD COLUMN collection_id INTEGER'))
+    if 'notes' not in columns:
+        conn.execute(text('ALTER TABLE analyses ADD COLUMN notes TEXT'))
+
+def add_history_indexes(conn):
+    """Indexes behind the history filters and ordering (same names as in models.Analysis)"""
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_analyses_user_created ON analyses (user_id, created_at)'))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_analyses_user_source_created ON analyses (user_id, source_type, created_at)'))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_analyses_user_favorite_created ON analyses (user_id, is_favorite, created_at)'))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_analyses_collection_id ON analyses (collection_id)'))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_analyses_doc_id ON analyses (doc_id)'))
+
+# Parts of result_data that are searched: summaries, insights, Q&A and timeline text
+SEARCHED_RESULT_PATHS = ['$.executive_summary', '$.detailed_summary', '$.insights', '$.qa_format', '$.timeline']
+
+def flattened_result_sql(row):
+    """SQL for the searched text of a row's result_data (NULL if it isn't valid JSON)"""
+    parts = " UNION ALL ".join(
+        f"SELECT value FROM json_tree({row}.result_data, '{path}') WHERE type = 'text'"
+        for path in SEARCHED_RESULT_PATHS
+    )
+    return f"CASE WHEN json_valid({row}.result_data) THEN (SELECT group_concat(value, ' ') FROM ({parts})) END"
+
+def add_search_index(conn):
+    """
+    SQLite FTS5 index over title, summary text, notes and tags, kept in sync by triggers
+    Other backends (and SQLite builds without FTS5) keep the LIKE search
+    """
+    if conn.dialect.name != 'sqlite':
+        print("⚠️ Full-text search index skipped: only SQLite FTS5 is supported")
+        return
+    
+    try:
+        conn.execute(text("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS analyses_fts
+            USING fts5(title, summary, notes, tags, tokenize='porter unicode61 remove_diacritics 2')
+        """))
+    except Exception as e:
+        print(f"⚠️ Full-text search index skipped, SQLite FTS5 unavailable: {e}")
+        return
+    
+    insert_new = f"""
+        INSERT INTO analyses_fts (rowid, title, summary, notes, tags)
+        VALUES (new.id, new.title, {flattened_result_sql('new')}, new.notes, new.tags);
+    """
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS analyses_fts_insert AFTER INSERT ON analyses BEGIN
+            {insert_new}
+        END
+    """))
+    conn.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS analyses_fts_delete AFTER DELETE ON analyses BEGIN
+            DELETE FROM analyses_fts WHERE rowid = old.id;
+        END
+    """))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS analyses_fts_update AFTER UPDATE OF title, result_data, notes, tags ON analyses BEGIN
+            DELETE FROM analyses_fts WHERE rowid = old.id;
+            {insert_new}
+        END
+    """))
+    
+    # Index the analyses that already exist
+    conn.execute(text("DELETE FROM analyses_fts"))
+    conn.execute(text(f"""
+        INSERT INTO analyses_fts (rowid, title, summary, notes, tags)
+        SELECT analyses.id, analyses.title, {flattened_result_sql('analyses')}, analyses.notes, analyses.tags
+        FROM analyses
+    """))
+
+# (version, name, migration); append only, never renumber
+MIGRATIONS = [
+    (1, "analyses collection columns", add_collection_columns),
+    (2, "analyses history indexes", add_history_indexes),
+    (3, "analyses full-text search index", add_search_index),
+]
+
+def ensure_migrations_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT NOT NULL
+            )
+        """))
+
+def applied_versions(engine):
+    ensure_migrations_table(engine)
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+
+def pending_migrations(engine):
+    applied = applied_versions(engine)
+    return [migration for migration in MIGRATIONS if migration[0] not in applied]
+
+def upgrade(engine):
+    """
+    Apply every pending migration, oldest first
+    Returns: list of applied versions
+    """
+    applied = []
+    for version, name, migrate in pending_migrations(engine):
+        try:
+            with engine.begin() as conn:
+                migrate(conn)
+                conn.execute(
+                    text('INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)'),
+                    {'version': version, 'name': name, 'applied_at': datetime.utcnow().isoformat()}
+                )
+        except Exception as e:
+            raise Exception(f"Migration {version} ({name}) failed: {e}")
+        
+        print(f"🗃️ Applied migration {version}: {name}")
+        applied.append(version)
+    
+    return applied
+
+def migration_status(engine):
+    """(version, name, applied?) for every migration"""
+    applied = applied_versions(engine)
+    return [(version, name, version in applied) for version, name, _ in MIGRATIONS]
@@ -39,6 +39,15 @@ class Collection(db.Model):
 
 class Analysis(db.Model):
     __tablename__ = 'analyses'
+    # History filters by user (+ source type / favorites) newest first; existing
+    # databases get these from migrations.py
+    __table_args__ = (
+        db.Index('ix_analyses_user_created', 'user_id', 'created_at'),
+        db.Index('ix_analyses_user_source_created', 'user_id', 'source_type', 'created_at'),
+        db.Index('ix_analyses_user_favorite_created', 'user_id', 'is_favorite', 'created_at'),
+        db.Index('ix_analyses_collection_id', 'collection_id'),
+        db.Index('ix_analyses_doc_id', 'doc_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -89,4 +98,231 @@ class Analysis(db.Model):
         self.tags = ','.join(tags_list)
     
     def __repr__(self):
-        return f'<Analysis {self.title}>'
\ No newline at end of file
+        return f'<Analysis {self.title}>'
+
+class CrawlJob(db.Model):
+    __tablename__ = 'crawl_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    collection_id = db.Column(db.Integer, db.ForeignKey('collections.id'), nullable=True)
+    
+    # Crawl settings
+    seed_url = db.Column(db.Text, nullable=False)
+    max_depth = db.Column(db.Integer, default=2)
+    max_pages = db.Column(db.Integer, default=100)
+    summary_mode = db.Column(db.String(50), default='nlp')
+    summary_length = db.Column(db.String(50), default='short')
+    summary_format = db.Column(db.String(50), default='bullets')
+    
+    # Progress: queued, running, completed, cancelled, failed
+    status = db.Column(db.String(20), default='queued')
+    pages_discovered = db.Column(db.Integer, default=0)
+    pages_analyzed = db.Column(db.Integer, default=0)
+    pages_duplicate = db.Column(db.Integer, default=0)
+    pages_failed = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    collection = db.relationship('Collection', backref='crawl_jobs')
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'seed_url': self.seed_url,
+            'status': self.status,
+            'max_depth': self.max_depth,
+            'max_pages': self.max_pages,
+            'pages_discovered': self.pages_discovered,
+            'pages_analyzed': self.pages_analyzed,
+            'pages_duplicate': self.pages_duplicate,
+            'pages_failed': self.pages_failed,
+            'collection_id': self.collection_id,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+    
+    def __repr__(self):
+        return f'<CrawlJob {self.seed_url}>'
+
+class WorkerLease(db.Model):
+    """Claim on a piece of background work by one server process (see leases.py)"""
+    __tablename__ = 'worker_leases'
+    
+    name = db.Column(db.String(100), primary_key=True)
+    owner = db.Column(db.String(100), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f'<WorkerLease {self.name} {self.owner}>'
+
+class WatchedPage(db.Model):
+    __tablename__ = 'watched_pages'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    # Latest version of the page's analysis; each detected change adds a new Analysis
+    analysis_id = db.Column(db.Integer, db.ForeignKey('analyses.id'), nullable=True)
+    url = db.Column(db.Text, nullable=False)
+    doc_id = db.Column(db.String(100))
+    check_interval_hours = db.Column(db.Integer, default=24)
+    is_active = db.Column(db.Boolean, default=True)
+    
+    # What the last check saw: HTTP validators and content fingerprints
+    etag = db.Column(db.String(255))
+    last_modified = db.Column(db.String(100))
+    content_hash = db.Column(db.String(64))
+    section_hashes = db.Column(db.Text)  # JSON: section locator -> hash
+    
+    # Progress: pending, unchanged, changed, error
+    status = db.Column(db.String(20), default='pending')
+    version = db.Column(db.Integer, default=1)
+    check_count = db.Column(db.Integer, default=0)
+    change_count = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.Text)
+    last_checked_at = db.Column(db.DateTime)
+    last_changed_at = db.Column(db.DateTime)
+    next_check_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    analysis = db.relationship('Analysis')
+    
+    def get_section_hashes(self):
+        if self.section_hashes:
+            return json.loads(self.section_hashes)
+        return {}
+    
+    def set_section_hashes(self, hashes):
+        self.section_hashes = json.dumps(hashes)
+    
+    def __repr__(self):
+        return f'<WatchedPage {self.url}>'
+
+class BatchJob(db.Model):
+    __tablename__ = 'batch_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    
+    # Analysis settings applied to every item
+    summary_mode = db.Column(db.String(50), default='nlp')
+    summary_length = db.Column(db.String(50), default='short')
+    summary_format = db.Column(db.String(50), default='bullets')
+    
+    # Progress: receiving (items still being uploaded), running, completed, cancelled, failed
+    status = db.Column(db.String(20), default='receiving')
+    items_total = db.Column(db.Integer, default=0)
+    items_done = db.Column(db.Integer, default=0)
+    items_failed = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    items = db.relationship('BatchItem', backref='job', lazy='dynamic', cascade='all, delete-orphan')
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'items_total': self.items_total,
+            'items_done': self.items_done,
+            'items_failed': self.items_failed,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+    
+    def __repr__(self):
+        return f'<BatchJob {self.id}>'
+
+class BatchItem(db.Model):
+    __tablename__ = 'batch_items'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('batch_jobs.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)
+    
+    # kind: file or url; source: file name or URL; stored_path: the queued upload on disk
+    kind = db.Column(db.String(10), nullable=False)
+    source = db.Column(db.Text, nullable=False)
+    stored_path = db.Column(db.Text)
+    
+    # Progress: pending, running, done, failed
+    status = db.Column(db.String(20), default='pending')
+    # 1, 2, 3... in the order items finished, so pollers can ask for what's new
+    finish_order = db.Column(db.Integer)
+    error = db.Column(db.Text)
+    duration_seconds = db.Column(db.Float)
+    result_data = db.Column(db.Text)
+    finished_at = db.Column(db.DateTime)
+    
+    def set_result_data(self, data):
+        self.result_data = json.dumps(data)
+    
+    def get_result_data(self):
+        if self.result_data:
+            return json.loads(self.result_data)
+        return {}
+    
+    def to_dict(self):
+        result = self.get_result_data()
+        return {
+            'index': self.position + 1,
+            'source': self.source,
+            'status': self.status,
+            'finish_order': self.finish_order,
+            'title': result.get('title'),
+            'method': result.get('method'),
+            'error': self.error,
+            'duration_seconds': self.duration_seconds
+        }
+    
+    def __repr__(self):
+        return f'<BatchItem {self.source}>'
+
+class ExportJob(db.Model):
+    """Bulk export of a user's history (or a filtered part of it) to a file"""
+    __tablename__ = 'export_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    
+    # jsonl, csv, parquet, pdf or docx
+    format = db.Column(db.String(20), nullable=False)
+    filters = db.Column(db.Text)  # JSON: history filters (search, source_type, collection, favorites)
+    
+    # Progress: running, completed, failed
+    status = db.Column(db.String(20), default='running')
+    rows_total = db.Column(db.Integer, default=0)
+    rows_written = db.Column(db.Integer, default=0)
+    path = db.Column(db.Text)
+    error = db.Column(db.Text)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    def get_filters(self):
+        return json.loads(self.filters) if self.filters else {}
+    
+    def set_filters(self, filters):
+        self.filters = json.dumps(filters)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'format': self.format,
+            'filters': self.get_filters(),
+            'status': self.status,
+            'rows_total': self.rows_total,
+            'rows_written': self.rows_written,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+    
+    def __repr__(self):
+        return f'<ExportJob {self.id} {self.format}>'
@@ -1,5 +1,6 @@
 import os
 from dotenv import load_dotenv
+from worker_pool import llm_slots
 from openai import OpenAI, RateLimitError
 from smart_preprocessor import SmartPreprocessor
 
@@ -185,12 +186,13 @@ def summarize_with_gpt(text, source_type, summary_length, model="gpt-4o-mini"):
     prompt = build_enhanced_prompt(cleaned_text, source_type, summary_length, content_type)
     
     try:
-        response = openai_client.chat.completions.create(
-            model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"""You are an elite content analyst specializing in {content_type} material.
+        with llm_slots:
+            response = openai_client.chat.completions.create(
+                model=model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": f"""You are an elite content analyst specializing in {content_type} material.
 
 Your expertise:
 - Extracting substance from noisy documents
@@ -212,14 +214,14 @@ You excel at summarizing:
 - News articles and reports  
 - Business documents and analyses
 - Research findings and studies"""
-                },
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=1200 if summary_length == "long" else 600,
-            presence_penalty=0.1,  # Encourage covering different aspects
-            frequency_penalty=0.1   # Reduce repetition
-        )
+                    },
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.3,
+                max_tokens=1200 if summary_length == "long" else 600,
+                presence_penalty=0.1,  # Encourage covering different aspects
+                frequency_penalty=0.1   # Reduce repetition
+            )
         return response.choices[0].message.content.strip()
     except RateLimitError:
         raise ModelUnavailable("OpenAI rate limit reached")
@@ -250,15 +252,16 @@ def summarize_with_gemini(text, source_type, summary_length):
 {prompt}"""
     
     try:
-        response = gemini_model.generate_content(
-            full_prompt,
-            generation_config={
-                'temperature': 0.3,
-                'max_output_tokens': 1200 if summary_length == "long" else 600,
-                'top_p': 0.8,
-                'top_k': 40
-            }
-        )
+        with llm_slots:
+            response = gemini_model.generate_content(
+                full_prompt,
+                generation_config={
+                    'temperature': 0.3,
+                    'max_output_tokens': 1200 if summary_length == "long" else 600,
+                    'top_p': 0.8,
+                    'top_k': 40
+                }
+            )
         return response.text.strip()
     except Exception as e:
         raise ModelUnavailable(f"Gemini API error: {str(e)}")
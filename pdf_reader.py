@@ -1,7 +1,33 @@
 import re
+import os
+import time
+import hashlib
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
 from pypdf import PdfReader
 from pypdf.errors import PdfReadError
 from collections import Counter
+from segments import Segment, record_segments
+from worker_pool import iter_cpu_bound
+
+# pypdfium2 renders pages without needing poppler; OCR fallback is skipped without it
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+    print("pypdfium2 not installed. Scanned PDF pages will not be OCR'd. Install with: pip install pypdfium2")
+
+OCR_CACHE_FOLDER = "ocr_cache"
+# OCR'd pages not read for this long are removed
+OCR_CACHE_TTL_SECONDS = 90 * 24 * 3600
+EVICT_INTERVAL_SECONDS = 3600
+OCR_RENDER_DPI = 300
+
+# In-memory PDFs up to this size are handed to OCR workers as bytes; larger
+# ones are copied once to a private temp file the workers can open by path
+OCR_INLINE_BYTES = 8 * 1024 * 1024
 
 def detect_repeated_patterns(text):
     """Detect and remove repeated headers/footers"""
@@ -104,42 +130,252 @@ def clean_academic_pdf(text):
     
     return final_text
 
-def extract_text_from_pdf(file_path, max_pages=30):
-    """Extract text from PDF with improved cleaning for academic documents"""
+def compute_file_hash(file_path):
+    """
+    Hash file contents so cached OCR results survive renames and re-uploads
+    file_path: a path or a seekable binary file object
+    """
+    sha = hashlib.sha256()
+    if hasattr(file_path, "read"):
+        file_path.seek(0)
+        for block in iter(lambda: file_path.read(1024 * 1024), b""):
+            sha.update(block)
+        file_path.seek(0)
+        return sha.hexdigest()
+    
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+@contextmanager
+def worker_pdf_source(file_path):
+    """
+    Something an OCR worker process can open: the path itself, the bytes of
+    a small in-memory PDF, or the path of a temp copy of a large one
+    """
+    if not hasattr(file_path, "read"):
+        yield file_path
+        return
+    
+    file_path.seek(0, os.SEEK_END)
+    size = file_path.tell()
+    file_path.seek(0)
+    
+    if size <= OCR_INLINE_BYTES:
+        data = file_path.read()
+        file_path.seek(0)
+        yield data
+        return
+    
+    with tempfile.NamedTemporaryFile(prefix="ocr_", suffix=".pdf") as temp:
+        shutil.copyfileobj(file_path, temp, 1024 * 1024)
+        temp.flush()
+        file_path.seek(0)
+        yield temp.name
+
+_last_eviction = 0
+_eviction_lock = threading.Lock()
+
+def _ocr_cache_path(file_hash, page_index):
+    return os.path.join(OCR_CACHE_FOLDER, file_hash[:2], file_hash, f"page_{page_index}.txt")
+
+def _read_cached_ocr(file_hash, page_index):
+    path = _ocr_cache_path(file_hash, page_index)
     try:
-        reader = PdfReader(file_path)
-        
-        if reader.is_encrypted:
-            return "", ["PDF is encrypted and cannot be read"]
-        
-        total_pages = len(reader.pages)
-        if total_pages == 0:
-            return "", ["PDF has no pages"]
-        
-        text = ""
-        errors = []
-        pages_to_process = min(max_pages, total_pages)
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        # Touching it keeps pages of documents still in use from being evicted
+        os.utime(path)
+        return text
+    except OSError:
+        return None
+
+def _write_cached_ocr(file_hash, page_index, text):
+    path = _ocr_cache_path(file_hash, page_index)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    
+    # Write to a temp file first so a crashed run never leaves a half-written entry
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
 
-        for i in range(pages_to_process):
+def evict_stale_ocr(force=False):
+    """Remove OCR'd pages nobody read within the TTL; a no-op if that ran recently"""
+    global _last_eviction
+    now = time.time()
+    with _eviction_lock:
+        if not force and now - _last_eviction < EVICT_INTERVAL_SECONDS:
+            return 0
+        _last_eviction = now
+    
+    removed = 0
+    for root, _, files in os.walk(OCR_CACHE_FOLDER):
+        for name in files:
+            path = os.path.join(root, name)
             try:
-                page = reader.pages[i]
-                page_text = page.extract_text()
-                
-                if page_text:
-                    text += page_text + "\n"
-            except Exception as e:
-                errors.append(f"Failed to extract text from page {i+1}: {str(e)}")
+                if now - os.path.getmtime(path) > OCR_CACHE_TTL_SECONDS:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+    
+    if removed:
+        print(f"🧹 Evicted {removed} stale OCR cache page(s)")
+    return removed
+
+def _ocr_pdf_page(file_path, page_index, dpi=OCR_RENDER_DPI):
+    """
+    Rasterize a single PDF page and OCR it
+    Runs inside a worker process, so it opens its own document handle
+    file_path: path or bytes of the PDF
+    """
+    from image_reader import ocr_image_to_text
+    
+    try:
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            page = pdf[page_index]
+            bitmap = page.render(scale=dpi / 72)
+            image = bitmap.to_pil()
+            return ocr_image_to_text(image)
+        finally:
+            pdf.close()
+    except Exception as e:
+        # Some OCR errors can't be unpickled in the parent and would break the pool
+        raise Exception(f"{type(e).__name__}: {e}")
+
+def ocr_pdf_pages(file_path, page_indexes, file_hash=None):
+    """
+    OCR the given pages of a PDF on the shared CPU worker pool
+    Results are cached per (file hash, page) so re-runs are instant;
+    pages not read for OCR_CACHE_TTL_SECONDS are evicted
+    Returns: (dict of page_index -> text, list of errors)
+    """
+    if pdfium is None:
+        return {}, ["OCR fallback unavailable: pypdfium2 is not installed"]
+    
+    file_hash = file_hash or compute_file_hash(file_path)
+    page_texts = {}
+    errors = []
+    
+    # Serve what we can from the cache first
+    pending = []
+    for page_index in page_indexes:
+        cached = _read_cached_ocr(file_hash, page_index)
+        if cached is not None:
+            page_texts[page_index] = cached
+        else:
+            pending.append(page_index)
+    
+    if not pending:
+        return page_texts, errors
+    
+    print(f"🔎 OCR fallback for {len(pending)} scanned page(s) ({len(page_texts)} cached)")
+    
+    with worker_pdf_source(file_path) as source:
+        pages = ((source, page_index) for page_index in pending)
+        for (_, page_index), text in iter_cpu_bound(_ocr_pdf_page, pages):
+            if isinstance(text, Exception):
+                errors.append(f"OCR failed on page {page_index+1}: {str(text)}")
+                continue
+            page_texts[page_index] = text
+            _write_cached_ocr(file_hash, page_index, text)
+    
+    evict_stale_ocr()
+    return page_texts, errors
+
+def read_pdf_pages(file_path, max_pages=30, ocr_fallback=True):
+    """
+    Extract the raw text of each page, OCR'ing pages that have no text layer
+    file_path: a path or a seekable binary file object (e.g. an upload stream)
+    Returns: (list of page texts, list of errors)
+    """
+    reader = PdfReader(file_path)
+    
+    if reader.is_encrypted:
+        return [], ["PDF is encrypted and cannot be read"]
+    
+    total_pages = len(reader.pages)
+    if total_pages == 0:
+        return [], ["PDF has no pages"]
+    
+    errors = []
+    pages_to_process = min(max_pages, total_pages)
+    page_texts = [""] * pages_to_process
+
+    for i in range(pages_to_process):
+        try:
+            page = reader.pages[i]
+            page_texts[i] = page.extract_text() or ""
+        except Exception as e:
+            errors.append(f"Failed to extract text from page {i+1}: {str(e)}")
+    
+    # Pages without a text layer are most likely scans - OCR them instead
+    empty_pages = [i for i, page_text in enumerate(page_texts) if not page_text.strip()]
+    if ocr_fallback and empty_pages:
+        ocr_texts, ocr_errors = ocr_pdf_pages(file_path, empty_pages)
+        errors.extend(ocr_errors)
+        for i, page_text in ocr_texts.items():
+            page_texts[i] = page_text
+    
+    return page_texts, errors
+
+def page_segments(page_texts):
+    """
+    Turn page texts into page segments, dropping repeated headers/footers
+    and lines that are only page numbers (the line structure is kept)
+    """
+    repeated_lines = detect_repeated_patterns("\n".join(page_texts))
+    
+    for i, page_text in enumerate(page_texts):
+        lines = []
+        for line in page_text.split("\n"):
+            if line in repeated_lines or re.match(r'^[\d\s\.\-–—]*$', line):
+                continue
+            lines.append(re.sub(r'\s+', ' ', line).strip())
+        
+        text = "\n".join(line for line in lines if line)
+        if text:
+            yield Segment("page", f"Page {i+1}", text)
+
+def iter_pdf_segments(file_path, metadata=None, max_pages=30, ocr_fallback=True):
+    """
+    Yield one segment per page of a PDF
+    metadata receives "pages" (pages read) and "errors" (pages that failed)
+    """
+    page_texts, errors = read_pdf_pages(file_path, max_pages, ocr_fallback)
+    if metadata is not None:
+        metadata["pages"] = len(page_texts)
+        metadata["errors"] = errors
+    yield from page_segments(page_texts)
+
+def extract_text_from_pdf(file_path, max_pages=30, ocr_fallback=True, segments=None):
+    """
+    Extract text from PDF with improved cleaning for academic documents
+    segments: optional list that receives the per-page segments
+    Returns: (text, list of errors)
+    """
+    try:
+        metadata = {}
+        page_texts = [
+            segment.text
+            for segment in record_segments(iter_pdf_segments(file_path, metadata, max_pages, ocr_fallback), segments)
+        ]
         
-        if not text.strip():
+        if not page_texts:
+            if not metadata["pages"]:
+                return "", metadata["errors"]
             return "", ["No text could be extracted. The PDF might contain only images or scanned content"]
         
         # Clean the extracted text aggressively
-        text = clean_academic_pdf(text)
+        text = clean_academic_pdf("\n".join(page_texts))
         
         if len(text) < 100:
             return "", ["Insufficient meaningful text content extracted from PDF"]
         
-        return text.strip(), errors
+        return text.strip(), metadata["errors"]
     
     except PdfReadError as e:
         raise Exception(f"Invalid or corrupted PDF file: {str(e)}")
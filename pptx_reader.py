@@ -1,45 +1,185 @@
 from pptx import Presentation
+from pptx.enum.shapes import MSO_SHAPE_TYPE
+from segments import Segment, record_segments
+from worker_pool import iter_cpu_bound
 import re
 
-def extract_text_from_pptx(file_path):
+# Pictures smaller than this (icons, bullets, logos) are not worth OCR'ing
+MIN_OCR_IMAGE_WIDTH = 300
+MIN_OCR_IMAGE_HEIGHT = 100
+MIN_OCR_TEXT_LENGTH = 10
+
+def iter_shapes(shapes):
+    """Walk shapes recursively, descending into grouped shapes"""
+    for shape in shapes:
+        if shape.shape_type == MSO_SHAPE_TYPE.GROUP:
+            yield from iter_shapes(shape.shapes)
+        else:
+            yield shape
+
+def slide_text_parts(slide):
+    """Collect the text of every shape (and table cell) on a slide"""
+    text_parts = []
+    
+    for shape in iter_shapes(slide.shapes):
+        if hasattr(shape, "text") and shape.text:
+            text = shape.text.strip()
+            if text:
+                text_parts.append(text)
+        
+        # Extract text from tables
+        if getattr(shape, "has_table", False) and shape.has_table:
+            table = shape.table
+            for row in table.rows:
+                for cell in row.cells:
+                    cell_text = cell.text.strip()
+                    if cell_text:
+                        text_parts.append(cell_text)
+    
+    return text_parts
+
+def slide_notes_text(slide):
+    """Speaker notes of a slide, or an empty string"""
+    if not slide.has_notes_slide:
+        return ""
+    notes_frame = slide.notes_slide.notes_text_frame
+    return notes_frame.text.strip() if notes_frame is not None else ""
+
+def slide_images(slide):
     """
-    Extract text from PPTX file
-    Returns: (text, metadata)
+    Pictures on a slide that are large enough to hold readable text
+    Returns: list of (sha1, image blob)
     """
-    try:
-        prs = Presentation(file_path)
-        
-        # Extract metadata
-        metadata = {
+    images = []
+    for shape in iter_shapes(slide.shapes):
+        if shape.shape_type != MSO_SHAPE_TYPE.PICTURE:
+            continue
+        try:
+            image = shape.image
+            width, height = image.size
+        except Exception:
+            # Linked or unsupported images have no embedded blob
+            continue
+        if width >= MIN_OCR_IMAGE_WIDTH and height >= MIN_OCR_IMAGE_HEIGHT:
+            images.append((image.sha1, image.blob))
+    return images
+
+def ocr_slide_images(blobs_by_hash):
+    """
+    OCR unique slide pictures on the shared CPU worker pool
+    Each distinct image (by hash) is recognized once, however many slides repeat it
+    Returns: dict of sha1 -> text
+    """
+    from image_reader import ocr_image_bytes
+    
+    if not blobs_by_hash:
+        return {}
+    
+    print(f"🖼️ OCR'ing {len(blobs_by_hash)} unique slide image(s)")
+    
+    hash_by_blob = {blob: image_hash for image_hash, blob in blobs_by_hash.items()}
+    texts = {}
+    for (blob,), result in iter_cpu_bound(ocr_image_bytes, ((blob,) for blob in hash_by_blob)):
+        if isinstance(result, Exception):
+            print(f"⚠️ Could not OCR slide image: {result}")
+            continue
+        text = re.sub(r'\s+', ' ', result[0]).strip()
+        if len(text) >= MIN_OCR_TEXT_LENGTH:
+            texts[hash_by_blob[blob]] = text
+    
+    return texts
+
+def iter_pptx_segments(file_path, metadata=None, include_notes=True, ocr_images=True):
+    """
+    Yield segments per slide: the slide text ("slide"), its speaker notes
+    ("notes") and the text OCR'd from its pictures ("image"), all located
+    by slide number
+    metadata receives the core properties and the slide/notes/image counts
+    
+    Slide text and notes are read in one cheap pass over the in-memory XML;
+    only the picture OCR - the expensive part - is fanned out to a pool.
+    """
+    prs = Presentation(file_path)
+    
+    if metadata is not None:
+        metadata.update({
             "title": prs.core_properties.title or "Untitled Presentation",
             "author": prs.core_properties.author or "Unknown",
             "created": str(prs.core_properties.created) if prs.core_properties.created else "Unknown",
             "modified": str(prs.core_properties.modified) if prs.core_properties.modified else "Unknown",
-            "slides": len(prs.slides)
-        }
+            "slides": len(prs.slides),
+            "slides_with_notes": 0,
+            "images_with_text": 0
+        })
+    
+    slides = []
+    blobs_by_hash = {}
+    
+    for slide_num, slide in enumerate(prs.slides, 1):
+        title_shape = slide.shapes.title
+        title = title_shape.text.strip() if title_shape is not None and title_shape.text else None
+        
+        image_hashes = []
+        if ocr_images:
+            for image_hash, blob in slide_images(slide):
+                blobs_by_hash.setdefault(image_hash, blob)
+                if image_hash not in image_hashes:
+                    image_hashes.append(image_hash)
+        
+        slides.append({
+            "number": slide_num,
+            "title": title,
+            "text_parts": slide_text_parts(slide),
+            "notes": slide_notes_text(slide) if include_notes else "",
+            "image_hashes": image_hashes
+        })
+    
+    image_texts = ocr_slide_images(blobs_by_hash) if blobs_by_hash else {}
+    
+    for slide in slides:
+        locator = f"Slide {slide['number']}"
+        
+        if slide["text_parts"]:
+            text = re.sub(r'\s+', ' ', " ".join(slide["text_parts"])).strip()
+            yield Segment("slide", locator, text, heading=slide["title"])
+        
+        if slide["notes"]:
+            if metadata is not None:
+                metadata["slides_with_notes"] += 1
+            notes = re.sub(r'\s+', ' ', slide["notes"]).strip()
+            yield Segment("notes", locator, notes, heading=slide["title"])
+        
+        for image_hash in slide["image_hashes"]:
+            if image_hash in image_texts:
+                if metadata is not None:
+                    metadata["images_with_text"] += 1
+                yield Segment("image", locator, image_texts[image_hash], heading=slide["title"])
+
+def extract_text_from_pptx(file_path, segments=None, include_notes=True, ocr_images=True):
+    """
+    Extract text from PPTX file, including speaker notes and text in pictures
+    file_path: a path or a seekable binary file object (e.g. an upload stream)
+    segments: optional list that receives the per-slide segments
+    Returns: (text, metadata)
+    """
+    try:
+        metadata = {}
         
-        # Extract text from all slides
+        # Extract text from all slides, keeping a marker per slide
         text_parts = []
+        current_locator = None
         
-        for slide_num, slide in enumerate(prs.slides, 1):
-            # Add slide marker
-            text_parts.append(f"[Slide {slide_num}]")
+        for segment in record_segments(iter_pptx_segments(file_path, metadata, include_notes, ocr_images), segments):
+            if segment.locator != current_locator:
+                text_parts.append(f"[{segment.locator}]")
+                current_locator = segment.locator
             
-            # Extract text from all shapes in the slide
-            for shape in slide.shapes:
-                if hasattr(shape, "text") and shape.text:
-                    text = shape.text.strip()
-                    if text:
-                        text_parts.append(text)
-                
-                # Extract text from tables
-                if shape.has_table:
-                    table = shape.table
-                    for row in table.rows:
-                        for cell in row.cells:
-                            cell_text = cell.text.strip()
-                            if cell_text:
-                                text_parts.append(cell_text)
+            if segment.kind == "notes":
+                text_parts.append(f"Speaker notes: {segment.text}")
+            elif segment.kind == "image":
+                text_parts.append(f"Image text: {segment.text}")
+            else:
+                text_parts.append(segment.text)
         
         full_text = " ".join(text_parts)
         
@@ -50,6 +190,6 @@ def extract_text_from_pptx(file_path):
             raise Exception("No readable text found in PPTX file")
         
         return full_text, metadata
-        
+    
     except Exception as e:
-        raise Exception(f"Error reading PPTX file: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Error reading PPTX file: {str(e)}")
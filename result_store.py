@@ -0,0 +1,97 @@
+import json
+import time
+import secrets
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Analysis results waiting to be exported, keyed by an opaque id kept in the session
+RESULT_STORE_PATH = "result_store.sqlite"
+RESULT_TTL_SECONDS = 24 * 3600
+EVICT_INTERVAL_SECONDS = 600
+
+class ResultStore:
+    """
+    Server-side store for the current analysis / batch results of a session
+    
+    Only the key goes into the (cookie) session; results stay on disk in
+    SQLite and expire after ttl seconds. Expired rows are evicted lazily,
+    at most once every EVICT_INTERVAL_SECONDS.
+    """
+    
+    def __init__(self, path=RESULT_STORE_PATH, ttl=RESULT_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self._last_eviction = 0
+        self._lock = threading.Lock()
+        
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_expires ON results (expires_at)")
+    
+    @contextmanager
+    def _connect(self):
+        """Connection that commits on success and is always closed"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def put(self, data, key=None):
+        """Store data (anything JSON serializable), returns its key"""
+        key = key or secrets.token_urlsafe(24)
+        payload = json.dumps(data, default=str)
+        
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, data, expires_at) VALUES (?, ?, ?)",
+                (key, payload, time.time() + self.ttl)
+            )
+        
+        self.evict_expired()
+        return key
+    
+    def get(self, key):
+        """Stored data, or None when the key is unknown or expired"""
+        if not key:
+            return None
+        
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT data FROM results WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        
+        return json.loads(row[0]) if row else None
+    
+    def delete(self, key):
+        if not key:
+            return
+        with self._connect() as conn:
+            conn.execute("DELETE FROM results WHERE key = ?", (key,))
+    
+    def evict_expired(self, force=False):
+        """Drop expired results; a no-op if that already happened recently"""
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_eviction < EVICT_INTERVAL_SECONDS:
+                return 0
+            self._last_eviction = now
+        
+        with self._connect() as conn:
+            removed = conn.execute("DELETE FROM results WHERE expires_at <= ?", (now,)).rowcount
+        
+        if removed:
+            print(f"🧹 Evicted {removed} expired stored result(s)")
+        return removed
+
+result_store = ResultStore()
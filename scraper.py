@@ -1,87 +1,246 @@
 import requests
-from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
+from urllib.parse import urljoin
 import re
+from segments import Segment
+from http_fetcher import fetch_url
 
-def scrape_website(url):
+# Elements that never hold article text
+NOISE_TAGS = ('script', 'style', 'nav', 'header', 'footer',
+              'aside', 'iframe', 'noscript', 'form')
+
+def _class_xpath(name):
+    return f'//*[contains(concat(" ", normalize-space(@class), " "), " {name} ")]'
+
+# Common main content containers, most specific first
+MAIN_CONTENT_XPATHS = [
+    '//main',
+    '//article',
+    '//*[@role="main"]',
+    _class_xpath('main-content'),
+    _class_xpath('content'),
+    '//*[@id="main"]',
+    '//*[@id="content"]',
+    _class_xpath('article-content'),
+    _class_xpath('post-content')
+]
+
+BLOCK_TAGS = ('h1', 'h2', 'h3', 'p', 'li')
+HEADING_TAGS = ('h1', 'h2', 'h3')
+
+# Text density scoring: paragraphs shorter than this don't vote for a container
+MIN_SCORED_PARAGRAPH = 25
+
+def normalize_text(text):
+    # str.split() collapses whitespace several times faster than a regex
+    return " ".join(text.split())
+
+def parse_html(html_text):
+    """Parse HTML with lxml's C parser (encoding declarations in the markup are ignored)"""
+    parser = lxml_html.HTMLParser(encoding="utf-8", remove_comments=True)
+    return lxml_html.document_fromstring(html_text.encode("utf-8", errors="replace"), parser=parser)
+
+def link_density(element, text_length):
+    if not text_length:
+        return 1.0
+    link_length = sum(len(normalize_text(link.text_content())) for link in element.iter('a'))
+    return min(link_length / text_length, 1.0)
+
+def find_densest_block(root):
+    """
+    Readability-style scoring: every substantial paragraph votes for its parent
+    (and half a vote for its grandparent), weighted by length and commas; the
+    totals are discounted by how much of each container's text is links
+    Returns: (element, text length) or (None, 0)
+    """
+    scores = {}
+    for paragraph in root.iter('p', 'pre'):
+        text = normalize_text(paragraph.text_content())
+        if len(text) < MIN_SCORED_PARAGRAPH:
+            continue
+        
+        score = 1 + text.count(',') + min(len(text) // 100, 3)
+        parent = paragraph.getparent()
+        if parent is None:
+            continue
+        scores[parent] = scores.get(parent, 0) + score
+        grandparent = parent.getparent()
+        if grandparent is not None:
+            scores[grandparent] = scores.get(grandparent, 0) + score / 2
+    
+    best, best_score, best_length = None, 0, 0
+    for element, score in scores.items():
+        text_length = len(normalize_text(element.text_content()))
+        score *= 1 - link_density(element, text_length)
+        if score > best_score:
+            best, best_score, best_length = element, score, text_length
+    
+    return best, best_length
+
+def find_main_content(root):
+    """
+    Pick the element holding the article text
+    A semantic container (<main>, <article>, .content, ...) is kept when it
+    contains the densest text block; otherwise the densest block wins.
+    """
+    semantic = None
+    for xpath in MAIN_CONTENT_XPATHS:
+        matches = root.xpath(xpath)
+        if matches:
+            semantic = matches[0]
+            break
+    
+    best, best_length = find_densest_block(root)
+    
+    if semantic is not None:
+        if best is None or best is semantic or any(ancestor is semantic for ancestor in best.iterancestors()):
+            return semantic
+        # A container that misses the densest block still wins if it holds comparable text
+        if len(normalize_text(semantic.text_content())) >= best_length / 2:
+            return semantic
+    if best is not None:
+        return best
+    
+    return semantic if semantic is not None else root.find('body')
+
+def block_text(element):
+    """Visible text of a heading/paragraph/list item, without nested lists"""
+    if element.tag == 'li' and (element.find('.//ul') is not None or element.find('.//ol') is not None):
+        parts = [element.text or '']
+        for child in element:
+            if child.tag not in ('ul', 'ol'):
+                parts.append(child.text_content())
+            parts.append(child.tail or '')
+        return normalize_text(''.join(parts))
+    return normalize_text(element.text_content())
+
+def extract_links(root, base_url):
+    """Absolute href of every followable <a> in the document, in order, without repeats"""
+    base_href = root.find('.//base')
+    if base_href is not None and base_href.get('href'):
+        base_url = urljoin(base_url, base_href.get('href'))
+    
+    links = []
+    seen = set()
+    for anchor in root.iter('a'):
+        href = (anchor.get('href') or '').strip()
+        if not href or href.startswith(('#', 'mailto:', 'javascript:', 'tel:')):
+            continue
+        if 'nofollow' in (anchor.get('rel') or '').lower():
+            continue
+        link = urljoin(base_url, href)
+        if link not in seen:
+            seen.add(link)
+            links.append(link)
+    return links
+
+def iter_html_segments(html_text, metadata=None, base_url=None):
+    """
+    Yield the main content of a web page as heading and paragraph segments
+    base_url: when given, metadata also receives the page's absolute links
+              (read before anything else, so index pages without enough
+              text still have them)
+    metadata receives the page title
+    """
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        response = requests.get(url, timeout=10, headers=headers)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, "html.parser")
+        root = parse_html(html_text)
+    except (etree.ParserError, ValueError):
+        raise Exception("Could not extract content from webpage")
+    
+    # Links are read before noise removal: navigation is what a crawl follows
+    if metadata is not None and base_url:
+        metadata["links"] = extract_links(root, base_url)
+    
+    # Extract title
+    title = normalize_text(root.findtext('.//title') or '') or "Website"
+    if metadata is not None:
+        metadata["title"] = title
+    
+    # Remove unwanted elements that add noise (keeping the text that follows them)
+    etree.strip_elements(root, *NOISE_TAGS, with_tail=False)
+    
+    # Line breaks separate words
+    for br in root.iter('br'):
+        br.tail = ' ' + (br.tail or '')
+    
+    main_content = find_main_content(root)
+    
+    if main_content is None:
+        raise Exception("Could not extract content from webpage")
+    
+    heading = None
+    
+    # Get headings and paragraphs in order
+    for element in main_content.iter(*BLOCK_TAGS):
+        # List items wrapping paragraphs are covered by the paragraphs themselves
+        if element.tag == 'li' and element.find('.//p') is not None:
+            continue
+        
+        text = block_text(element)
+        
+        # Headings open a new section for chunking and citations
+        if element.tag in HEADING_TAGS and text:
+            heading = text
+            yield Segment("heading", f"Section: {heading}", heading, heading=heading)
+        
+        elif text and len(text) > 20:  # Filter out very short snippets
+            locator = f"Section: {heading}" if heading else "Introduction"
+            yield Segment("paragraph", locator, text, heading=heading)
 
-        # Extract title
-        title = soup.title.text.strip() if soup.title else "Website"
-        
-        # Remove unwanted elements that add noise
-        for element in soup(['script', 'style', 'nav', 'header', 'footer', 
-                            'aside', 'iframe', 'noscript', 'form']):
-            element.decompose()
-        
-        # Try to find main content area first
-        main_content = None
-        
-        # Look for common main content containers
-        main_selectors = [
-            'main',
-            'article',
-            '[role="main"]',
-            '.main-content',
-            '.content',
-            '#main',
-            '#content',
-            '.article-content',
-            '.post-content'
-        ]
-        
-        for selector in main_selectors:
-            main_content = soup.select_one(selector)
-            if main_content:
-                break
-        
-        # If no main content area found, use body
-        if not main_content:
-            main_content = soup.find("body")
-        
-        if not main_content:
-            return {"error": "Could not extract content from webpage"}
-        
-        # Extract text from paragraphs and headings for better structure
-        content_parts = []
-        
-        # Get headings and paragraphs in order
-        for element in main_content.find_all(['h1', 'h2', 'h3', 'p', 'li']):
-            text = element.get_text(strip=True)
-            if text and len(text) > 20:  # Filter out very short snippets
-                content_parts.append(text)
-        
-        content = " ".join(content_parts)
-        
-        # Clean up the content
-        content = re.sub(r'\s+', ' ', content)  # Normalize whitespace
-        content = re.sub(r'\.{2,}', '.', content)  # Remove multiple dots
-        
-        # Remove common footer/boilerplate patterns
-        boilerplate_patterns = [
-            r'All rights reserved.*',
-            r'Copyright \d{4}.*',
-            r'Terms and Conditions.*',
-            r'Privacy Policy.*',
-            r'Cookie Settings.*'
-        ]
-        
-        for pattern in boilerplate_patterns:
-            content = re.sub(pattern, '', content, flags=re.IGNORECASE)
-        
-        content = content.strip()
-        
-        if not content or len(content) < 100:
-            return {"error": "Insufficient meaningful content found on the webpage"}
+def extract_page(html_text, base_url=None):
+    """
+    Extract title, main text and segments from an HTML document
+    base_url: when given, the page's links are returned too (under "links",
+              even for pages without enough text, e.g. index pages)
+    Returns: {"title", "content", "segments"} or {"error": ...}
+    """
+    metadata = {}
+    try:
+        segments = list(iter_html_segments(html_text, metadata, base_url))
+        page = {"title": metadata["title"], "content": page_content(segments), "segments": segments}
+        if not page["content"] or len(page["content"]) < 100:
+            page = {"error": "Insufficient meaningful content found on the webpage"}
+    except Exception as e:
+        page = {"error": str(e)}
+    
+    if "links" in metadata:
+        page["links"] = metadata["links"]
+    return page
 
-        return {"title": title, "content": content}
+def page_content(segments):
+    """Main text of a page from its segments, without very short headings and boilerplate"""
+    content = " ".join(segment.text for segment in segments if len(segment.text) > 20)
+    
+    # Clean up the content
+    content = re.sub(r'\s+', ' ', content)  # Normalize whitespace
+    content = re.sub(r'\.{2,}', '.', content)  # Remove multiple dots
+    
+    # Remove common footer/boilerplate patterns
+    boilerplate_patterns = [
+        r'All rights reserved.*',
+        r'Copyright \d{4}.*',
+        r'Terms and Conditions.*',
+        r'Privacy Policy.*',
+        r'Cookie Settings.*'
+    ]
+    
+    for pattern in boilerplate_patterns:
+        content = re.sub(pattern, '', content, flags=re.IGNORECASE)
+    
+    return content.strip()
+
+def scrape_website(url, include_links=False):
+    """
+    Fetch and extract a web page
+    include_links: also return the page's absolute links (used by the crawler)
+    """
+    try:
+        # Pooled, cached fetch: unchanged pages come back as 304s or cache hits
+        response = fetch_url(url, timeout=10)
+        if response.cache_status != "miss":
+            print(f"♻️ {url} served from HTTP cache ({response.cache_status})")
+        
+        return extract_page(response.text, base_url=response.url if include_links else None)
     
     except requests.exceptions.Timeout:
         return {"error": "Request timed out. The website took too long to respond"}
@@ -92,4 +251,4 @@ def scrape_website(url):
     except requests.exceptions.RequestException as e:
         return {"error": f"Failed to fetch website: {str(e)}"}
     except Exception as e:
-        return {"error": f"An error occurred while processing the website: {str(e)}"}
\ No newline at end of file
+        return {"error": f"An error occurred while processing the website: {str(e)}"}
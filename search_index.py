@@ -0,0 +1,81 @@
+import re
+from markupsafe import Markup, escape
+from sqlalchemy import table, column, text, or_
+
+from models import db, Analysis
+
+# Full-text index created by migrations.py (SQLite FTS5); rowid = analyses.id
+analyses_fts = table('analyses_fts', column('rowid'), column('rank'))
+
+SNIPPET_TOKENS = 16
+# Highlight markers are control characters so they survive HTML escaping
+_MARK_START, _MARK_END = "\x02", "\x03"
+
+_has_index = None
+
+def has_search_index():
+    """Whether the database has the FTS index (checked once)"""
+    global _has_index
+    if _has_index is None:
+        try:
+            _has_index = db.session.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'analyses_fts'")
+            ).first() is not None
+        except Exception:
+            _has_index = False
+    return _has_index
+
+def match_expression(search):
+    """
+    FTS5 query for free text typed by a user: every word must match,
+    the last one also as a prefix (so results show up while typing)
+    Returns None when there is nothing to search for
+    """
+    words = re.findall(r"\w+", search.lower())
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*']
+    return " ".join(terms)
+
+def search_analyses(query, search):
+    """
+    Narrow an Analysis query to a search, best matches first
+    Uses the FTS index over title, summaries, insights, Q&A, notes and tags;
+    without it, falls back to LIKE on title, notes and tags (newest first)
+    """
+    expression = match_expression(search)
+    
+    if expression and has_search_index():
+        return query.join(analyses_fts, analyses_fts.c.rowid == Analysis.id) \
+            .filter(text("analyses_fts MATCH :search_terms").bindparams(search_terms=expression)) \
+            .order_by(analyses_fts.c.rank, Analysis.created_at.desc())
+    
+    pattern = f"%{search}%"
+    return query.filter(or_(
+        Analysis.title.ilike(pattern),
+        Analysis.notes.ilike(pattern),
+        Analysis.tags.ilike(pattern)
+    )).order_by(Analysis.created_at.desc())
+
+def search_snippets(analysis_ids, search):
+    """
+    Highlighted snippet of the best matching text for each analysis id
+    Returns: {analysis id: Markup}
+    """
+    expression = match_expression(search)
+    if not analysis_ids or not expression or not has_search_index():
+        return {}
+    
+    rows = db.session.execute(
+        text(f"""
+            SELECT rowid, snippet(analyses_fts, -1, :start, :end, '…', {SNIPPET_TOKENS})
+            FROM analyses_fts
+            WHERE analyses_fts MATCH :search_terms AND rowid IN ({",".join(str(int(i)) for i in analysis_ids)})
+        """),
+        {"start": _MARK_START, "end": _MARK_END, "search_terms": expression}
+    )
+    
+    return {
+        rowid: Markup(str(escape(snippet)).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>"))
+        for rowid, snippet in rows if snippet
+    }
@@ -0,0 +1,57 @@
+"""
+Document segments and the reader signature
+
+Every reader exposes its document as a stream of segments through
+
+    iter_<format>_segments(source, metadata=None, **options)
+
+source:   a path or seekable binary file object (the HTML text for web pages)
+metadata: optional dict the reader fills in while reading (title, counts,
+          errors...); complete once the stream has been consumed
+
+extract_text_from_<format> is built on the same stream, so the text that is
+summarized and the segments chunked for chat come from a single parse.
+"""
+
+class Segment:
+    """
+    One structural piece of a document, as produced by the readers
+
+    kind:    what the piece is ("page", "slide", "sheet", "heading",
+             "paragraph", "table", "section", "image", "caption")
+    locator: human readable position used for chat citations ("Page 3",
+             "Slide 12", "Sheet: Revenue", "12:30")
+    heading: nearest heading above the piece, if the format has headings
+    text:    the extracted text
+    """
+
+    __slots__ = ("kind", "locator", "heading", "text")
+
+    def __init__(self, kind, locator, text, heading=None):
+        self.kind = kind
+        self.locator = locator
+        self.text = text
+        self.heading = heading
+
+    def __repr__(self):
+        preview = self.text[:40].replace("\n", " ")
+        return f"<Segment {self.kind} {self.locator!r}: {preview!r}>"
+
+def record_segments(segments, sink=None):
+    """
+    Pass a segment stream through, also appending each segment to sink
+    Lets a reader build its text and hand the same segments to the caller
+    from a single parse
+    """
+    for segment in segments:
+        if sink is not None:
+            sink.append(segment)
+        yield segment
+
+def describe_locator_range(first, last):
+    """Locator for a chunk spanning several segments ("Page 3 – Page 4")"""
+    if not first:
+        return last or ""
+    if not last or first == last:
+        return first
+    return f"{first} – {last}"
@@ -4,9 +4,10 @@ from docx_reader import extract_text_from_docx
 from pptx_reader import extract_text_from_pptx
 from xlsx_reader import extract_text_from_xlsx
 from image_reader import extract_text_from_image
+from youtube_reader import extract_transcript_from_youtube
 from multi_model_summarizer import summarize_with_model, ModelUnavailable, get_available_models, MODEL_INFO
 from summarizer import summarize_text, parse_llm_output
-from services.content_analyzer import ContentAnalyzer
+from services.content_analyzer import ContentAnalyzer, analyze_properties
 from advanced_summarizer import (
     generate_qa_format, 
     generate_timeline_format, 
@@ -16,8 +17,11 @@ from advanced_summarizer import (
     parse_insights_format
 )
 from document_store import store_document
+from spreadsheet_store import SpreadsheetTableWriter
 from chat_service import generate_suggested_questions
 from smart_preprocessor import SmartPreprocessor
+from worker_pool import run_cpu_bound
+from analysis_cache import deduplicated
 
 # Initialize content analyzer
 content_analyzer = ContentAnalyzer()
@@ -33,14 +37,22 @@ def detect_source_type(file_type="webpage"):
         "docx": "word document",
         "pptx": "presentation",
         "xlsx": "spreadsheet",
-        "image": "image text (OCR)"
+        "image": "image text (OCR)",
+        "youtube": "video transcript"
     }
     return type_mapping.get(file_type, "document")
 
-def analyze_content(text, title, metadata, source_type, mode, summary_length, summary_format="bullets", model_id="gpt-4o-mini"):
+def source_name(path):
+    """Printable name of a file path or an uploaded file stream"""
+    return path if isinstance(path, str) else "uploaded file"
+
+def analyze_content(text, title, metadata, source_type, mode, summary_length, summary_format="bullets", model_id="gpt-4o-mini", segments=None):
     """
     Common analysis function for all content types
     
+    segments: optional reader segments (pages, slides, sections...) used to
+    chunk the document along its structure for chat
+    
     Process:
     1. Clean text with SmartPreprocessor
     2. Analyze content (sentiment, entities, topics, etc.)
@@ -65,7 +77,7 @@ def analyze_content(text, title, metadata, source_type, mode, summary_length, su
     
     # STEP 2: Analyze content properties (sentiment, entities, etc.)
     print(f"\n🔍 Analyzing content properties...")
-    analysis = content_analyzer.analyze_full(cleaned_text)
+    analysis = run_cpu_bound(analyze_properties, cleaned_text)
     print(f"✅ Analysis complete: {analysis.get('sentiment', {}).get('sentiment', 'N/A')} sentiment")
     
     # STEP 3: Store CLEANED document in vector database for chat
@@ -74,7 +86,8 @@ def analyze_content(text, title, metadata, source_type, mode, summary_length, su
     
     try:
         print(f"\n💾 Storing cleaned document in vector database for chat...")
-        doc_id = store_document(cleaned_text, title, metadata)
+        cleaned_segments = preprocessor.clean_segments(segments, source_type) if segments is not None else None
+        doc_id = store_document(cleaned_text, title, metadata, segments=cleaned_segments)
         print(f"✅ Document stored with ID: {doc_id}")
         
         print(f"🤔 Generating suggested questions...")
@@ -200,11 +213,14 @@ def analyze_content(text, title, metadata, source_type, mode, summary_length, su
     
     return result
 
-def analyze_website(url, mode="llm", summary_length="short", summary_format="bullets", model_id="gpt-4o-mini"):
-    """Analyze website content"""
+def analyze_website(url, mode="llm", summary_length="short", summary_format="bullets", model_id="gpt-4o-mini", page=None):
+    """
+    Analyze website content
+    page: an already scraped page (from async_fetcher), skips the download
+    """
     print(f"\n🌐 Analyzing website: {url}")
     
-    data = scrape_website(url)
+    data = page if page is not None else scrape_website(url)
     if "error" in data:
         return data
     
@@ -216,15 +232,59 @@ def analyze_website(url, mode="llm", summary_length="short", summary_format="bul
         mode, 
         summary_length,
         summary_format,
-        model_id
+        model_id,
+        segments=data.get("segments")
     )
 
+def analyze_youtube(url, mode="llm", summary_length="short", summary_format="bullets", model_id="gpt-4o-mini"):
+    """Analyze a YouTube video from its captions"""
+    print(f"\n🎬 Analyzing YouTube video: {url}")
+    
+    segments = []
+    try:
+        text, metadata = extract_transcript_from_youtube(url, segments=segments)
+    except Exception as e:
+        return {"error": str(e)}
+    
+    return analyze_content(
+        text, 
+        metadata["title"], 
+        metadata, 
+        "youtube", 
+        mode, 
+        summary_length,
+        summary_format,
+        model_id,
+        segments=segments
+    )
+
+def summarize_changes(changed_text, mode="nlp", summary_length="short", model_id="gpt-4o-mini"):
+    """
+    Summarize only the changed sections of a watched page
+    Returns: list of summary points
+    """
+    cleaned_text = preprocessor.smart_clean(changed_text, "webpage") or changed_text
+    
+    if mode == "llm":
+        try:
+            raw = summarize_with_model(cleaned_text, "webpage (changed sections)", summary_length, model_id)
+            parsed = parse_llm_output(raw)
+            points = parsed["executive_summary"] + parsed["detailed_summary"]
+            if points:
+                return points
+        except ModelUnavailable as e:
+            print(f"⚠️ AI unavailable for change summary, using NLP: {e}")
+    
+    return [summarize_text(cleaned_text)]
+
+@deduplicated("pdf")
 def analyze_pdf(path, mode="llm", summary_length="short", summary_format="bullets", model_id="gpt-4o-mini"):
     """Analyze PDF document"""
-    print(f"\n📄 Analyzing PDF: {path}")
+    print(f"\n📄 Analyzing PDF: {source_name(path)}")
     
+    segments = []
     try:
-        text, _ = extract_text_from_pdf(path)
+        text, _ = extract_text_from_pdf(path, segments=segments)
     except Exception as e:
         return {"error": f"Failed to read PDF: {str(e)}"}
     
@@ -239,15 +299,18 @@ def analyze_pdf(path, mode="llm", summary_length="short", summary_format="bullet
         mode, 
         summary_length,
         summary_format,
-        model_id
+        model_id,
+        segments=segments
     )
 
+@deduplicated("docx")
 def analyze_docx(path, mode="llm", summary_length="short", summary_format="bullets", model_id="gpt-4o-mini"):
     """Analyze Word document"""
-    print(f"\n📝 Analyzing Word document: {path}")
+    print(f"\n📝 Analyzing Word document: {source_name(path)}")
     
+    segments = []
     try:
-        text, metadata = extract_text_from_docx(path)
+        text, metadata = extract_text_from_docx(path, segments=segments)
     except Exception as e:
         return {"error": str(e)}
     
@@ -262,15 +325,18 @@ def analyze_docx(path, mode="llm", summary_length="short", summary_format="bulle
         mode, 
         summary_length,
         summary_format,
-        model_id
+        model_id,
+        segments=segments
     )
 
+@deduplicated("pptx")
 def analyze_pptx(path, mode="llm", summary_length="short", summary_format="bullets", model_id="gpt-4o-mini"):
     """Analyze PowerPoint presentation"""
-    print(f"\n📊 Analyzing PowerPoint: {path}")
+    print(f"\n📊 Analyzing PowerPoint: {source_name(path)}")
     
+    segments = []
     try:
-        text, metadata = extract_text_from_pptx(path)
+        text, metadata = extract_text_from_pptx(path, segments=segments)
     except Exception as e:
         return {"error": str(e)}
     
@@ -285,38 +351,59 @@ def analyze_pptx(path, mode="llm", summary_length="short", summary_format="bulle
         mode, 
         summary_length,
         summary_format,
-        model_id
+        model_id,
+        segments=segments
     )
 
+@deduplicated("xlsx")
 def analyze_xlsx(path, mode="llm", summary_length="short", summary_format="bullets", model_id="gpt-4o-mini"):
     """Analyze Excel spreadsheet"""
-    print(f"\n📈 Analyzing Excel file: {path}")
+    print(f"\n📈 Analyzing Excel file: {source_name(path)}")
     
-    try:
-        text, metadata = extract_text_from_xlsx(path)
-    except Exception as e:
-        return {"error": str(e)}
+    # Rows are loaded into SQLite while streaming so chat can answer aggregates with SQL
+    table_writer = SpreadsheetTableWriter()
+    segments = []
     
-    if not text or len(text.strip()) < 50:
-        return {"error": "No readable data found in Excel file or content too short"}
+    try:
+        try:
+            text, metadata = extract_text_from_xlsx(path, table_writer=table_writer, segments=segments)
+        except Exception as e:
+            return {"error": str(e)}
+        
+        if not text or len(text.strip()) < 50:
+            return {"error": "No readable data found in Excel file or content too short"}
 
-    return analyze_content(
-        text, 
-        metadata.get("title", "Excel Spreadsheet"), 
-        metadata, 
-        "xlsx", 
-        mode, 
-        summary_length,
-        summary_format,
-        model_id
-    )
+        result = analyze_content(
+            text, 
+            metadata.get("title", "Excel Spreadsheet"), 
+            metadata, 
+            "xlsx", 
+            mode, 
+            summary_length,
+            summary_format,
+            model_id,
+            segments=segments
+        )
+        
+        if result.get("doc_id"):
+            try:
+                table_writer.attach(result["doc_id"])
+            except Exception as e:
+                print(f"⚠️ Warning: Could not store spreadsheet tables: {e}")
+        
+        return result
+    finally:
+        # Removes the temp database unless attach() moved it into place
+        table_writer.discard()
 
+@deduplicated("image")
 def analyze_image(path, mode="llm", summary_length="short", summary_format="bullets", model_id="gpt-4o-mini"):
     """Analyze image using OCR"""
-    print(f"\n🖼️ Analyzing image: {path}")
+    print(f"\n🖼️ Analyzing image: {source_name(path)}")
     
+    segments = []
     try:
-        text, metadata = extract_text_from_image(path)
+        text, metadata = extract_text_from_image(path, segments=segments)
     except Exception as e:
         return {"error": str(e)}
     
@@ -331,5 +418,6 @@ def analyze_image(path, mode="llm", summary_length="short", summary_format="bull
         mode, 
         summary_length,
         summary_format,
-        model_id
+        model_id,
+        segments=segments
     )
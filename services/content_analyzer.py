@@ -392,4 +392,15 @@ class ContentAnalyzer:
             "topics": self.detect_topics(text),
             "language": self.detect_language(text),
             "readability": self.calculate_readability(text)
-        }
\ No newline at end of file
+        }
+
+# Lives here rather than in services.analyzer: CPU workers import the module
+# of the function they run, and that one loads the vector store and embedding model
+_worker_analyzer = None
+
+def analyze_properties(text):
+    """Sentiment, entities, topics, readability... (CPU-bound, run on the worker process pool)"""
+    global _worker_analyzer
+    if _worker_analyzer is None:
+        _worker_analyzer = ContentAnalyzer()
+    return _worker_analyzer.analyze_full(text)
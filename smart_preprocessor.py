@@ -1,5 +1,6 @@
 import re
 from collections import Counter
+from segments import Segment
 
 class SmartPreprocessor:
     """Intelligent text preprocessing based on content type"""
@@ -9,6 +10,9 @@ class SmartPreprocessor:
         self.news_indicators = ['reported', 'according to', 'sources say', 'announced', 'breaking']
         self.business_indicators = ['revenue', 'profit', 'market', 'quarter', 'earnings', 'CEO', 'company']
         
+        # Sources whose text we generate ourselves (e.g. spreadsheet profiles)
+        self.structured_sources = {'xlsx'}
+        
     def detect_content_type(self, text):
         """Detect if content is academic, news, business, or general"""
         text_lower = text.lower()
@@ -118,6 +122,11 @@ class SmartPreprocessor:
         Returns:
             Cleaned text
         """
+        # Structured profiles are already clean - sentence filtering would
+        # only cut their numbers apart at the decimal point
+        if source_type in self.structured_sources:
+            return re.sub(r'\s+', ' ', text).strip()
+        
         # Detect content type
         content_type = self.detect_content_type(text)
         
@@ -155,4 +164,38 @@ class SmartPreprocessor:
         cleaned_text = re.sub(r'\s+', ' ', cleaned_text)
         cleaned_text = re.sub(r'\s*\.\s*\.', '.', cleaned_text)
         
-        return cleaned_text.strip()
\ No newline at end of file
+        return cleaned_text.strip()
+    
+    def clean_segments(self, segments, source_type='document'):
+        """
+        Lightly clean a stream of reader segments for chunking
+        
+        Unlike smart_clean this works one segment at a time, so structure
+        (pages, slides, headings) is preserved and the stream is never
+        materialized. Segments left with no real content are dropped.
+        
+        Args:
+            segments: Iterable of Segment
+            source_type: Type of document
+            
+        Yields:
+            Cleaned Segment objects
+        """
+        structured = source_type in self.structured_sources
+        
+        for segment in segments:
+            text = segment.text
+            
+            if not structured:
+                text = self.remove_dates(text)
+                text = self.remove_page_numbers(text)
+                text = re.sub(r'…+', ' ', text)
+                text = re.sub(r'\.{3,}', ' ', text)
+            
+            text = re.sub(r'\s+', ' ', text).strip()
+            
+            # Headings are kept even when short - they mark section boundaries
+            if not text or (len(text) < 20 and segment.kind != "heading"):
+                continue
+            
+            yield Segment(segment.kind, segment.locator, text, heading=segment.heading)
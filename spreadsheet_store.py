@@ -0,0 +1,375 @@
+import os
+import re
+import sqlite3
+import tempfile
+from time import monotonic
+from datetime import datetime, date, time
+
+# One SQLite file per spreadsheet document, named after its doc_id
+SPREADSHEET_DB_FOLDER = "spreadsheet_db"
+INSERT_BATCH_SIZE = 5000
+MAX_RESULT_ROWS = 50
+# Chat queries are written by an LLM; stop any that run longer than this
+QUERY_TIMEOUT_SECONDS = 5
+# SQLite virtual machine instructions between deadline checks
+PROGRESS_CHECK_INSTRUCTIONS = 10000
+
+AGGREGATE_KEYWORDS = {
+    "SUM": ["total", "sum"],
+    "AVG": ["average", "mean", "avg"],
+    "COUNT": ["how many", "count", "number of"],
+    "MAX": ["maximum", "max", "highest", "largest", "biggest"],
+    "MIN": ["minimum", "min", "lowest", "smallest"]
+}
+AGGREGATE_LABELS = {"SUM": "Total", "AVG": "Average", "COUNT": "Count", "MAX": "Maximum", "MIN": "Minimum"}
+
+# Words a template question may contain besides the aggregate and column names
+TEMPLATE_FILLER_WORDS = {
+    "what", "whats", "is", "are", "was", "were", "the", "a", "an", "of", "all", "show", "me",
+    "give", "tell", "list", "get", "calculate", "compute", "please", "there", "rows", "row",
+    "records", "record", "entries", "entry", "value", "values", "by", "per", "for", "each", "every"
+}
+
+def make_identifier(name, taken):
+    """Turn a sheet or header name into a unique, SQL-safe identifier"""
+    identifier = re.sub(r'[^0-9a-zA-Z]+', '_', str(name)).strip('_').lower() or "column"
+    if identifier[0].isdigit():
+        identifier = f"c_{identifier}"
+    
+    candidate = identifier
+    suffix = 2
+    while candidate in taken:
+        candidate = f"{identifier}_{suffix}"
+        suffix += 1
+    taken.add(candidate)
+    return candidate
+
+def to_sql_value(value):
+    """Convert a cell value into something SQLite stores natively"""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+class SpreadsheetTableWriter:
+    """
+    Streams spreadsheet rows into a SQLite file, one table per sheet
+    
+    Rows are inserted in batches while the sheet is being read, so the
+    whole workbook is never held in memory. Call attach() once the doc_id
+    is known to move the file into place for chat queries.
+    """
+    
+    def __init__(self):
+        os.makedirs(SPREADSHEET_DB_FOLDER, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(suffix=".sqlite", dir=SPREADSHEET_DB_FOLDER)
+        os.close(fd)
+        
+        self.conn = sqlite3.connect(self.path)
+        # Throwaway file until attach() - durability isn't needed while loading
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute("CREATE TABLE _sheets (sheet_name TEXT, table_name TEXT, row_count INTEGER)")
+        self.conn.execute(
+            "CREATE TABLE _columns (table_name TEXT, position INTEGER, column_name TEXT, "
+            "header TEXT, column_type TEXT)"
+        )
+        
+        self._table_names = set()
+        self._table = None
+        self._columns = []
+        self._column_names = set()
+        self._batch = []
+        self._insert_sql = None
+    
+    def start_sheet(self, sheet_name):
+        self._table = make_identifier(sheet_name, self._table_names)
+        self._sheet_name = sheet_name
+        self._columns = []
+        self._column_names = set()
+        self._batch = []
+        self._row_count = 0
+    
+    def add_columns(self, headers):
+        """Create the sheet table, or widen it when a row has extra columns"""
+        self._flush()
+        
+        new_columns = [make_identifier(header, self._column_names) for header in headers]
+        if not self._columns:
+            columns_sql = ", ".join(f'"{column}"' for column in new_columns)
+            self.conn.execute(f'CREATE TABLE "{self._table}" ({columns_sql})')
+        else:
+            for column in new_columns:
+                self.conn.execute(f'ALTER TABLE "{self._table}" ADD COLUMN "{column}"')
+        
+        self._columns.extend(zip(new_columns, headers))
+        placeholders = ", ".join("?" for _ in self._columns)
+        self._insert_sql = f'INSERT INTO "{self._table}" VALUES ({placeholders})'
+    
+    def add_row(self, row):
+        values = [to_sql_value(value) for value in row]
+        values.extend([None] * (len(self._columns) - len(values)))
+        self._batch.append(values)
+        self._row_count += 1
+        
+        if len(self._batch) >= INSERT_BATCH_SIZE:
+            self._flush()
+    
+    def _flush(self):
+        if self._batch:
+            self.conn.executemany(self._insert_sql, self._batch)
+            self._batch = []
+    
+    def finish_sheet(self, column_profiles):
+        """Record the sheet and its column types (from the profiler) in the catalog"""
+        if not self._columns:
+            return
+        
+        self._flush()
+        self.conn.execute(
+            "INSERT INTO _sheets VALUES (?, ?, ?)",
+            (self._sheet_name, self._table, self._row_count)
+        )
+        
+        for position, (column, header) in enumerate(self._columns):
+            column_type = column_profiles[position]["type"] if position < len(column_profiles) else "empty"
+            self.conn.execute(
+                "INSERT INTO _columns VALUES (?, ?, ?, ?, ?)",
+                (self._table, position, column, header, column_type)
+            )
+        self.conn.commit()
+    
+    def attach(self, doc_id):
+        """Move the loaded database to its doc_id path"""
+        self.conn.commit()
+        self.conn.close()
+        os.replace(self.path, get_spreadsheet_path(doc_id))
+        print(f"✅ Spreadsheet tables stored for SQL questions (doc {doc_id})")
+    
+    def discard(self):
+        try:
+            self.conn.close()
+        except sqlite3.Error:
+            pass
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def get_spreadsheet_path(doc_id):
+    # doc_ids are hex digests; never let anything else near the filesystem
+    safe_id = re.sub(r'[^0-9a-zA-Z_-]', '', doc_id)
+    return os.path.join(SPREADSHEET_DB_FOLDER, f"{safe_id}.sqlite")
+
+def has_spreadsheet(doc_id):
+    return bool(doc_id) and os.path.exists(get_spreadsheet_path(doc_id))
+
+def delete_spreadsheet(doc_id):
+    path = get_spreadsheet_path(doc_id)
+    if os.path.exists(path):
+        os.remove(path)
+        return True
+    return False
+
+def _deny_writes(action, arg1, arg2, db_name, trigger):
+    """sqlite3 authorizer: only reads are allowed for chat queries"""
+    if action in (sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION):
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+def open_spreadsheet(doc_id):
+    """Open a spreadsheet database read-only for querying"""
+    uri = f"file:{os.path.abspath(get_spreadsheet_path(doc_id))}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True)
+    conn.set_authorizer(_deny_writes)
+    return conn
+
+def get_schema(doc_id):
+    """
+    Describe the tables of a spreadsheet document
+    Returns: list of {table, sheet, rows, columns: [{name, header, type}]}
+    """
+    conn = open_spreadsheet(doc_id)
+    try:
+        tables = []
+        for sheet_name, table_name, row_count in conn.execute(
+            "SELECT sheet_name, table_name, row_count FROM _sheets"
+        ).fetchall():
+            columns = [
+                {"name": name, "header": header, "type": column_type}
+                for name, header, column_type in conn.execute(
+                    "SELECT column_name, header, column_type FROM _columns "
+                    "WHERE table_name = ? ORDER BY position",
+                    (table_name,)
+                ).fetchall()
+            ]
+            tables.append({"table": table_name, "sheet": sheet_name, "rows": row_count, "columns": columns})
+        return tables
+    finally:
+        conn.close()
+
+def describe_schema(schema):
+    """Render the schema as text for an LLM prompt"""
+    lines = []
+    for table in schema:
+        columns = ", ".join(
+            f'"{column["name"]}" {column["type"]} (header: {column["header"]})'
+            for column in table["columns"]
+        )
+        lines.append(f'Table "{table["table"]}" (sheet "{table["sheet"]}", {table["rows"]} rows): {columns}')
+    return "\n".join(lines)
+
+def detect_aggregate(question):
+    """Return the SQL aggregate a question asks for, or None for narrative questions"""
+    question = question.lower()
+    for function, keywords in AGGREGATE_KEYWORDS.items():
+        for keyword in keywords:
+            if re.search(rf'\b{re.escape(keyword)}\b', question):
+                return function
+    return None
+
+def _find_column(text, columns, prefer_type=None):
+    """Find the column whose header (or identifier) is mentioned in text, longest match first"""
+    text = text.lower()
+    matches = []
+    for column in columns:
+        for name in {column["header"].lower(), column["name"].replace("_", " ")}:
+            if name and re.search(rf'\b{re.escape(name)}\b', text):
+                matches.append((column["type"] == prefer_type, len(name), column))
+    if not matches:
+        return None
+    return max(matches, key=lambda match: (match[0], match[1]))[2]
+
+def _words(text):
+    return set(re.findall(r'[a-z0-9]+', text.lower()))
+
+def _uncovered_words(question, columns):
+    """Words of the question that are neither filler, aggregate keywords nor part of the given columns"""
+    covered = set(TEMPLATE_FILLER_WORDS)
+    for keywords in AGGREGATE_KEYWORDS.values():
+        for keyword in keywords:
+            covered |= _words(keyword)
+    for column in columns:
+        covered |= _words(column["header"]) | _words(column["name"])
+    return _words(question) - covered
+
+def build_template_query(question, schema):
+    """
+    Build a SQL query for simple aggregate questions without an LLM
+    Handles "<aggregate> <measure> [by|per|for each <group>]" only; a question
+    with any other word (a filter, a year, a second column) returns None so it
+    goes to the LLM instead of silently losing its conditions
+    Returns: (sql, description) or None
+    """
+    function = detect_aggregate(question)
+    if not function or not schema:
+        return None
+    
+    # Split off the grouping part of the question, if any
+    group_match = re.search(r'\b(?:by|per|for each|for every|each)\s+(.+)$', question, flags=re.IGNORECASE)
+    main_text = question[:group_match.start()] if group_match else question
+    
+    for table in schema:
+        columns = table["columns"]
+        group = _find_column(group_match.group(1), columns) if group_match else None
+        measure = _find_column(main_text, [c for c in columns if c is not group], prefer_type="numeric")
+        
+        if group_match and group is None:
+            continue
+        if function != "COUNT" and (measure is None or measure["type"] != "numeric"):
+            continue
+        if _uncovered_words(question, [c for c in (measure, group) if c]):
+            continue
+        
+        if function == "COUNT":
+            target = f'COUNT("{measure["name"]}")' if measure else "COUNT(*)"
+            label = f'Count of {measure["header"]}' if measure else "Row count"
+        else:
+            target = f'{function}("{measure["name"]}")'
+            label = f'{AGGREGATE_LABELS[function]} {measure["header"]}'
+        
+        if group:
+            sql = (
+                f'SELECT "{group["name"]}", {target} AS value FROM "{table["table"]}" '
+                f'GROUP BY "{group["name"]}" ORDER BY value DESC LIMIT {MAX_RESULT_ROWS}'
+            )
+            return sql, f'{label} by {group["header"]}'
+        
+        return f'SELECT {target} AS value FROM "{table["table"]}"', label
+    
+    return None
+
+def validate_query(doc_id, sql):
+    """
+    Check a generated query before running it: a single SELECT that compiles
+    against this document's schema. Raises Exception with the reason otherwise.
+    """
+    sql = sql.strip().rstrip(";").strip()
+    
+    if not re.match(r'^(?:select|with)\b', sql, flags=re.IGNORECASE):
+        raise Exception("Only SELECT queries are allowed")
+    if ";" in sql:
+        raise Exception("Only a single statement is allowed")
+    
+    conn = open_spreadsheet(doc_id)
+    try:
+        # EXPLAIN compiles the query, catching unknown tables and columns
+        conn.execute(f"EXPLAIN {sql}")
+    except sqlite3.Error as e:
+        raise Exception(f"Query does not match the spreadsheet schema: {e}")
+    finally:
+        conn.close()
+    
+    return sql
+
+def run_query(doc_id, sql, max_rows=MAX_RESULT_ROWS, timeout=QUERY_TIMEOUT_SECONDS):
+    """
+    Run a validated read-only query, interrupted after timeout seconds
+    Returns: (column names, rows)
+    """
+    deadline = monotonic() + timeout
+    conn = open_spreadsheet(doc_id)
+    # A non-zero return aborts the running statement
+    conn.set_progress_handler(lambda: int(monotonic() > deadline), PROGRESS_CHECK_INSTRUCTIONS)
+    try:
+        cursor = conn.execute(sql)
+        columns = [description[0] for description in cursor.description]
+        rows = cursor.fetchmany(max_rows)
+        return columns, rows
+    except sqlite3.OperationalError:
+        if monotonic() > deadline:
+            raise Exception(f"Query took longer than {timeout} seconds and was stopped")
+        raise
+    finally:
+        conn.close()
+
+def format_value(value):
+    if isinstance(value, float):
+        return f"{int(value):,}" if value.is_integer() else f"{value:,.2f}"
+    if isinstance(value, int):
+        return f"{value:,}"
+    return "(empty)" if value is None else str(value)
+
+def format_result(description, columns, rows):
+    """Render query results as a readable chat answer"""
+    if not rows:
+        return f"{description}: the query returned no rows."
+    
+    if len(rows) == 1 and len(columns) == 1:
+        return f"{description}: {format_value(rows[0][0])}"
+    
+    lines = [f"{description}:"]
+    for row in rows:
+        if len(row) == 2:
+            lines.append(f"- {format_value(row[0])}: {format_value(row[1])}")
+        else:
+            lines.append("- " + ", ".join(
+                f"{column}: {format_value(value)}" for column, value in zip(columns, row)
+            ))
+    
+    if len(rows) >= MAX_RESULT_ROWS:
+        lines.append(f"(showing the first {MAX_RESULT_ROWS} rows)")
+    
+    return "\n".join(lines)
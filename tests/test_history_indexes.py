@@ -0,0 +1,75 @@
+"""
+The history filters must be served by the indexes created in migrations.py
+
+Builds a database the way an existing install has it (tables without the
+history indexes), runs upgrade() and checks the query plan of every
+history_query filter.
+"""
+import pytest
+from flask import Flask
+from sqlalchemy import text
+
+from models import db
+from migrations import upgrade
+from bulk_export import history_query
+import search_index
+
+HISTORY_INDEXES = [
+    'ix_analyses_user_created',
+    'ix_analyses_user_source_created',
+    'ix_analyses_user_favorite_created',
+    'ix_analyses_collection_id',
+    'ix_analyses_doc_id',
+]
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'history.db'}"
+    db.init_app(app)
+    
+    with app.app_context():
+        db.create_all()
+        # A database from before the migrations: no history indexes yet
+        with db.engine.begin() as conn:
+            for name in HISTORY_INDEXES:
+                conn.execute(text(f'DROP INDEX {name}'))
+        
+        assert upgrade(db.engine) == [1, 2, 3]
+        search_index._has_index = None
+        yield app
+        db.session.remove()
+
+def query_plan(filters):
+    statement = history_query(1, filters).statement
+    sql = str(statement.compile(db.engine, compile_kwargs={"literal_binds": True}))
+    with db.engine.connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+@pytest.mark.parametrize("filters, index", [
+    ({}, 'ix_analyses_user_created'),
+    ({'source_type': 'pdf'}, 'ix_analyses_user_source_created'),
+    ({'favorites': 'true'}, 'ix_analyses_user_favorite_created'),
+    ({'collection': '1'}, 'ix_analyses_'),
+])
+def test_history_filter_uses_index(app, filters, index):
+    with app.app_context():
+        plan = query_plan(filters)
+    
+    assert any(f"USING INDEX {index}" in step or f"USING COVERING INDEX {index}" in step for step in plan), plan
+    assert not any(step.startswith("SCAN analyses") and "INDEX" not in step for step in plan), plan
+
+def test_search_uses_full_text_index(app):
+    with app.app_context():
+        plan = query_plan({'search': 'report'})
+    
+    assert any("VIRTUAL TABLE INDEX" in step and "analyses_fts" in step for step in plan), plan
+    assert any("analyses USING INTEGER PRIMARY KEY" in step for step in plan), plan
+
+def test_upgrade_is_idempotent(app):
+    with app.app_context():
+        assert upgrade(db.engine) == []
+        with db.engine.connect() as conn:
+            names = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+    
+    assert set(HISTORY_INDEXES) <= names
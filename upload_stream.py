@@ -0,0 +1,29 @@
+import os
+from tempfile import SpooledTemporaryFile
+from flask import Request
+
+# Uploads up to this size stay in memory; larger ones roll over to an
+# anonymous temp file (unique per upload, removed when closed)
+UPLOAD_MEMORY_LIMIT = 8 * 1024 * 1024
+
+class SpooledUploadRequest(Request):
+    """
+    Request that buffers each uploaded file in a SpooledTemporaryFile
+    The readers parse that buffer directly, so an upload is never saved
+    under its own file name (no collisions between concurrent uploads of
+    the same name) and never written and re-read just to be parsed
+    """
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(max_size=UPLOAD_MEMORY_LIMIT, mode="rb+")
+
+def open_upload(file_storage):
+    """
+    Seekable binary stream of an uploaded file, rewound for the readers
+    Returns: (stream, size in bytes)
+    """
+    stream = file_storage.stream
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return stream, size
@@ -0,0 +1,260 @@
+import time
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from models import db, Analysis, WatchedPage
+from leases import claim_lease, renew_lease
+from http_fetcher import http_fetcher
+from scraper import extract_page
+from crawler import content_hash
+from document_store import store_sections, delete_sections, create_document_id
+from services.analyzer import content_analyzer, preprocessor, summarize_changes
+
+# How often the scheduler looks for due pages, and how many it checks per pass
+WATCH_POLL_SECONDS = 60
+WATCH_BATCH_SIZE = 100
+WATCH_FETCH_WORKERS = 8
+WATCH_INTERVALS = [1, 6, 24, 168]  # hours
+
+# Only the process holding this lease checks pages; the others wait to take over
+WATCH_SCHEDULER_LEASE = "watch_scheduler"
+
+_scheduler_thread = None
+_scheduler_lock = threading.Lock()
+
+def watch_doc_id(watch):
+    """Stable vector-store id for a watched page, whose chunks are updated section by section"""
+    return create_document_id(f"watch:{watch.id}:{watch.url}")
+
+def group_sections(segments):
+    """Group page segments by section locator, in page order"""
+    sections = {}
+    for segment in segments:
+        sections.setdefault(segment.locator, []).append(segment)
+    return sections
+
+def hash_sections(sections):
+    return {
+        locator: content_hash(" ".join(segment.text for segment in section_segments))
+        for locator, section_segments in sections.items()
+    }
+
+def fetch_for_watch(url, etag, last_modified):
+    """
+    Conditional GET with the validators this watch last saw (not the shared
+    HTTP cache's, which other analyses may have refreshed in the meantime)
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return http_fetcher.fetch(url, timeout=15, headers=headers, use_cache=False)
+
+def record_version(watch, page, changed, added, removed, sections):
+    """Store a new Analysis version of the page with a summary of what changed"""
+    previous = watch.analysis
+    result = previous.get_result_data() if previous else {}
+    
+    changed_text = " ".join(
+        segment.text for locator in changed + added for segment in sections[locator]
+    )
+    if changed_text.strip():
+        summary_mode = previous.summary_mode if previous else "nlp"
+        summary_length = previous.summary_length if previous else "short"
+        change_summary = summarize_changes(changed_text, summary_mode, summary_length)
+    else:
+        change_summary = [f"Removed: {', '.join(removed)}"]
+    
+    cleaned_text = preprocessor.smart_clean(page["content"], "webpage")
+    analysis = content_analyzer.analyze_full(cleaned_text)
+    now = datetime.utcnow()
+    
+    result.update({
+        "title": page["title"],
+        "doc_id": watch.doc_id,
+        "analysis": analysis,
+        "version": watch.version + 1,
+        "previous_analysis_id": previous.id if previous else None,
+        "changes": {
+            "changed": changed,
+            "added": added,
+            "removed": removed,
+            "summary": change_summary,
+            "detected_at": now.isoformat()
+        }
+    })
+    
+    version = Analysis(
+        user_id=watch.user_id,
+        collection_id=previous.collection_id if previous else None,
+        title=page["title"],
+        source_type='website',
+        source_url=watch.url,
+        doc_id=watch.doc_id,
+        summary_format=previous.summary_format if previous else None,
+        summary_mode=previous.summary_mode if previous else None,
+        summary_length=previous.summary_length if previous else None,
+        word_count=analysis.get('reading_time', {}).get('word_count', 0),
+        reading_time=analysis.get('reading_time', {}).get('reading_time', 'Unknown'),
+        tags=previous.tags if previous else None
+    )
+    version.set_result_data(result)
+    db.session.add(version)
+    db.session.flush()
+    
+    watch.analysis_id = version.id
+    watch.version += 1
+    watch.change_count += 1
+    watch.last_changed_at = now
+    return version
+
+def check_watch(watch, response):
+    """
+    Apply one fetch result to a watch
+    Returns the outcome: "not_modified" (304), "unchanged" (same content
+    hash), "baseline" (first check, sections indexed) or "changed"
+    """
+    if response.status_code == 304:
+        watch.status = 'unchanged'
+        return "not_modified"
+    
+    watch.etag = response.headers.get("ETag")
+    watch.last_modified = response.headers.get("Last-Modified")
+    
+    page = extract_page(response.text)
+    if "error" in page:
+        raise Exception(page["error"])
+    
+    new_hash = content_hash(page["content"])
+    if new_hash == watch.content_hash:
+        watch.status = 'unchanged'
+        return "unchanged"
+    
+    sections = group_sections(page["segments"])
+    new_hashes = hash_sections(sections)
+    old_hashes = watch.get_section_hashes()
+    
+    def cleaned(locators):
+        return {
+            locator: list(preprocessor.clean_segments(sections[locator], "webpage"))
+            for locator in locators
+        }
+    
+    if watch.content_hash is None:
+        # First check: index every section once so later changes can be applied per section
+        store_sections(watch.doc_id, page["title"], cleaned(sections))
+        outcome = "baseline"
+        watch.status = 'unchanged'
+    else:
+        changed = [locator for locator in new_hashes if locator in old_hashes and old_hashes[locator] != new_hashes[locator]]
+        added = [locator for locator in new_hashes if locator not in old_hashes]
+        removed = [locator for locator in old_hashes if locator not in new_hashes]
+        
+        if not (changed or added or removed):
+            # Sections reordered, or only text outside every section changed: no new version
+            watch.content_hash = new_hash
+            watch.set_section_hashes(new_hashes)
+            watch.status = 'unchanged'
+            return "unchanged"
+        
+        if changed or added:
+            store_sections(watch.doc_id, page["title"], cleaned(changed + added))
+        if removed:
+            delete_sections(watch.doc_id, removed)
+        
+        record_version(watch, page, changed, added, removed, sections)
+        outcome = "changed"
+        watch.status = 'changed'
+        print(f"🔔 {watch.url} changed: {len(changed)} changed, {len(added)} added, {len(removed)} removed sections")
+    
+    watch.content_hash = new_hash
+    watch.set_section_hashes(new_hashes)
+    return outcome
+
+def check_due_watches(app, limit=WATCH_BATCH_SIZE):
+    """
+    Check every watched page that is due
+    Fetches run concurrently (conditional GETs, so mostly 304s); parsing and
+    re-analysis only happen for pages whose content actually changed
+    Must be called while holding the scheduler lease (see holds_scheduler_lease)
+    Returns: Counter of outcomes
+    """
+    outcomes = Counter()
+    
+    with app.app_context():
+        now = datetime.utcnow()
+        due = WatchedPage.query.filter(
+            WatchedPage.is_active == True,
+            WatchedPage.next_check_at <= now
+        ).order_by(WatchedPage.next_check_at).limit(limit).all()
+        
+        if not due:
+            return outcomes
+        
+        with ThreadPoolExecutor(max_workers=WATCH_FETCH_WORKERS) as executor:
+            futures = {
+                watch.id: executor.submit(fetch_for_watch, watch.url, watch.etag, watch.last_modified)
+                for watch in due
+            }
+        
+        for watch in due:
+            watch_id = watch.id
+            try:
+                if not watch.doc_id:
+                    watch.doc_id = watch_doc_id(watch)
+                outcomes[check_watch(watch, futures[watch_id].result())] += 1
+                watch.last_error = None
+            except Exception as e:
+                db.session.rollback()
+                watch = db.session.get(WatchedPage, watch_id)
+                watch.status = 'error'
+                watch.last_error = str(e)
+                outcomes["error"] += 1
+            
+            watch.check_count += 1
+            watch.last_checked_at = now
+            watch.next_check_at = now + timedelta(hours=watch.check_interval_hours or 24)
+            db.session.commit()
+            
+            # Re-analysis can take a while, so the scheduler lease is renewed after each page
+            if not renew_lease(WATCH_SCHEDULER_LEASE):
+                print("⏭️ Watchlist checks were taken over by another process")
+                break
+    
+    print(f"👁️ Checked {sum(outcomes.values())} watched page(s): {dict(outcomes)}")
+    return outcomes
+
+def holds_scheduler_lease(app):
+    """Claim (or renew) the scheduler lease; False while another process runs the checks"""
+    with app.app_context():
+        return claim_lease(WATCH_SCHEDULER_LEASE)
+
+def run_scheduler(app):
+    while True:
+        try:
+            if not holds_scheduler_lease(app):
+                time.sleep(WATCH_POLL_SECONDS)
+                continue
+            outcomes = check_due_watches(app)
+            # A full pass means more pages may be due right away
+            if sum(outcomes.values()) >= WATCH_BATCH_SIZE:
+                continue
+        except Exception as e:
+            print(f"❌ Watchlist check failed: {e}")
+        time.sleep(WATCH_POLL_SECONDS)
+
+def start_watch_scheduler(app):
+    """
+    Start the background watchlist scheduler once per process
+    Every process starts one, but only the holder of the scheduler lease checks pages
+    """
+    global _scheduler_thread
+    with _scheduler_lock:
+        if _scheduler_thread is not None and _scheduler_thread.is_alive():
+            return False
+        _scheduler_thread = threading.Thread(target=run_scheduler, args=(app,), name="watchlist", daemon=True)
+        _scheduler_thread.start()
+    return True
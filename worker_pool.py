@@ -0,0 +1,112 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+# Batch items analyzed at once; each mostly waits on fetches, OCR workers and LLM calls
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+
+# Processes for CPU-bound stages (NER, keyword/readability scoring)
+# 0 runs them in-process, for code that already runs in its own worker processes
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(os.cpu_count() or 1)))
+
+# LLM requests in flight across the whole process, to stay under the provider rate limit
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+
+llm_slots = threading.BoundedSemaphore(LLM_CONCURRENCY)
+
+_cpu_pool = None
+_cpu_pool_lock = threading.Lock()
+
+def get_cpu_pool():
+    """Shared process pool, started on first use"""
+    global _cpu_pool
+    with _cpu_pool_lock:
+        if _cpu_pool is None:
+            _cpu_pool = ProcessPoolExecutor(max_workers=CPU_WORKERS)
+        return _cpu_pool
+
+def reset_cpu_pool():
+    """Forget a broken pool so the next call starts a fresh one"""
+    global _cpu_pool
+    print("⚠️ CPU worker pool broke, restarting it")
+    with _cpu_pool_lock:
+        _cpu_pool = None
+
+def run_cpu_bound(func, *args):
+    """
+    Run a CPU-heavy function on the shared process pool and wait for it
+    func must be a module-level function; if the pool has died it runs in-process
+    """
+    if CPU_WORKERS < 1:
+        return func(*args)
+    
+    try:
+        return get_cpu_pool().submit(func, *args).result()
+    except BrokenProcessPool:
+        reset_cpu_pool()
+        return func(*args)
+
+def iter_cpu_bound(func, args_iter, window=None):
+    """
+    Run func(*args) on the shared process pool for every args tuple, yielding
+    (args, result or exception) in the order the calls finish
+    At most window calls are in flight, so a long input never piles up
+    finished results in memory; if the pool dies the rest run in-process
+    """
+    if CPU_WORKERS < 1:
+        for args in args_iter:
+            yield args, timed_call(func, *args)[0]
+        return
+    
+    window = window or CPU_WORKERS * 2
+    in_flight = {}
+    
+    def finished(futures):
+        for future in futures:
+            args = in_flight.pop(future)
+            try:
+                yield args, future.result()
+            except BrokenProcessPool:
+                reset_cpu_pool()
+                yield args, timed_call(func, *args)[0]
+            except Exception as e:
+                yield args, e
+    
+    try:
+        for args in args_iter:
+            if len(in_flight) >= window:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                yield from finished(done)
+            
+            try:
+                in_flight[get_cpu_pool().submit(func, *args)] = args
+            except BrokenProcessPool:
+                reset_cpu_pool()
+                yield args, timed_call(func, *args)[0]
+        
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            yield from finished(done)
+    finally:
+        # The consumer stopped early (e.g. a client disconnected from a stream)
+        for future in in_flight:
+            future.cancel()
+
+def timed_call(func, *args, **kwargs):
+    """
+    Call func and time it
+    Exceptions are returned in place of a result so one bad batch item can't sink the rest
+    Returns: (result or exception, seconds)
+    """
+    start = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:
+        result = e
+    return result, round(time.perf_counter() - start, 2)
+
+def batch_executor(item_count, max_workers=BATCH_WORKERS):
+    """Thread pool for analyzing a batch, no bigger than the batch itself"""
+    return ThreadPoolExecutor(max_workers=max(1, min(max_workers, item_count)), thread_name_prefix="batch")
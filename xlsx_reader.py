@@ -1,71 +1,354 @@
 from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
 from openpyxl.utils.exceptions import InvalidFileException
+from collections import Counter
+from datetime import datetime, date, time
+import numpy as np
+from segments import Segment, record_segments
+import random
 import re
 
-def extract_text_from_xlsx(file_path, max_rows=100):
+# Numeric values are buffered and reduced with NumPy in blocks of this size
+NUMERIC_BLOCK_SIZE = 8192
+# Upper bound on distinct values tracked per column for top-value counts
+MAX_TRACKED_VALUES = 1000
+TOP_VALUES = 5
+# Columns beyond this are counted but not described in the text profile
+MAX_PROFILED_COLUMNS = 40
+
+class ColumnProfile:
+    """Bounded-memory running statistics for one spreadsheet column"""
+    
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.nulls = 0
+        self.types = Counter()
+        self.values = Counter()
+        
+        # Numeric stats, reduced block by block
+        self._numeric_buffer = []
+        self.numeric_count = 0
+        self.numeric_sum = 0.0
+        self.numeric_min = None
+        self.numeric_max = None
+        
+        # Dates only need min/max; times of day can't be compared with dates,
+        # so they get their own range
+        self.date_min = None
+        self.date_max = None
+        self.time_min = None
+        self.time_max = None
+    
+    def add(self, value):
+        self.count += 1
+        
+        if value is None or (isinstance(value, str) and not value.strip()):
+            self.nulls += 1
+            return
+        
+        if isinstance(value, bool):
+            self.types["boolean"] += 1
+            self._track_value(str(value))
+        elif isinstance(value, (int, float)):
+            self.types["numeric"] += 1
+            self._numeric_buffer.append(value)
+            if len(self._numeric_buffer) >= NUMERIC_BLOCK_SIZE:
+                self._flush_numeric()
+        elif isinstance(value, time):
+            self.types["date"] += 1
+            value = value.replace(tzinfo=None)
+            if self.time_min is None or value < self.time_min:
+                self.time_min = value
+            if self.time_max is None or value > self.time_max:
+                self.time_max = value
+        elif isinstance(value, (datetime, date)):
+            self.types["date"] += 1
+            # Plain dates compare as midnight datetimes, shown as dates again by format_cell
+            if isinstance(value, datetime):
+                value = value.replace(tzinfo=None)
+            else:
+                value = datetime.combine(value, time(0, 0))
+            if self.date_min is None or value < self.date_min:
+                self.date_min = value
+            if self.date_max is None or value > self.date_max:
+                self.date_max = value
+        else:
+            self.types["text"] += 1
+            self._track_value(str(value).strip())
+    
+    def _track_value(self, value):
+        self.values[value] += 1
+        
+        # Keep the counter bounded: drop the long tail of rare values
+        if len(self.values) > 2 * MAX_TRACKED_VALUES:
+            self.values = Counter(dict(self.values.most_common(MAX_TRACKED_VALUES)))
+    
+    def _flush_numeric(self):
+        if not self._numeric_buffer:
+            return
+        
+        block = np.asarray(self._numeric_buffer, dtype=np.float64)
+        self._numeric_buffer = []
+        
+        block_min = float(block.min())
+        block_max = float(block.max())
+        self.numeric_count += block.size
+        self.numeric_sum += float(block.sum())
+        self.numeric_min = block_min if self.numeric_min is None else min(self.numeric_min, block_min)
+        self.numeric_max = block_max if self.numeric_max is None else max(self.numeric_max, block_max)
+    
+    @property
+    def dominant_type(self):
+        if not self.types:
+            return "empty"
+        return self.types.most_common(1)[0][0]
+    
+    @property
+    def null_rate(self):
+        return self.nulls / self.count if self.count else 0.0
+    
+    def summary(self):
+        """Finalize and return the profile as a plain dict"""
+        self._flush_numeric()
+        
+        profile = {
+            "name": self.name,
+            "type": self.dominant_type,
+            "count": self.count,
+            "null_rate": round(self.null_rate, 4)
+        }
+        
+        if self.numeric_count:
+            profile["min"] = self.numeric_min
+            profile["max"] = self.numeric_max
+            profile["mean"] = self.numeric_sum / self.numeric_count
+        
+        if self.date_min is not None:
+            profile["min"] = format_cell(self.date_min)
+            profile["max"] = format_cell(self.date_max)
+        elif self.time_min is not None:
+            profile["min"] = format_cell(self.time_min)
+            profile["max"] = format_cell(self.time_max)
+        
+        if self.values:
+            profile["top_values"] = self.values.most_common(TOP_VALUES)
+            profile["distinct"] = len(self.values)
+        
+        return profile
+
+def format_number(value):
+    """Compact number formatting for the text profile"""
+    if float(value).is_integer():
+        return f"{int(value):,}"
+    return f"{value:,.2f}"
+
+def format_cell(value):
+    """Render a cell value for the text profile (midnight datetimes as plain dates)"""
+    if isinstance(value, datetime):
+        if value.time() == time(0, 0):
+            return value.date().isoformat()
+        return value.isoformat(sep=" ")
+    if isinstance(value, float):
+        return format_number(value)
+    return str(value)
+
+def describe_column(profile):
+    """Render a column profile as one sentence for the summarizer"""
+    parts = [f"Column '{profile['name']}' is {profile['type']}"]
+    
+    if profile["null_rate"]:
+        parts.append(f"{round(profile['null_rate'] * 100, 1)}% empty")
+    
+    if profile["type"] == "numeric" and "mean" in profile:
+        parts.append(
+            f"ranging from {format_number(profile['min'])} to {format_number(profile['max'])} "
+            f"with mean {format_number(profile['mean'])}"
+        )
+    elif profile["type"] == "date" and "min" in profile:
+        parts.append(f"spanning {profile['min']} to {profile['max']}")
+    
+    if profile.get("top_values") and profile["type"] in ("text", "boolean"):
+        top = "; ".join(f"{value} ({count:,})" for value, count in profile["top_values"])
+        parts.append(f"most common values: {top}")
+    
+    return ", ".join(parts) + "."
+
+def is_header_row(row):
+    """A row of only text cells is treated as the header"""
+    values = [value for value in row if value is not None and str(value).strip()]
+    return bool(values) and all(isinstance(value, str) for value in values)
+
+def profile_sheet(ws, sample_rows=20, head_rows=5, seed=0, table_writer=None):
     """
-    Extract text and data from XLSX file
-    Returns: (text, metadata)
+    Stream a worksheet once, profiling every column in bounded memory
+    Keeps the first head_rows rows plus a reservoir sample of the rest
+    If a table_writer is given, every data row is also loaded into it
+    Returns: dict with row count, column profiles and sampled rows
     """
-    try:
-        wb = load_workbook(file_path, read_only=True, data_only=True)
-        
-        # Extract metadata
-        metadata = {
-            "title": wb.properties.title or "Excel Spreadsheet",
-            "author": wb.properties.creator or "Unknown",
-            "created": str(wb.properties.created) if wb.properties.created else "Unknown",
-            "modified": str(wb.properties.modified) if wb.properties.modified else "Unknown",
-            "sheets": len(wb.sheetnames),
-            "sheet_names": wb.sheetnames
-        }
+    rng = random.Random(seed)
+    headers = None
+    columns = []
+    samples = []
+    reservoir_size = max(sample_rows - head_rows, 0)
+    row_count = 0
+    
+    for row in ws.iter_rows(values_only=True):
+        # Skip fully empty rows
+        if not any(value is not None and str(value).strip() for value in row):
+            continue
         
-        text_parts = []
-        
-        # Process each worksheet
-        for sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-            
-            # Add sheet name as section header
-            text_parts.append(f"[Sheet: {sheet_name}]")
-            
-            # Get dimensions
-            max_row = min(ws.max_row, max_rows) if ws.max_row else max_rows
-            
-            # Extract data from cells
-            rows_processed = 0
-            for row_num, row in enumerate(ws.iter_rows(max_row=max_row, values_only=True), 1):
-                if rows_processed >= max_rows:
-                    break
-                
-                # Convert row to text
-                row_data = []
-                for cell_value in row:
-                    if cell_value is not None:
-                        # Convert to string and clean
-                        cell_str = str(cell_value).strip()
-                        if cell_str:
-                            row_data.append(cell_str)
-                
-                if row_data:
-                    # Join cell values with commas
-                    row_text = ", ".join(row_data)
-                    text_parts.append(row_text)
-                    rows_processed += 1
+        if headers is None:
+            if is_header_row(row):
+                headers = [str(value).strip() if value is not None else "" for value in row]
+                continue
+            headers = []
         
+        # Rows can be wider than the header; give extra columns letter names
+        known_columns = len(columns)
+        while len(columns) < len(row):
+            index = len(columns)
+            name = headers[index] if index < len(headers) and headers[index] else f"Column {get_column_letter(index + 1)}"
+            columns.append(ColumnProfile(name))
+        
+        if table_writer is not None:
+            if len(columns) > known_columns:
+                table_writer.add_columns([column.name for column in columns[known_columns:]])
+            table_writer.add_row(row)
+        
+        for index, value in enumerate(row):
+            columns[index].add(value)
+        
+        row_count += 1
+        
+        if row_count <= head_rows:
+            samples.append((row_count, row))
+        elif reservoir_size:
+            # Reservoir sampling keeps a uniform sample without holding every row
+            seen = row_count - head_rows
+            if seen <= reservoir_size:
+                samples.append((row_count, row))
+            else:
+                slot = rng.randrange(seen)
+                if slot < reservoir_size:
+                    samples[head_rows + slot] = (row_count, row)
+    
+    # Columns added late never saw the earlier rows - count those as empty
+    for column in columns:
+        missing = row_count - column.count
+        column.count += missing
+        column.nulls += missing
+    
+    samples.sort(key=lambda sample: sample[0])
+    
+    return {
+        "rows": row_count,
+        "columns": [column.summary() for column in columns],
+        "samples": [
+            (row_number, {
+                columns[index].name: value
+                for index, value in enumerate(row)
+                if value is not None and str(value).strip()
+            })
+            for row_number, row in samples
+        ]
+    }
+
+def render_sheet_profile(sheet_name, profile):
+    """Turn a sheet profile into compact text for the summarizer"""
+    columns = profile["columns"]
+    lines = [
+        f"[Sheet: {sheet_name}]",
+        f"Sheet '{sheet_name}' contains {profile['rows']:,} data rows and {len(columns)} columns."
+    ]
+    
+    for column in columns[:MAX_PROFILED_COLUMNS]:
+        if column["type"] != "empty":
+            lines.append(describe_column(column))
+    
+    if len(columns) > MAX_PROFILED_COLUMNS:
+        lines.append(f"A further {len(columns) - MAX_PROFILED_COLUMNS} columns are not described.")
+    
+    if profile["samples"]:
+        lines.append("Sample rows:")
+        for row_number, values in profile["samples"]:
+            cells = ", ".join(f"{name}: {format_cell(value)}" for name, value in values.items())
+            lines.append(f"Row {row_number}: {cells}.")
+    
+    return "\n".join(lines)
+
+def iter_sheet_profiles(wb, sample_rows=20, table_writer=None):
+    """Profile each non-empty worksheet in turn, yielding (sheet name, profile)"""
+    for sheet_name in wb.sheetnames:
+        ws = wb[sheet_name]
+        
+        if table_writer is not None:
+            table_writer.start_sheet(sheet_name)
+        
+        profile = profile_sheet(ws, sample_rows=sample_rows, table_writer=table_writer)
+        
+        if table_writer is not None:
+            table_writer.finish_sheet(profile["columns"])
+        
+        if profile["rows"]:
+            yield sheet_name, profile
+
+def iter_xlsx_segments(file_path, metadata=None, sample_rows=20, table_writer=None):
+    """
+    Yield one segment per non-empty sheet, holding its text profile
+    table_writer: optional spreadsheet_store.SpreadsheetTableWriter that
+                  receives the rows as they stream, for SQL questions in chat
+    metadata receives the workbook properties and the total row count
+    """
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        if metadata is not None:
+            metadata.update({
+                "title": wb.properties.title or "Excel Spreadsheet",
+                "author": wb.properties.creator or "Unknown",
+                "created": str(wb.properties.created) if wb.properties.created else "Unknown",
+                "modified": str(wb.properties.modified) if wb.properties.modified else "Unknown",
+                "sheets": len(wb.sheetnames),
+                "sheet_names": wb.sheetnames,
+                "total_rows": 0
+            })
+        
+        for sheet_name, profile in iter_sheet_profiles(wb, sample_rows, table_writer):
+            if metadata is not None:
+                metadata["total_rows"] += profile["rows"]
+            yield Segment("sheet", f"Sheet: {sheet_name}", render_sheet_profile(sheet_name, profile), heading=sheet_name)
+    finally:
         wb.close()
+
+def extract_text_from_xlsx(file_path, sample_rows=20, table_writer=None, segments=None):
+    """
+    Profile an XLSX file column by column instead of flattening every cell
+    Every row is streamed once through openpyxl's read-only iterator, so
+    large sheets are fully covered in bounded memory
+    file_path: a path or a seekable binary file object (e.g. an upload stream)
+    table_writer: optional spreadsheet_store.SpreadsheetTableWriter that
+                  receives the rows as they stream, for SQL questions in chat
+    segments: optional list that receives one segment per sheet
+    Returns: (text, metadata)
+    """
+    try:
+        metadata = {}
+        text_parts = [
+            segment.text
+            for segment in record_segments(iter_xlsx_segments(file_path, metadata, sample_rows, table_writer), segments)
+        ]
         
-        full_text = " ".join(text_parts)
+        full_text = "\n\n".join(text_parts)
         
-        # Clean up whitespace
-        full_text = re.sub(r'\s+', ' ', full_text).strip()
+        # Clean up runs of spaces but keep the line structure of the profile
+        full_text = re.sub(r'[ \t]+', ' ', full_text).strip()
         
         if not full_text or len(full_text) < 50:
             raise Exception("No readable data found in XLSX file")
         
         return full_text, metadata
-        
+    
     except InvalidFileException:
         raise Exception("Invalid or corrupted XLSX file")
     except Exception as e:
-        raise Exception(f"Error reading XLSX file: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Error reading XLSX file: {str(e)}")
@@ -1,6 +1,39 @@
+import os
 import re
+import json
+import threading
 import requests
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit, quote
+from segments import Segment, record_segments
+
+# Transcripts are cached per video id, they don't change once published
+TRANSCRIPT_CACHE_FOLDER = "transcript_cache"
+CAPTION_TIMEOUT = 10
+
+# Caption tracks to probe, most preferred first: (lang, kind, caption type)
+CAPTION_VARIANTS = [
+    ("en", None, "Manual"),
+    ("en-US", None, "Manual"),
+    ("en-GB", None, "Manual"),
+    ("en", "asr", "Auto-generated"),
+]
+
+# Seconds of captions grouped into one timestamped segment
+SEGMENT_SECONDS = 30
+
+YOUTUBE_HOSTS = ("youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com",
+                 "youtu.be", "www.youtube-nocookie.com")
+
+# Keep-alive connections to youtube.com, shared by the concurrent probes
+_session = requests.Session()
+_cache_lock = threading.Lock()
+
+def is_youtube_url(url):
+    """Whether a URL points at a YouTube video"""
+    host = (urlsplit(url).hostname or "").lower()
+    return host in YOUTUBE_HOSTS and extract_video_id(url) is not None
 
 def extract_video_id(url):
     """Extract YouTube video ID from URL"""
@@ -34,10 +67,158 @@ def clean_html_entities(text):
     
     return text
 
-def extract_transcript_from_youtube(url):
+def clean_caption(text):
+    """Caption line without entities and sound cues ([Music], (laughs)...)"""
+    text = clean_html_entities(text)
+    text = re.sub(r'\[.*?\]', '', text)
+    text = re.sub(r'\(.*?\)', '', text)
+    return " ".join(text.split())
+
+def format_timestamp(seconds):
+    """1:02:03 / 2:03 style video position"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+def caption_url(video_id, lang, kind=None):
+    url = f"https://www.youtube.com/api/timedtext?v={video_id}&lang={lang}"
+    return f"{url}&kind={kind}" if kind else url
+
+def fetch_caption_track(video_id, lang, kind=None):
+    """
+    Download and parse one caption track
+    Returns: list of (start seconds, duration seconds, text), empty if the track doesn't exist
+    """
+    try:
+        response = _session.get(caption_url(video_id, lang, kind), timeout=CAPTION_TIMEOUT)
+    except requests.exceptions.RequestException:
+        return []
+    
+    if response.status_code != 200 or not response.content:
+        return []
+    
+    try:
+        root = ET.fromstring(response.content)
+    except ET.ParseError:
+        return []
+    
+    lines = []
+    for text_elem in root.findall('.//text'):
+        if not text_elem.text:
+            continue
+        text = clean_caption(text_elem.text)
+        if text:
+            lines.append((
+                float(text_elem.get("start", 0)),
+                float(text_elem.get("dur", 0)),
+                text
+            ))
+    return lines
+
+def fetch_video_title(video_id):
+    """Video title from YouTube's oEmbed endpoint, None if unavailable"""
+    watch_url = quote(f"https://www.youtube.com/watch?v={video_id}", safe="")
+    try:
+        response = _session.get(f"https://www.youtube.com/oembed?url={watch_url}&format=json", timeout=CAPTION_TIMEOUT)
+        if response.status_code == 200:
+            return response.json().get("title")
+    except (requests.exceptions.RequestException, ValueError):
+        pass
+    return None
+
+def probe_captions(video_id):
+    """
+    Request every caption variant (and the title) at once; the first track
+    that comes back with text wins, so the wait is one round trip instead of
+    up to one timeout per variant
+    Returns: {"lines", "lang", "caption_type", "title"} or None
+    """
+    executor = ThreadPoolExecutor(max_workers=len(CAPTION_VARIANTS) + 1)
+    futures = {}
+    try:
+        title_future = executor.submit(fetch_video_title, video_id)
+        futures = {
+            executor.submit(fetch_caption_track, video_id, lang, kind): (lang, caption_type)
+            for lang, kind, caption_type in CAPTION_VARIANTS
+        }
+        
+        for future in as_completed(futures):
+            lines = future.result()
+            if lines:
+                lang, caption_type = futures[future]
+                # The title is a nicety: don't wait a full timeout for it
+                try:
+                    title = title_future.result(timeout=2)
+                except Exception:
+                    title = None
+                return {"lines": lines, "lang": lang, "caption_type": caption_type, "title": title}
+        
+        return None
+    finally:
+        # Losing probes may still be in flight; let them finish on their own
+        # (cancelled by hand: shutdown(cancel_futures=True) needs Python 3.9)
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+def _cache_path(video_id, folder):
+    return os.path.join(folder, f"{video_id}.json")
+
+def load_cached_transcript(video_id, folder=TRANSCRIPT_CACHE_FOLDER):
+    try:
+        with open(_cache_path(video_id, folder), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_cached_transcript(video_id, captions, folder=TRANSCRIPT_CACHE_FOLDER):
+    os.makedirs(folder, exist_ok=True)
+    path = _cache_path(video_id, folder)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with _cache_lock:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(captions, f)
+        os.replace(tmp_path, path)
+
+def get_captions(video_id, use_cache=True):
+    """Caption lines for a video, from the transcript cache or a concurrent probe"""
+    if use_cache:
+        captions = load_cached_transcript(video_id)
+        if captions:
+            print(f"♻️ Transcript for {video_id} served from cache")
+            return captions
+    
+    captions = probe_captions(video_id)
+    if captions:
+        save_cached_transcript(video_id, captions)
+    return captions
+
+def iter_transcript_segments(lines, window=SEGMENT_SECONDS):
+    """Group caption lines into segments of about window seconds, located by start time"""
+    parts = []
+    window_start = None
+    
+    for start, _, text in lines:
+        if window_start is None:
+            window_start = start
+        elif start - window_start >= window:
+            yield Segment("caption", format_timestamp(window_start), " ".join(parts))
+            parts, window_start = [], start
+        parts.append(text)
+    
+    if parts:
+        yield Segment("caption", format_timestamp(window_start), " ".join(parts))
+
+def extract_transcript_from_youtube(url, segments=None, use_cache=True):
     """
     Extract transcript from YouTube using YouTube's timedtext API
     This method doesn't require youtube-transcript-api library
+    
+    segments: optional list, filled with timestamped caption segments
+    (locators like "12:30") for chunking and chat citations
     """
     try:
         # Extract video ID
@@ -50,96 +231,40 @@ def extract_transcript_from_youtube(url):
                 "https://youtu.be/VIDEO_ID"
             )
         
-        # Try to get English captions from YouTube's API
-        caption_urls = [
-            f"https://www.youtube.com/api/timedtext?v={video_id}&lang=en",
-            f"https://www.youtube.com/api/timedtext?v={video_id}&lang=en-US",
-            f"https://www.youtube.com/api/timedtext?v={video_id}&lang=en-GB",
-        ]
-        
-        transcript_text = None
-        text_parts = []
-        
-        for api_url in caption_urls:
-            try:
-                response = requests.get(api_url, timeout=10)
-                
-                if response.status_code == 200 and response.content:
-                    # Parse XML response
-                    try:
-                        root = ET.fromstring(response.content)
-                        
-                        # Extract text from all <text> elements
-                        for text_elem in root.findall('.//text'):
-                            if text_elem.text:
-                                cleaned_text = clean_html_entities(text_elem.text)
-                                text_parts.append(cleaned_text.strip())
-                        
-                        if text_parts:
-                            transcript_text = ' '.join(text_parts)
-                            break
-                            
-                    except ET.ParseError:
-                        continue
-                        
-            except requests.exceptions.RequestException:
-                continue
-        
-        # If no English captions found, try auto-generated
-        if not transcript_text:
-            try:
-                auto_url = f"https://www.youtube.com/api/timedtext?v={video_id}&lang=en&kind=asr"
-                response = requests.get(auto_url, timeout=10)
-                
-                if response.status_code == 200 and response.content:
-                    root = ET.fromstring(response.content)
-                    text_parts = []
-                    
-                    for text_elem in root.findall('.//text'):
-                        if text_elem.text:
-                            cleaned_text = clean_html_entities(text_elem.text)
-                            text_parts.append(cleaned_text.strip())
-                    
-                    if text_parts:
-                        transcript_text = ' '.join(text_parts)
-                        
-            except Exception:
-                pass
+        captions = get_captions(video_id, use_cache=use_cache)
         
         # Check if we got any transcript
-        if not transcript_text or not text_parts:
+        if not captions or not captions["lines"]:
             raise Exception(
                 "No captions/subtitles found for this video. "
                 "Please try a video with captions enabled."
             )
         
-        # Clean up the transcript
-        transcript_text = re.sub(r'\s+', ' ', transcript_text).strip()
-        transcript_text = re.sub(r'\[.*?\]', '', transcript_text)  # Remove [Music], etc.
-        transcript_text = re.sub(r'\(.*?\)', '', transcript_text)  # Remove (sounds), etc.
+        lines = captions["lines"]
+        transcript_text = " ".join(
+            segment.text for segment in record_segments(iter_transcript_segments(lines), segments)
+        )
         
         if len(transcript_text) < 50:
             raise Exception(
                 "Transcript is too short. The video might not have proper captions."
             )
         
+        last_start, last_duration, _ = lines[-1]
+        
         # Create metadata
         metadata = {
             "video_id": video_id,
+            "title": captions.get("title") or f"YouTube Video {video_id}",
             "url": f"https://www.youtube.com/watch?v={video_id}",
-            "duration": "Unknown",
-            "segments": len(text_parts),
+            "duration": format_timestamp(last_start + last_duration),
+            "segments": len(lines),
             "word_count": len(transcript_text.split()),
-            "caption_type": "Available"
+            "caption_type": captions["caption_type"],
+            "language": captions["lang"]
         }
         
         return transcript_text, metadata
-        
-    except requests.exceptions.Timeout:
-        raise Exception("Request timed out while fetching YouTube captions.")
-    
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Network error while fetching captions: {str(e)}")
     
     except Exception as e:
         error_msg = str(e)
@@ -148,9 +273,8 @@ def extract_transcript_from_youtube(url):
         if any(phrase in error_msg for phrase in [
             "Invalid YouTube URL",
             "No captions/subtitles found",
-            "Transcript is too short",
-            "Request timed out"
+            "Transcript is too short"
         ]):
             raise Exception(error_msg)
         else:
-            raise Exception(f"Error extracting YouTube transcript: {error_msg}")
\ No newline at end of file
+            raise Exception(f"Error extracting YouTube transcript: {error_msg}")